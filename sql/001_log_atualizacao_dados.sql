@@ -0,0 +1,63 @@
+-- Registro de atualização dos dados usados pelo dashboard
+--
+-- Cada linha guarda a versão atual de uma tabela ou materialized view. A versão é incrementada
+-- sempre que o dado é recarregado, e o dashboard (modules/versao_dados.py) usa essas versões
+-- para invalidar o cache das consultas que dependem dele.
+
+CREATE TABLE IF NOT EXISTS log_atualizacao_dados (
+    nome TEXT PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 1,
+    atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+
+-- Registra que a tabela/view foi atualizada (chamada pelos triggers das cargas de os_dados, pecas_gerais e
+-- veiculos_api, criados por sql/008_triggers_versao_dados.sql, e pelo job do ciclo de vida)
+CREATE OR REPLACE FUNCTION registra_atualizacao_dados(p_nome TEXT)
+RETURNS BIGINT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_versao BIGINT;
+BEGIN
+    INSERT INTO log_atualizacao_dados AS l (nome, versao, atualizado_em)
+    VALUES (p_nome, 1, NOW())
+    ON CONFLICT (nome) DO UPDATE
+        SET versao = l.versao + 1,
+            atualizado_em = NOW()
+    RETURNING versao INTO v_versao;
+
+    RETURN v_versao;
+END;
+$$;
+
+
+-- Atualiza uma materialized view e registra a nova versão na mesma transação
+-- Ex: SELECT refresh_mat_view_registrando('mat_view_odometro_diario');
+CREATE OR REPLACE FUNCTION refresh_mat_view_registrando(p_view TEXT, p_concorrente BOOLEAN DEFAULT FALSE)
+RETURNS BIGINT
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF p_concorrente THEN
+        EXECUTE format('REFRESH MATERIALIZED VIEW CONCURRENTLY %I', p_view);
+    ELSE
+        EXECUTE format('REFRESH MATERIALIZED VIEW %I', p_view);
+    END IF;
+
+    RETURN registra_atualizacao_dados(p_view);
+END;
+$$;
+
+
+-- Versão inicial das dependências usadas pelos serviços
+INSERT INTO log_atualizacao_dados (nome)
+VALUES
+    ('os_dados'),
+    ('pecas_gerais'),
+    ('veiculos_api'),
+    ('mat_view_retrabalho_10_dias'),
+    ('mat_view_retrabalho_30_dias_distinct'),
+    ('mat_view_os_pecas_hodometro_v3'),
+    ('mat_view_odometro_diario')
+ON CONFLICT (nome) DO NOTHING;
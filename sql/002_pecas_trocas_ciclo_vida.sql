@@ -0,0 +1,53 @@
+-- Ciclo de vida das peças: uma linha por troca de peça (veículo + código da peça),
+-- já pareada com a troca seguinte (LEAD) da mesma peça no mesmo veículo.
+--
+-- A view concentra a regra de pareamento e a tabela guarda o resultado materializado,
+-- atualizado pelo job modules/vidautil/ciclo_vida.py (a partir de src/):
+--     python -m modules.vidautil.ciclo_vida
+--
+-- Requer sql/001_log_atualizacao_dados.sql (o job registra a atualização da tabela).
+
+CREATE OR REPLACE VIEW view_pecas_trocas_ciclo_vida AS
+SELECT
+    id_veiculo,
+    codigo_peca,
+    ROW_NUMBER() OVER w AS numero_troca,  -- 1 = primeira troca da peça no veículo
+    nome_pecas,
+    grupo_peca,
+    sub_grupo_peca,
+    status_veiculo,
+    numero_os,
+    valor_peca,
+    data_peca AS data_primeira_troca,
+    data_ultimo_hodometro AS data_odometro_primeira_troca,
+    ultimo_hodometro AS odometro_primeira_troca,
+    quantidade_peca AS quantidade_troca_1,
+    LEAD(quantidade_peca) OVER w AS quantidade_troca_2,
+    LEAD(ultimo_hodometro) OVER w AS odometro_segunda_troca,
+    LEAD(TO_DATE(data_peca, 'YYYY-MM-DD')) OVER w AS data_segunda_troca,
+    LEAD(TO_DATE(data_ultimo_hodometro, 'YYYY-MM-DD')) OVER w AS data_odometro_segunda_troca,
+    LEAD(ultimo_hodometro) OVER w - ultimo_hodometro AS duracao_km_entre_trocas,
+    LEAD(TO_DATE(data_peca, 'YYYY-MM-DD')) OVER w - TO_DATE(data_peca, 'YYYY-MM-DD') AS duracao_dias_entre_trocas
+FROM
+    mat_view_os_pecas_hodometro_v3
+WHERE
+    valor_peca > 0 -- NÃO PEGAR as PEÇAS COM VALOR NEGATIVO
+WINDOW w AS (
+    PARTITION BY id_veiculo, codigo_peca
+    ORDER BY TO_DATE(data_peca, 'YYYY-MM-DD'), numero_os
+);
+
+
+-- Tabela com as mesmas colunas da view
+CREATE TABLE IF NOT EXISTS pecas_trocas_ciclo_vida AS
+SELECT * FROM view_pecas_trocas_ciclo_vida
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS pecas_trocas_ciclo_vida_troca_idx
+    ON pecas_trocas_ciclo_vida (id_veiculo, codigo_peca, numero_troca);
+
+CREATE INDEX IF NOT EXISTS pecas_trocas_ciclo_vida_data_idx
+    ON pecas_trocas_ciclo_vida (data_primeira_troca);
+
+CREATE INDEX IF NOT EXISTS pecas_trocas_ciclo_vida_nome_idx
+    ON pecas_trocas_ciclo_vida (nome_pecas);
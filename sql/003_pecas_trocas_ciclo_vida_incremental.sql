@@ -0,0 +1,20 @@
+-- Controle da atualização incremental da tabela pecas_trocas_ciclo_vida
+--
+-- Guarda a marca d'água (high-water mark) da última troca processada: a maior data_peca
+-- da mat_view_os_pecas_hodometro_v3 no momento da atualização. Na execução seguinte, apenas
+-- os pares (id_veiculo, codigo_peca) com trocas a partir dessa data (menos CICLO_VIDA_JANELA_DIAS,
+-- para as OS lançadas com atraso) são recalculados (ver modules/vidautil/ciclo_vida.py).
+--
+-- Requer sql/002_pecas_trocas_ciclo_vida.sql.
+
+-- Tabela de uma linha, com o mesmo tipo da coluna da mat view
+CREATE TABLE IF NOT EXISTS pecas_trocas_ciclo_vida_controle AS
+SELECT
+    data_peca,
+    NOW() AS atualizado_em
+FROM mat_view_os_pecas_hodometro_v3
+WITH NO DATA;
+
+-- A primeira versão desta tabela também guardava o numero_os da última troca, que não era usado
+-- (os dias a partir da marca d'água são sempre verificados inteiros)
+ALTER TABLE pecas_trocas_ciclo_vida_controle DROP COLUMN IF EXISTS numero_os;
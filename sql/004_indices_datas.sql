@@ -0,0 +1,29 @@
+-- Índices das colunas de data filtradas pelo dashboard
+--
+-- As consultas comparam as colunas de data sem cast nem função, com intervalo semiaberto
+-- (ex: "DATA" >= :data_inicio AND "DATA" < :data_fim, ver FiltroSQL.intervalo em modules/sql_utils.py),
+-- então o Postgres pode usar índices btree nessas colunas em vez de ler as tabelas inteiras.
+--
+-- Os índices são criados com CONCURRENTLY (sem bloquear a carga dos dados): execute o arquivo fora de
+-- uma transação, ex: psql -f sql/004_indices_datas.sql. Para verificar se as consultas usam os índices:
+--     python -m modules.explain_consultas    (a partir de src/)
+
+-- Visão Geral e OS: período das peças (pecas_gerais."DATA") e junção com as OS
+CREATE INDEX CONCURRENTLY IF NOT EXISTS pecas_gerais_data_idx
+    ON pecas_gerais ("DATA");
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS pecas_gerais_os_idx
+    ON pecas_gerais ("OS");
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS os_dados_numero_os_idx
+    ON os_dados ("NUMERO DA OS");
+
+-- Job do ciclo de vida (modules/vidautil/ciclo_vida.py): trocas após a marca d'água
+CREATE INDEX CONCURRENTLY IF NOT EXISTS mat_view_os_pecas_hodometro_v3_data_idx
+    ON mat_view_os_pecas_hodometro_v3 (data_peca, numero_os);
+
+-- Vida útil e relatório: pecas_trocas_ciclo_vida (data_primeira_troca) já é indexada em sql/002
+
+ANALYZE pecas_gerais;
+ANALYZE os_dados;
+ANALYZE mat_view_os_pecas_hodometro_v3;
@@ -0,0 +1,81 @@
+-- Colunas de data tipadas no ciclo de vida das peças
+--
+-- Na mat_view_os_pecas_hodometro_v3 as datas são texto (YYYY-MM-DD). A view do ciclo de vida
+-- convertia data_peca com TO_DATE em cada LEAD e no ORDER BY da janela, e a tabela guardava
+-- data_primeira_troca / data_odometro_primeira_troca como texto (e as datas da segunda troca como DATE).
+--
+-- Agora:
+--   - a view converte cada data uma única vez (subconsulta trocas) e expõe todas as datas como DATE;
+--   - a janela ordena por data_peca (texto YYYY-MM-DD: mesma ordem das datas) e numero_os, a mesma
+--     ordem do índice parcial da mat view abaixo, então o Postgres lê cada (id_veiculo, codigo_peca)
+--     já ordenado pelo índice em vez de ordenar as linhas;
+--   - a tabela pecas_trocas_ciclo_vida passa a ter as colunas de data como DATE e um índice em
+--     (id_veiculo, codigo_peca, data_primeira_troca).
+--
+-- Os filtros dos serviços (data_primeira_troca >= :data_inicio AND data_primeira_troca < :data_fim)
+-- continuam iguais: as datas YYYY-MM-DD dos parâmetros são convertidas para DATE pelo Postgres.
+--
+-- O índice da mat view é criado com CONCURRENTLY: execute o arquivo fora de uma transação,
+-- ex: psql -f sql/005_pecas_trocas_ciclo_vida_datas.sql
+--
+-- Requer sql/002_pecas_trocas_ciclo_vida.sql.
+
+BEGIN;
+
+-- Os tipos das colunas mudam: a view é recriada (CREATE OR REPLACE não altera tipos)
+DROP VIEW IF EXISTS view_pecas_trocas_ciclo_vida;
+
+CREATE VIEW view_pecas_trocas_ciclo_vida AS
+SELECT
+    id_veiculo,
+    codigo_peca,
+    ROW_NUMBER() OVER w AS numero_troca,  -- 1 = primeira troca da peça no veículo
+    nome_pecas,
+    grupo_peca,
+    sub_grupo_peca,
+    status_veiculo,
+    numero_os,
+    valor_peca,
+    data_troca AS data_primeira_troca,
+    data_hodometro AS data_odometro_primeira_troca,
+    ultimo_hodometro AS odometro_primeira_troca,
+    quantidade_peca AS quantidade_troca_1,
+    LEAD(quantidade_peca) OVER w AS quantidade_troca_2,
+    LEAD(ultimo_hodometro) OVER w AS odometro_segunda_troca,
+    LEAD(data_troca) OVER w AS data_segunda_troca,
+    LEAD(data_hodometro) OVER w AS data_odometro_segunda_troca,
+    LEAD(ultimo_hodometro) OVER w - ultimo_hodometro AS duracao_km_entre_trocas,
+    LEAD(data_troca) OVER w - data_troca AS duracao_dias_entre_trocas
+FROM (
+    SELECT
+        vph.*,
+        TO_DATE(data_peca, 'YYYY-MM-DD') AS data_troca,
+        TO_DATE(data_ultimo_hodometro, 'YYYY-MM-DD') AS data_hodometro
+    FROM
+        mat_view_os_pecas_hodometro_v3 vph
+    WHERE
+        valor_peca > 0 -- NÃO PEGAR as PEÇAS COM VALOR NEGATIVO
+) trocas
+WINDOW w AS (
+    PARTITION BY id_veiculo, codigo_peca
+    ORDER BY data_peca, numero_os
+);
+
+
+-- Converte as datas da primeira troca da tabela (já DATE numa segunda execução: o cast não altera nada)
+ALTER TABLE pecas_trocas_ciclo_vida
+    ALTER COLUMN data_primeira_troca TYPE DATE USING data_primeira_troca::DATE,
+    ALTER COLUMN data_odometro_primeira_troca TYPE DATE USING data_odometro_primeira_troca::DATE;
+
+CREATE INDEX IF NOT EXISTS pecas_trocas_ciclo_vida_veiculo_peca_data_idx
+    ON pecas_trocas_ciclo_vida (id_veiculo, codigo_peca, data_primeira_troca);
+
+COMMIT;
+
+ANALYZE pecas_trocas_ciclo_vida;
+
+
+-- Ordem da janela da view: (id_veiculo, codigo_peca, data_peca, numero_os) das trocas com valor positivo
+CREATE INDEX CONCURRENTLY IF NOT EXISTS mat_view_os_pecas_hodometro_v3_ciclo_vida_idx
+    ON mat_view_os_pecas_hodometro_v3 (id_veiculo, codigo_peca, data_peca, numero_os)
+    WHERE valor_peca > 0;
@@ -0,0 +1,76 @@
+-- Dimensão de veículos com o código do veículo pré-calculado
+--
+-- As trocas (pecas_trocas_ciclo_vida.id_veiculo) guardam apenas o código do veículo, enquanto
+-- veiculos_api."Description" traz o código seguido da descrição (ex: "50123 - ÔNIBUS ARTICULADO").
+-- Em vez de calcular regexp_replace("Description", ...) para cada linha de veiculos_api em cada
+-- consulta (o que impede o uso de índice e de hash join pela coluna), a dimensão guarda o código
+-- já extraído, indexado, e os serviços juntam as trocas por dim_veiculos.codigo_veiculo.
+--
+-- A dimensão é recalculada por um trigger (por comando, não por linha) a cada INSERT, UPDATE,
+-- DELETE ou TRUNCATE em veiculos_api, na mesma transação da carga. A tabela de veículos é pequena,
+-- então o recálculo completo custa pouco e não depende de uma chave em veiculos_api.
+--
+-- Se a carga recriar a tabela veiculos_api (DROP / CREATE), o trigger é perdido: execute este
+-- arquivo novamente após a carga (ou apenas SELECT sincroniza_dim_veiculos() para recalcular).
+--
+-- O cache dos serviços continua dependendo de veiculos_api (versão registrada pelo trigger de
+-- sql/008_triggers_versao_dados.sql), já que a dimensão é atualizada junto com ela.
+
+-- Tabela com os tipos das colunas de veiculos_api
+CREATE TABLE IF NOT EXISTS dim_veiculos AS
+SELECT
+    regexp_replace("Description", '\s*-\s*.*$', '') AS codigo_veiculo,
+    "AssetId",
+    "Description",
+    "Model"
+FROM veiculos_api
+WITH NO DATA;
+
+CREATE INDEX IF NOT EXISTS dim_veiculos_codigo_idx
+    ON dim_veiculos (codigo_veiculo);
+
+CREATE INDEX IF NOT EXISTS dim_veiculos_asset_idx
+    ON dim_veiculos ("AssetId");
+
+
+-- Recalcula a dimensão a partir de veiculos_api
+CREATE OR REPLACE FUNCTION sincroniza_dim_veiculos()
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM dim_veiculos;
+
+    INSERT INTO dim_veiculos (codigo_veiculo, "AssetId", "Description", "Model")
+    SELECT
+        regexp_replace("Description", '\s*-\s*.*$', ''),
+        "AssetId",
+        "Description",
+        "Model"
+    FROM veiculos_api;
+
+    ANALYZE dim_veiculos;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION trg_sincroniza_dim_veiculos()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM sincroniza_dim_veiculos();
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS veiculos_api_dim_veiculos ON veiculos_api;
+
+CREATE TRIGGER veiculos_api_dim_veiculos
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON veiculos_api
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_sincroniza_dim_veiculos();
+
+
+-- Carga inicial
+SELECT sincroniza_dim_veiculos();
@@ -0,0 +1,56 @@
+-- quantidade_troca_2 do ciclo de vida pareada pelo nome da peça
+--
+-- Antes da tabela pecas_trocas_ciclo_vida, as consultas de vida útil e do relatório de peças
+-- calculavam a quantidade da troca seguinte com
+--     LEAD(quantidade_peca) OVER (PARTITION BY id_veiculo, nome_pecas ORDER BY data_peca)
+-- enquanto os demais campos da troca seguinte (hodômetro, datas, durações) usam a janela por
+-- (id_veiculo, codigo_peca). A view do sql/002 (e do sql/005) passou a usar a janela por código
+-- também em quantidade_troca_2; esta migração volta a calcular a coluna pelo nome da peça.
+--
+-- As demais colunas, os tipos e a ordem das colunas são os mesmos do sql/005 (CREATE OR REPLACE).
+-- Após aplicar, recalcule a tabela inteira (a partir de src/):
+--     python -m modules.vidautil.ciclo_vida --completo
+--
+-- Requer sql/005_pecas_trocas_ciclo_vida_datas.sql.
+
+CREATE OR REPLACE VIEW view_pecas_trocas_ciclo_vida AS
+SELECT
+    id_veiculo,
+    codigo_peca,
+    ROW_NUMBER() OVER w AS numero_troca,  -- 1 = primeira troca da peça no veículo
+    nome_pecas,
+    grupo_peca,
+    sub_grupo_peca,
+    status_veiculo,
+    numero_os,
+    valor_peca,
+    data_troca AS data_primeira_troca,
+    data_hodometro AS data_odometro_primeira_troca,
+    ultimo_hodometro AS odometro_primeira_troca,
+    quantidade_peca AS quantidade_troca_1,
+    LEAD(quantidade_peca) OVER w_nome AS quantidade_troca_2,
+    LEAD(ultimo_hodometro) OVER w AS odometro_segunda_troca,
+    LEAD(data_troca) OVER w AS data_segunda_troca,
+    LEAD(data_hodometro) OVER w AS data_odometro_segunda_troca,
+    LEAD(ultimo_hodometro) OVER w - ultimo_hodometro AS duracao_km_entre_trocas,
+    LEAD(data_troca) OVER w - data_troca AS duracao_dias_entre_trocas
+FROM (
+    SELECT
+        vph.*,
+        TO_DATE(data_peca, 'YYYY-MM-DD') AS data_troca,
+        TO_DATE(data_ultimo_hodometro, 'YYYY-MM-DD') AS data_hodometro
+    FROM
+        mat_view_os_pecas_hodometro_v3 vph
+    WHERE
+        valor_peca > 0 -- NÃO PEGAR as PEÇAS COM VALOR NEGATIVO
+) trocas
+WINDOW
+    w AS (
+        PARTITION BY id_veiculo, codigo_peca
+        ORDER BY data_peca, numero_os
+    ),
+    -- Troca seguinte com o mesmo nome de peça, de qualquer código
+    w_nome AS (
+        PARTITION BY id_veiculo, nome_pecas
+        ORDER BY data_peca, numero_os
+    );
@@ -0,0 +1,52 @@
+-- Registro automático das cargas de os_dados, pecas_gerais e veiculos_api
+--
+-- O cache dos serviços depende da versão dessas tabelas em log_atualizacao_dados (sql/001), mas
+-- nenhuma carga chamava registra_atualizacao_dados(): a versão nunca mudava e o cache só expirava
+-- pelo TTL. Em vez de depender de cada carga, um trigger por comando (não por linha) registra nova
+-- versão a cada INSERT, UPDATE, DELETE ou TRUNCATE, na mesma transação da carga.
+--
+-- Cada comando da carga incrementa a versão uma vez (uma carga com vários INSERT gera várias versões,
+-- o que só invalida o cache mais vezes). A linha da tabela em log_atualizacao_dados fica bloqueada até
+-- o commit, então duas cargas simultâneas da mesma tabela são serializadas no primeiro comando.
+--
+-- As materialized views continuam registradas por refresh_mat_view_registrando() (triggers não
+-- disparam em REFRESH MATERIALIZED VIEW).
+--
+-- Se a carga recriar a tabela (DROP / CREATE), o trigger é perdido: execute este arquivo novamente.
+--
+-- Requer sql/001_log_atualizacao_dados.sql.
+
+CREATE OR REPLACE FUNCTION trg_registra_atualizacao_dados()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM registra_atualizacao_dados(TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$;
+
+
+DROP TRIGGER IF EXISTS os_dados_versao_dados ON os_dados;
+
+CREATE TRIGGER os_dados_versao_dados
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON os_dados
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_registra_atualizacao_dados();
+
+
+DROP TRIGGER IF EXISTS pecas_gerais_versao_dados ON pecas_gerais;
+
+CREATE TRIGGER pecas_gerais_versao_dados
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON pecas_gerais
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_registra_atualizacao_dados();
+
+
+-- Dispara junto com o trigger da dim_veiculos (sql/006), na mesma transação
+DROP TRIGGER IF EXISTS veiculos_api_versao_dados ON veiculos_api;
+
+CREATE TRIGGER veiculos_api_versao_dados
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON veiculos_api
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trg_registra_atualizacao_dados();
@@ -19,7 +19,7 @@ import dash
 import dash_bootstrap_components as dbc
 import dash_auth
 import dash_mantine_components as dmc
-from dash import Dash, _dash_renderer, html, callback, Input, Output, State
+from dash import Dash, DiskcacheManager, _dash_renderer, html, callback, Input, Output, State
 
 # Graficos
 import plotly.graph_objs as go
@@ -31,6 +31,21 @@ import tema
 # Banco de Dados
 from db import PostgresSingleton
 
+# Cache
+import diskcache
+from modules.cache_utils import CACHE_DIR, CACHE_TTL
+from modules.versao_dados import versao_dados
+
+# Exportação das tabelas
+from modules.exportacao import registra_rota_exportacao, avisos_exportacao
+from modules.tarefas import registra_rota_tarefas
+
+# Métricas do banco
+from modules.metricas_banco import registra_rota_metricas
+
+# Páginas
+from modules.paginas import PAGINAS_LAZY, registra_paginas_lazy
+
 # Profiler
 from werkzeug.middleware.profiler import ProfilerMiddleware
 
@@ -86,6 +101,15 @@ pio.templates.default = "tema"
 # DASH #######################################################################
 ##############################################################################
 
+# Callbacks em segundo plano (background=True): rodam num processo próprio, sem prender o worker do
+# gunicorn. Se os filtros mudam enquanto um deles roda, o dash encerra o processo anterior. O resultado
+# fica guardado por CACHE_TTL, indexado pelos inputs e pela versão dos dados (muda com o REFRESH das views).
+background_callback_manager = DiskcacheManager(
+    diskcache.Cache(os.path.join(CACHE_DIR, "callbacks")),
+    cache_by=[versao_dados.assinatura],
+    expire=CACHE_TTL,
+)
+
 # Dash
 app = Dash(
     "Dashboard de OSs",
@@ -94,17 +118,37 @@ app = Dash(
     external_stylesheets=stylesheets,
     external_scripts=scripts,
     use_pages=True,
+    pages_folder="" if PAGINAS_LAZY else "pages",  # No modo preguiçoso as páginas são registradas abaixo
     suppress_callback_exceptions=True,
+    background_callback_manager=background_callback_manager,
 )
 
 # Server
 server = app.server
 
+# Páginas importadas apenas na primeira requisição (ver modules/paginas.py)
+if PAGINAS_LAZY:
+    registra_paginas_lazy(app)
+
+# Rota de exportação das tabelas (arquivos transmitidos em blocos, ver modules/exportacao.py)
+registra_rota_exportacao(server)
+
+# Rota para baixar os arquivos gerados em segundo plano (ver modules/tarefas.py)
+registra_rota_tarefas(server)
+
+# Rota com as métricas das consultas e da pool de conexões do worker (ver modules/metricas_banco.py)
+registra_rota_metricas(server)
+
 
 # Menu / Navbar
 def criarMenu(dirVertical=True):
     return dbc.Nav(
-        [dbc.NavLink(page["name"], href=page["relative_path"], active="exact") for page in dash.page_registry.values()],
+        [
+            # No modo preguiçoso a navegação recarrega a página, para o navegador receber os callbacks dela
+            dbc.NavLink(page["name"], href=page["relative_path"], active="exact", external_link=PAGINAS_LAZY)
+            for page in dash.page_registry.values()
+            if page["module"].split(".")[-1] != "not_found_404"  # Registrada no modo preguiçoso, fora do menu
+        ],
         vertical=dirVertical,
         pills=True,
     )
@@ -157,7 +201,8 @@ app_shell = dmc.AppShell(
     id="app-shell",
 )
 
-app.layout = dmc.MantineProvider(app_shell)
+# Avisos das exportações (sem dados / erro) ficam fora das páginas, compartilhados por todas
+app.layout = dmc.MantineProvider([*avisos_exportacao(), app_shell])
 
 
 @callback(
@@ -1,11 +1,203 @@
 # Imports básicos
 import os
+import time
+import logging
+import configparser
+import functools
+from contextlib import contextmanager
 
 # PostgresSQL
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
 from threading import Lock
 
+# Arquivo de configuração (seção [banco]); as variáveis de ambiente têm precedência
+ARQUIVO_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.ini")
+
+
+@functools.lru_cache(maxsize=1)
+def _le_arquivo_config():
+    config = configparser.ConfigParser()
+    config.read(ARQUIVO_CONFIG, encoding="utf-8")
+    return config
+
+
+def le_configuracao(nome: str, padrao):
+    """
+    Lê uma configuração do banco: variável de ambiente (ex: DB_POOL_SIZE), senão a chave de mesmo
+    nome em minúsculas na seção [banco] do config.ini (ex: db_pool_size), senão o padrão.
+    O valor é convertido para o tipo do padrão.
+    """
+    valor = os.getenv(nome)
+    if valor is None:
+        valor = _le_arquivo_config().get("banco", nome.lower(), fallback=None)
+    if valor is None:
+        return padrao
+    return type(padrao)(valor)
+
+
+def timeout_consulta(servico: str = None) -> int:
+    """
+    Tempo máximo (ms) de uma consulta do serviço: DB_STATEMENT_TIMEOUT_<SERVICO> (ex: DB_STATEMENT_TIMEOUT_VIDA_UTIL),
+    senão DB_STATEMENT_TIMEOUT. 0 desativa o limite.
+    """
+    padrao = le_configuracao("DB_STATEMENT_TIMEOUT", 120_000)
+    if not servico:
+        return padrao
+    return le_configuracao(f"DB_STATEMENT_TIMEOUT_{servico.upper()}", padrao)
+
+
+def opcoes_pool() -> dict:
+    # Configuração da pool, a mesma para o primário e as réplicas
+    return {
+        "pool_size": le_configuracao("DB_POOL_SIZE", 10),  # Número de conexões na pool
+        "max_overflow": le_configuracao("DB_MAX_OVERFLOW", 5),  # Conexões extras nos picos (fechadas ao devolver)
+        "pool_timeout": le_configuracao("DB_POOL_TIMEOUT", 30),  # Espera máxima (s) por uma conexão livre
+        "pool_recycle": le_configuracao("DB_POOL_RECYCLE", 1800),  # Renova conexões mais antigas que isso (s)
+        "pool_pre_ping": True,  # Verifica se conexão tá viva antes de usar
+    }
+
+
+###################################################################################
+# Réplicas de leitura
+###################################################################################
+#
+# As consultas dos serviços (somente leitura) podem ser feitas em réplicas do banco (DB_REPLICAS), deixando
+# o primário para a carga dos dados (pecas_gerais, os_dados) e para a autenticação. Cada processo usa sempre
+# a mesma réplica enquanto ela estiver saudável (escolhida pelo pid): a versão dos dados (modules/versao_dados.py)
+# e os resultados guardados no cache vêm do mesmo servidor. Uma réplica fora do ar ou atrasada além de
+# DB_REPLICA_ATRASO_MAX é evitada até a próxima verificação; sem réplicas saudáveis, a leitura vai ao primário.
+
+# Verifica a saúde das réplicas
+REPLICA_CONSULTA_SAUDE = """
+    SELECT
+        CASE
+            WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END AS atraso
+"""
+
+
+class Replica:
+    """
+    Engine de uma réplica e o resultado da última verificação de saúde.
+    """
+
+    def __init__(self, url: str):
+        self.engine = create_engine(
+            url,
+            connect_args={"connect_timeout": le_configuracao("DB_REPLICA_CONNECT_TIMEOUT", 5)},
+            **opcoes_pool(),
+        )
+        self.nome = self.engine.url.render_as_string(hide_password=True)
+        self.saudavel = True
+        self.atraso = 0.0
+        self.verificado_em = 0.0
+        self._lock = Lock()
+
+    def verifica(self, intervalo: float, atraso_max: float):
+        # Consulta a réplica no máximo uma vez a cada intervalo (por processo)
+        if time.time() - self.verificado_em < intervalo:
+            return
+
+        with self._lock:
+            if time.time() - self.verificado_em < intervalo:
+                return
+
+            try:
+                with self.engine.connect() as conn:
+                    self.atraso = float(conn.execute(text(REPLICA_CONSULTA_SAUDE)).scalar())
+                saudavel = self.atraso <= atraso_max
+                if not saudavel:
+                    logging.warning(f"Réplica {self.nome} atrasada {self.atraso:.0f} s, lendo de outro servidor")
+            except Exception as e:
+                logging.error(f"Réplica {self.nome} indisponível: {e}")
+                saudavel = False
+
+            if saudavel and not self.saudavel:
+                logging.info(f"Réplica {self.nome} disponível novamente")
+            self.saudavel = saudavel
+            self.verificado_em = time.time()
+
+    def marca_falha(self, erro):
+        # Falha ao conectar: evita a réplica até a próxima verificação
+        logging.error(f"Erro ao conectar na réplica {self.nome}: {erro}")
+        self.saudavel = False
+        self.verificado_em = time.time()
+
+    def estado(self) -> dict:
+        return {
+            "replica": self.nome,
+            "saudavel": self.saudavel,
+            "atraso_s": round(self.atraso, 1),
+            "verificado_em": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.verificado_em)),
+        }
+
+
+class RoteadorLeitura:
+    """
+    Substitui o engine nas leituras: connect() e begin() abrem a conexão na réplica do processo,
+    ou na próxima réplica saudável, ou no primário.
+    """
+
+    def __init__(self, primario, urls_replicas: list):
+        self.primario = primario
+        self.replicas = [Replica(url) for url in urls_replicas]
+        self.intervalo = le_configuracao("DB_REPLICA_INTERVALO", 30)
+        self.atraso_max = le_configuracao("DB_REPLICA_ATRASO_MAX", 300)
+
+    def _candidatas(self):
+        # Ordem fixa por processo, começando pela réplica do pid
+        inicio = os.getpid() % len(self.replicas)
+        for replica in self.replicas[inicio:] + self.replicas[:inicio]:
+            replica.verifica(self.intervalo, self.atraso_max)
+            if replica.saudavel:
+                yield replica
+
+    def connect(self):
+        for replica in self._candidatas():
+            try:
+                return replica.engine.connect()
+            except OperationalError as e:
+                replica.marca_falha(e)
+
+        return self.primario.connect()
+
+    @contextmanager
+    def begin(self):
+        with self.connect() as conn, conn.begin():
+            yield conn
+
+    @property
+    def pool(self):
+        # Métricas: a pool do primário
+        return self.primario.pool
+
+    def engines(self) -> list:
+        return [replica.engine for replica in self.replicas]
+
+    def estado(self) -> list:
+        return [replica.estado() for replica in self.replicas]
+
+
+def somente_leitura(classe):
+    """
+    Decorador dos serviços que apenas leem o banco: o db_engine recebido no construtor é trocado
+    pelo roteador das réplicas (PostgresSingleton.get_engine_leitura). Sem réplicas, nada muda.
+    """
+    inicializa = classe.__init__
+
+    @functools.wraps(inicializa)
+    def __init__(self, db_engine, *args, **kwargs):
+        inicializa(self, db_engine, *args, **kwargs)
+        banco = PostgresSingleton.get_instance()
+        if db_engine is banco.get_engine():
+            self.db_engine = banco.get_engine_leitura()
+
+    classe.__init__ = __init__
+    return classe
+
 
 class PostgresSingleton:
     """
@@ -43,11 +235,19 @@ class PostgresSingleton:
         db_url = f"postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
         self._engine = create_engine(
             db_url,
-            pool_size=10,  # Número de conexões na pool
-            pool_pre_ping=True,  # Verifica se conexão tá viva antes de usar
+            **opcoes_pool(),
             # echo=debug_mode,  # Se true, mostra os logs das queries
         )
         self._Session = sessionmaker(bind=self._engine)
+
+        # Réplicas de leitura (URLs separadas por vírgula)
+        urls_replicas = [url.strip() for url in le_configuracao("DB_REPLICAS", "").split(",") if url.strip()]
+        self._leitura = RoteadorLeitura(self._engine, urls_replicas) if urls_replicas else None
+
+        # Processos filhos (workers do gunicorn com --preload, callbacks em segundo plano, tarefas)
+        # não podem usar as conexões herdadas do processo pai
+        os.register_at_fork(after_in_child=self.reinicia_pool)
+
         self._initialized = True  # Mark as initialized
 
     @classmethod
@@ -63,6 +263,37 @@ class PostgresSingleton:
         """
         return self._engine
 
+    def get_engine_leitura(self):
+        """
+        Retorna o roteador das réplicas de leitura, ou o engine do primário se não houver réplicas.
+        Use apenas para consultas (as réplicas não aceitam escrita).
+        """
+        return self._leitura or self._engine
+
+    def estado_replicas(self) -> list:
+        """
+        Resultado da última verificação de cada réplica.
+        """
+        return self._leitura.estado() if self._leitura else []
+
+    def _engines(self):
+        return [self._engine] + (self._leitura.engines() if self._leitura else [])
+
+    def reinicia_pool(self):
+        """
+        Descarta a pool herdada após um fork, sem fechar os sockets (que continuam sendo do processo pai).
+        As conexões do novo processo são abertas sob demanda.
+        """
+        for engine in self._engines():
+            engine.dispose(close=False)
+
+    def fecha_conexoes(self):
+        """
+        Fecha as conexões abertas da pool (ex: no master do gunicorn, antes de criar os workers)
+        """
+        for engine in self._engines():
+            engine.dispose()
+
     def get_session(self):
         """
         Retorna a SQLAlchemy session
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Configuração do gunicorn
+#
+# Uso (a partir da raiz do projeto): gunicorn --config src/gunicorn.conf.py app:server
+#
+# Com preload_app o app (páginas, templates do plotly, catálogo das entidades) é carregado uma única
+# vez no master, e os workers criados por fork compartilham essa memória (copy-on-write) em vez de
+# cada um importar e carregar tudo de novo. As conexões abertas no master não podem ser usadas pelos
+# workers: o master as fecha antes de criar os workers e cada worker descarta a pool herdada (post_fork).
+#
+# As listas do catálogo ficam num dicionário do processo (modules/entities_utils.py), preenchido no
+# master por preaquece(); o cache compartilhado (CACHE_BACKEND) guarda apenas cópias serializadas,
+# que cada worker só lê quando a lista herdada vence.
+
+# Imports básicos
+import gc
+import os
+import logging
+
+# Dotenv
+from dotenv import load_dotenv
+
+# Diretório do app (src)
+chdir = os.path.dirname(os.path.abspath(__file__))
+
+# As variáveis abaixo podem estar no .env, assim como as do app
+load_dotenv(os.path.join(chdir, ".env"))
+
+# Workers e timeout (consultas pesadas podem levar minutos)
+workers = int(os.getenv("GUNICORN_WORKERS", 4))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 600))
+
+# Carrega o app no master antes do fork
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() in ("true", "1", "yes")
+
+
+def when_ready(server):
+    # Executado no master após carregar o app (com preload_app) e antes de criar os workers
+    if not server.cfg.preload_app:
+        return
+
+    from db import PostgresSingleton
+    from modules.entities_utils import catalogo_entidades
+
+    # Listas do catálogo no dicionário do processo: herdadas pelos workers no fork
+    try:
+        catalogo_entidades.preaquece()
+    except Exception as e:
+        logging.error(f"Erro ao preaquecer o catálogo das entidades: {e}")
+
+    # O master não atende requisições: fecha as conexões usadas no carregamento
+    PostgresSingleton.get_instance().fecha_conexoes()
+
+    # Move os objetos já carregados para fora da coleta de lixo: a coleta nos workers não toca
+    # nessas páginas de memória, que continuam compartilhadas com o master
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Cada worker abre as próprias conexões: a pool herdada do master é descartada sem fechar os sockets
+    # (o PostgresSingleton também faz isso em qualquer fork; a chamada é idempotente)
+    if not server.cfg.preload_app:
+        return
+
+    from db import PostgresSingleton
+
+    PostgresSingleton.get_instance().reinicia_pool()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Comparação da leitura por COPY (sql_utils.le_sql_copy) com o pd.read_sql
+#
+# Executa a mesma consulta pelos dois caminhos, várias vezes, e mostra o tempo mediano de cada um,
+# o ganho e se os DataFrames são iguais. Por padrão a consulta gera no próprio banco (generate_series)
+# linhas com as colunas típicas dos serviços (texto, código, valor, data, timestamp); use --query
+# para medir uma consulta real (ex: a de VidaUtilService.get_pecas com "TODAS").
+#
+# Uso (a partir do diretório src):
+#   python -m modules.benchmark_leitura
+#   python -m modules.benchmark_leitura --linhas 10000 100000 500000 --repeticoes 5
+#   python -m modules.benchmark_leitura --query "SELECT * FROM pecas_trocas_ciclo_vida"
+
+# Imports básicos
+import time
+import argparse
+from decimal import Decimal
+
+import pandas as pd
+
+# Dotenv
+from dotenv import load_dotenv
+
+# Imports do banco
+from sqlalchemy import text
+
+# Linhas sintéticas no formato das consultas de peças
+QUERY_SINTETICA = """
+    SELECT
+        g AS id,
+        'PECA ' || (g % 500) AS "PRODUTO",
+        LPAD((g % 9000)::TEXT, 6, '0') AS "CODIGO DO VEICULO",
+        ROUND((random() * 1000)::NUMERIC, 2) AS "VALOR",
+        (g % 7)::INTEGER AS "QUANTIDADE",
+        DATE '2020-01-01' + (g % 1500) AS "DATA",
+        TIMESTAMP '2020-01-01' + g * INTERVAL '1 minute' AS "DATA_HORA",
+        (g % 3 = 0) AS retrabalho
+    FROM generate_series(1, :linhas) AS g
+"""
+
+
+def normaliza(df: pd.DataFrame) -> pd.DataFrame:
+    # numeric vem como Decimal no pd.read_sql e como float no COPY
+    df = df.copy()
+    for coluna in df.columns:
+        valores = df[coluna].dropna()
+        if df[coluna].dtype == object and len(valores) and isinstance(valores.iloc[0], Decimal):
+            df[coluna] = df[coluna].astype(float)
+    return df
+
+
+def mede(engine, query, params: dict, repeticoes: int) -> dict:
+    """
+    Tempo mediano (s) de cada caminho de leitura para a query.
+    """
+    from modules.sql_utils import le_sql_copy
+
+    tempos = {"read_sql": [], "copy": []}
+    for _ in range(repeticoes):
+        # A mesma transação e conexão nos dois caminhos: compara apenas a leitura
+        with engine.begin() as conn:
+            inicio = time.perf_counter()
+            df_read_sql = pd.read_sql(query, conn, params=params)
+            tempos["read_sql"].append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            df_copy = le_sql_copy(query, conn, params)
+            tempos["copy"].append(time.perf_counter() - inicio)
+
+    # Com dados aleatórios (random()) as execuções diferem; compara apenas o formato
+    iguais = list(df_read_sql.columns) == list(df_copy.columns) and len(df_read_sql) == len(df_copy)
+    if iguais and "random()" not in str(query):
+        try:
+            pd.testing.assert_frame_equal(normaliza(df_read_sql), df_copy, check_dtype=False)
+        except AssertionError:
+            iguais = False
+
+    read_sql = pd.Series(tempos["read_sql"]).median()
+    copy = pd.Series(tempos["copy"]).median()
+    return {
+        "linhas": len(df_copy),
+        "read_sql_s": round(read_sql, 3),
+        "copy_s": round(copy, 3),
+        "ganho": round(read_sql / copy, 2) if copy else None,
+        "mb": round(df_copy.memory_usage(deep=True).sum() / 1024 / 1024, 1),
+        "iguais": iguais,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara a leitura por COPY com o pd.read_sql")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10_000, 100_000, 500_000], help="tamanhos da consulta sintética")
+    parser.add_argument("--query", help="consulta a medir no lugar da sintética")
+    parser.add_argument("--repeticoes", type=int, default=3, help="execuções de cada caminho (usa a mediana)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    from db import PostgresSingleton
+
+    engine = PostgresSingleton.get_instance().get_engine()
+
+    if args.query:
+        resultados = [mede(engine, text(args.query), {}, args.repeticoes)]
+    else:
+        resultados = [mede(engine, text(QUERY_SINTETICA), {"linhas": linhas}, args.repeticoes) for linhas in args.linhas]
+
+    print(pd.DataFrame(resultados).to_string(index=False))
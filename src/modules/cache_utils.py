@@ -0,0 +1,466 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Cache de resultados dos serviços (modules/*/*_service.py)
+#
+# Os serviços executam queries pesadas (várias CTEs) para os mesmos filtros repetidamente,
+# por exemplo o período padrão aberto por todos os gestores pela manhã. O decorador
+# cache_resultado guarda o retorno de cada método, indexado pelos filtros normalizados,
+# com tempo de vida (TTL).
+#
+# O armazenamento é plugável (variável CACHE_BACKEND):
+#   - memoria: LRU no próprio processo, limitado por CACHE_MEMORIA_MB
+#   - disco (padrão): diskcache (SQLite) em CACHE_DIR, compartilhado entre os workers do gunicorn
+#     e com os processos dos callbacks em segundo plano
+#   - redis: servidor Redis (ou compatível) em CACHE_REDIS_URL, compartilhado entre máquinas
+#
+# Em todos os backends o cálculo de uma chave ausente é single-flight: se vários usuários
+# pedem a mesma consulta ao mesmo tempo, apenas um processo executa a query e os demais
+# aguardam o resultado ser gravado no cache.
+#
+# Métodos que declaram as tabelas/views das quais dependem (dependencias=...) têm a versão
+# desses dados (modules/versao_dados.py) incluída na chave: o resultado é invalidado exatamente
+# quando uma dependência é atualizada e pode ficar guardado por CACHE_TTL_VERSIONADO.
+#
+# Cada resultado também é guardado como cópia reserva (sem as versões na chave) por CACHE_TTL_RESERVA.
+# Se a consulta estourar o tempo máximo do serviço (statement_timeout, ver db.timeout_consulta),
+# a última cópia reserva é devolvida no lugar do DataFrame vazio: dados possivelmente desatualizados.
+
+# Imports básicos
+import os
+import sys
+import time
+import pickle
+import hashlib
+import logging
+import functools
+import inspect
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock, RLock
+
+import pandas as pd
+
+# Imports auxiliares
+from modules.versao_dados import versao_dados
+from modules.sql_utils import consulta_estourou_tempo
+
+# Configuração do cache
+# Os callbacks em segundo plano rodam em processos próprios: com o cache em memória, os dados
+# materializados por eles (guarda_dados_pagina) não seriam vistos pelos workers web
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "disco").lower()
+CACHE_MEMORIA_MB = float(os.getenv("CACHE_MEMORIA_MB", 256))
+CACHE_TTL = int(os.getenv("CACHE_TTL", 3600))
+CACHE_TTL_VERSIONADO = int(os.getenv("CACHE_TTL_VERSIONADO", 86400))
+CACHE_TTL_RESERVA = int(os.getenv("CACHE_TTL_RESERVA", 7 * 86400))
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(tempfile.gettempdir(), "ra_dash_pecas_cache"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# Tempo máximo (segundos) que uma consulta pode segurar o lock single-flight (mesmo timeout do gunicorn)
+CACHE_LOCK_TIMEOUT = int(os.getenv("CACHE_LOCK_TIMEOUT", 600))
+
+# Intervalo (segundos) entre as tentativas de obter o lock do cache em disco: começa curto (consultas
+# rápidas) e dobra até o máximo, limitando o atraso após a liberação a ~200 ms
+CACHE_LOCK_ESPERA_MIN = 0.01
+CACHE_LOCK_ESPERA_MAX = 0.2
+
+# Termos que representam "todos os valores" nos filtros
+TERMOS_TODOS = ("TODAS", "TODOS")
+
+
+###################################################################################
+# Normalização dos argumentos
+###################################################################################
+
+
+def normaliza_datas(datas):
+    # Datas viram ISO (YYYY-MM-DD), mantendo a ordem [data_inicial, data_final]
+    return tuple(pd.to_datetime(data).date().isoformat() for data in datas)
+
+
+def normaliza_argumento(valor):
+    """
+    Converte um argumento de filtro numa forma canônica e hashable.
+
+    Listas são ordenadas e sem repetição; listas vazias ou que contenham "TODAS"/"TODOS"
+    equivalem a não filtrar, assim como no FiltroSQL.
+    """
+    if isinstance(valor, (list, tuple, set)):
+        valores = [x for x in valor if x]
+        if not valores or any(x in TERMOS_TODOS for x in valores):
+            return ("*",)
+        return tuple(sorted({str(x) for x in valores}))
+
+    if isinstance(valor, dict):
+        return tuple(sorted((str(k), normaliza_argumento(v)) for k, v in valor.items()))
+
+    if valor in TERMOS_TODOS:
+        return ("*",)
+
+    return valor
+
+
+def gera_chave(funcao, args, kwargs, versoes=None):
+    """
+    Gera a chave textual do cache: "<Classe.metodo>:<hash dos argumentos normalizados e versões>".
+    O texto é o mesmo em todos os processos, permitindo compartilhar o cache entre workers.
+    """
+    assinatura = inspect.signature(funcao)
+    argumentos = assinatura.bind(*args, **kwargs)
+    argumentos.apply_defaults()
+
+    chave = []
+    for nome, valor in argumentos.arguments.items():
+        if nome == "self":
+            continue
+        if nome == "datas":
+            valor = normaliza_datas(valor)
+        else:
+            valor = normaliza_argumento(valor)
+        chave.append((nome, valor))
+
+    if versoes:
+        chave.append(("versoes", tuple(sorted(versoes.items()))))
+
+    resumo = hashlib.sha1(repr(tuple(chave)).encode("utf-8")).hexdigest()
+    return f"{funcao.__qualname__}:{resumo}"
+
+
+###################################################################################
+# Tamanho, cópia e validade dos resultados
+###################################################################################
+
+
+def tamanho_resultado(valor):
+    # Tamanho aproximado em bytes (DataFrames contam o conteúdo das colunas object)
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, dict):
+        return sum(tamanho_resultado(v) for v in valor.values())
+    return sys.getsizeof(valor)
+
+
+def copia_resultado(valor):
+    # Os callbacks alteram os DataFrames recebidos, então o cache em memória entrega sempre uma cópia
+    if isinstance(valor, pd.DataFrame):
+        return valor.copy()
+    if isinstance(valor, dict):
+        return {k: copia_resultado(v) for k, v in valor.items()}
+    return valor
+
+
+def resultado_vazio(valor):
+    # Os serviços retornam DataFrames vazios em caso de erro, esses resultados não são guardados
+    if isinstance(valor, pd.DataFrame):
+        return valor.empty
+    if isinstance(valor, dict):
+        return all(resultado_vazio(v) for v in valor.values())
+    return valor is None
+
+
+###################################################################################
+# Backends
+###################################################################################
+
+
+class BackendMemoria:
+    """
+    Cache LRU no próprio processo, limitado pelo total de bytes dos resultados guardados.
+
+    Cada entrada guarda (valor, expira_em, tamanho). Entradas vencidas são descartadas na leitura;
+    ao exceder o orçamento de memória, as menos usadas saem primeiro.
+    """
+
+    def __init__(self, memoria_mb: float = CACHE_MEMORIA_MB):
+        self.memoria_max = int(memoria_mb * 1024 * 1024)
+        self.memoria_usada = 0
+        self._entradas = OrderedDict()
+        self._lock = RLock()
+        self._locks_chaves = {}
+
+    def get(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+
+            valor, expira_em, _ = entrada
+            if time.time() > expira_em:
+                self._remove(chave)
+                return None
+
+            self._entradas.move_to_end(chave)
+            return copia_resultado(valor)
+
+    def set(self, chave, valor, ttl):
+        tamanho = tamanho_resultado(valor)
+        if tamanho > self.memoria_max:
+            logging.warning(f"Resultado maior que o cache ({tamanho} bytes), não será guardado: {chave}")
+            return
+
+        with self._lock:
+            if chave in self._entradas:
+                self._remove(chave)
+
+            self._entradas[chave] = (copia_resultado(valor), time.time() + ttl, tamanho)
+            self.memoria_usada += tamanho
+
+            # Descarta as entradas menos usadas até caber no orçamento
+            while self.memoria_usada > self.memoria_max:
+                chave_antiga = next(iter(self._entradas))
+                self._remove(chave_antiga)
+
+    @contextmanager
+    def lock(self, chave):
+        # Um lock por chave, válido apenas entre as threads deste processo. Cada entrada guarda
+        # [lock, threads usando ou aguardando]: o lock só é descartado quando a contagem zera,
+        # senão uma thread nova criaria outro lock enquanto outra ainda aguarda o antigo
+        with self._lock:
+            entrada = self._locks_chaves.setdefault(chave, [Lock(), 0])
+            entrada[1] += 1
+
+        try:
+            with entrada[0]:
+                yield
+        finally:
+            with self._lock:
+                entrada[1] -= 1
+                if entrada[1] == 0:
+                    self._locks_chaves.pop(chave, None)
+
+    def limpa(self):
+        with self._lock:
+            self._entradas.clear()
+            self.memoria_usada = 0
+
+    def _remove(self, chave):
+        _, _, tamanho = self._entradas.pop(chave)
+        self.memoria_usada -= tamanho
+
+
+def processo_existe(pid: int) -> bool:
+    # Processos encerrados que o pai ainda não recolheu (zumbis) não seguram mais o lock
+    import psutil
+
+    try:
+        return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+class BackendDisco:
+    """
+    Cache em disco (diskcache/SQLite) num diretório compartilhado pelos workers do gunicorn.
+
+    O espaço máximo é CACHE_MEMORIA_MB, com descarte LRU feito pelo próprio diskcache.
+    """
+
+    def __init__(self, diretorio: str = CACHE_DIR, memoria_mb: float = CACHE_MEMORIA_MB):
+        import diskcache
+
+        self.cache = diskcache.Cache(
+            diretorio,
+            size_limit=int(memoria_mb * 1024 * 1024),
+            eviction_policy="least-recently-used",
+        )
+
+    def get(self, chave):
+        return self.cache.get(chave)
+
+    def set(self, chave, valor, ttl):
+        self.cache.set(chave, valor, expire=ttl)
+
+    @contextmanager
+    def lock(self, chave):
+        # Lock entre processos, com o pid do dono. Um callback em segundo plano cancelado é
+        # encerrado no meio da consulta: se o dono não existe mais, o lock é liberado na hora
+        # (sem esperar CACHE_LOCK_TIMEOUT). Também expira sozinho, caso o pid tenha sido reusado.
+        # A espera entre as tentativas dobra até CACHE_LOCK_ESPERA_MAX, para não consultar o SQLite
+        # a cada 10 ms durante uma consulta longa.
+        chave_lock = f"lock:{chave}"
+        espera = CACHE_LOCK_ESPERA_MIN
+        while not self.cache.add(chave_lock, os.getpid(), expire=CACHE_LOCK_TIMEOUT, retry=True):
+            dono = self.cache.get(chave_lock, retry=True)
+            if dono is not None and not processo_existe(dono):
+                self.cache.delete(chave_lock, retry=True)
+                continue
+            time.sleep(espera)
+            espera = min(espera * 2, CACHE_LOCK_ESPERA_MAX)
+
+        try:
+            yield
+        finally:
+            self.cache.delete(chave_lock, retry=True)
+
+    def limpa(self):
+        self.cache.clear()
+
+
+class BackendRedis:
+    """
+    Cache num servidor Redis (ou compatível). O limite de memória e o descarte são
+    configurados no próprio servidor (maxmemory / maxmemory-policy allkeys-lru).
+    """
+
+    PREFIXO = "ra_dash_pecas:"
+
+    def __init__(self, url: str = CACHE_REDIS_URL):
+        import redis
+
+        self.cliente = redis.Redis.from_url(url)
+        self.cliente.ping()
+
+    def get(self, chave):
+        dados = self.cliente.get(self.PREFIXO + chave)
+        if dados is None:
+            return None
+        return pickle.loads(dados)
+
+    def set(self, chave, valor, ttl):
+        self.cliente.set(self.PREFIXO + chave, pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL), ex=ttl)
+
+    @contextmanager
+    def lock(self, chave):
+        with self.cliente.lock(f"{self.PREFIXO}lock:{chave}", timeout=CACHE_LOCK_TIMEOUT):
+            yield
+
+    def limpa(self):
+        for chave in self.cliente.scan_iter(f"{self.PREFIXO}*"):
+            self.cliente.delete(chave)
+
+
+BACKENDS = {
+    "memoria": BackendMemoria,
+    "disco": BackendDisco,
+    "redis": BackendRedis,
+}
+
+
+def cria_backend(nome: str = CACHE_BACKEND):
+    """
+    Instancia o backend configurado. Se a dependência (diskcache/redis) não estiver instalada
+    ou o servidor estiver indisponível, usa o cache em memória.
+    """
+    if nome not in BACKENDS:
+        logging.error(f"CACHE_BACKEND inválido: {nome}. Usando o cache em memória.")
+        return BackendMemoria()
+
+    try:
+        return BACKENDS[nome]()
+    except Exception as e:
+        logging.error(f"Erro ao iniciar o cache {nome}: {e}. Usando o cache em memória.")
+        return BackendMemoria()
+
+
+# Backend compartilhado pelos serviços do processo
+cache_servicos = cria_backend()
+
+
+###################################################################################
+# Decorador
+###################################################################################
+
+
+def cache_resultado(ttl: int = None, dependencias: tuple = ()):
+    """
+    Decorador para métodos de serviço que retornam DataFrames (ou dicionários de DataFrames).
+
+    Args:
+        ttl (int, opcional): Tempo de vida das entradas em segundos. Padrão: CACHE_TTL_VERSIONADO
+            quando a versão de todas as dependências é conhecida, senão CACHE_TTL.
+        dependencias (tuple, opcional): Tabelas/views lidas pela consulta (ou DATA_ATUAL).
+    """
+
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            try:
+                versoes = versao_dados.get_versoes(dependencias) if dependencias else None
+                chave = gera_chave(funcao, args, kwargs, versoes)
+            except Exception:
+                # Argumentos inválidos (ex: datas ausentes): o próprio método trata o erro
+                return funcao(*args, **kwargs)
+
+            valor = cache_servicos.get(chave)
+            if valor is not None:
+                return valor
+
+            # Single-flight: só quem obtiver o lock executa a consulta, os demais aguardam
+            # e encontram o resultado já gravado ao entrar
+            with cache_servicos.lock(chave):
+                valor = cache_servicos.get(chave)
+                if valor is not None:
+                    return valor
+
+                consulta_estourou_tempo.set(False)
+                valor = funcao(*args, **kwargs)
+                chave_reserva = f"reserva:{gera_chave(funcao, args, kwargs)}" if versoes else f"reserva:{chave}"
+
+                if not resultado_vazio(valor):
+                    if ttl is not None:
+                        ttl_entrada = ttl
+                    elif versoes is not None:
+                        ttl_entrada = CACHE_TTL_VERSIONADO
+                    else:
+                        ttl_entrada = CACHE_TTL
+                    cache_servicos.set(chave, valor, ttl_entrada)
+                    cache_servicos.set(chave_reserva, valor, CACHE_TTL_RESERVA)
+
+                elif consulta_estourou_tempo.get():
+                    # Resposta degradada: a última cópia reserva (não é gravada na chave atual)
+                    reserva = cache_servicos.get(chave_reserva)
+                    if reserva is not None:
+                        logging.warning(f"Consulta {funcao.__qualname__} estourou o tempo máximo, usando a cópia reserva")
+                        return reserva
+
+            return valor
+
+        return wrapper
+
+    return decorador
+
+
+###################################################################################
+# Dados materializados das páginas
+###################################################################################
+#
+# Quando vários callbacks de uma página (gráficos, tabela, exportação) usam o mesmo DataFrame,
+# um único callback o calcula e guarda no cache, no servidor. O navegador recebe apenas a chave
+# (num dcc.Store) e os demais callbacks leem o DataFrame por ela, sem nova consulta ao banco
+# e sem trafegar os dados pelo navegador.
+
+
+def chave_dados_pagina(nome: str, **filtros) -> str:
+    """
+    Chave dos dados de uma página: "pagina:<nome>:<hash dos filtros normalizados>".
+    """
+    chave = []
+    for filtro, valor in sorted(filtros.items()):
+        if filtro == "datas":
+            valor = normaliza_datas(valor)
+        else:
+            valor = normaliza_argumento(valor)
+        chave.append((filtro, valor))
+
+    resumo = hashlib.sha1(repr(tuple(chave)).encode("utf-8")).hexdigest()
+    return f"pagina:{nome}:{resumo}"
+
+
+def guarda_dados_pagina(nome: str, valor, ttl: int = CACHE_TTL, **filtros) -> str:
+    """
+    Guarda os dados calculados para os filtros e retorna a chave a ser colocada no dcc.Store da página.
+    """
+    chave = chave_dados_pagina(nome, **filtros)
+    cache_servicos.set(chave, valor, ttl)
+    return chave
+
+
+def le_dados_pagina(chave: str):
+    """
+    Lê os dados guardados por guarda_dados_pagina. Retorna None se a chave não existir mais
+    (expirou ou foi descartada pelo LRU); nesse caso o callback deve recalcular os dados.
+    """
+    if not chave:
+        return None
+    return cache_servicos.get(chave)
@@ -1,8 +1,18 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import os
+import time
+import logging
+import functools
+from threading import Lock
+
 import pandas as pd
-import io
+
+# Imports auxiliares
+from modules.cache_utils import cache_resultado
+from modules.versao_dados import versao_dados
+from modules.sql_utils import le_sql, executa_em_paralelo
 
 
 # Funções utilitárias para obtenção das principais entidades do sistema
@@ -10,7 +20,7 @@ import io
 
 def get_linhas(dbEngine):
     # Linhas
-    return pd.read_sql(
+    return le_sql(
         """
         SELECT 
             DISTINCT "linhanumero" AS "LABEL"
@@ -20,12 +30,13 @@ def get_linhas(dbEngine):
             "linhanumero"
         """,
         dbEngine,
+        servico="catalogo",
     )
 
 
 def get_oficinas(dbEngine):
     # Oficinas
-    return pd.read_sql(
+    return le_sql(
         """
         SELECT 
             DISTINCT "DESCRICAO DA OFICINA" AS "LABEL"
@@ -33,12 +44,13 @@ def get_oficinas(dbEngine):
             mat_view_retrabalho_10_dias mvrd 
         """,
         dbEngine,
+        servico="catalogo",
     )
 
 
 def get_secoes(dbEngine):
     # Seções
-    return pd.read_sql(
+    return le_sql(
         """
         SELECT 
             DISTINCT "DESCRICAO DA SECAO" AS "LABEL"
@@ -46,11 +58,12 @@ def get_secoes(dbEngine):
             mat_view_retrabalho_10_dias mvrd
         """,
         dbEngine,
+        servico="catalogo",
     )
 
 def get_pecas(dbEngine):
     """Retorna todas as pecas"""
-    return pd.read_sql(
+    return le_sql(
         """
         SELECT 
             DISTINCT "PRODUTO" AS "LABEL"
@@ -58,17 +71,18 @@ def get_pecas(dbEngine):
             pecas_gerais
         """,
         dbEngine,
+        servico="catalogo",
     )
 
 
 def get_mecanicos(dbEngine):
     # Colaboradores / Mecânicos
-    return pd.read_sql("SELECT * FROM colaboradores_frotas_os", dbEngine)
+    return le_sql("SELECT * FROM colaboradores_frotas_os", dbEngine, servico="catalogo")
 
 
 def get_lista_os(dbEngine):
     # Lista de OS
-    return pd.read_sql(
+    return le_sql(
         """
         SELECT DISTINCT
             "DESCRICAO DA SECAO" as "SECAO",
@@ -79,19 +93,19 @@ def get_lista_os(dbEngine):
             "DESCRICAO DO SERVICO"
         """,
         dbEngine,
+        servico="catalogo",
     )
 
 
 def get_modelos(dbEngine):
     try:
     # Lista de OS
-        with dbEngine.begin() as conn: 
-            df = pd.read_sql("""
-                SELECT DISTINCT
-                    "MODELO" AS "MODELO"
-                FROM pecas_gerais
-            """, conn)
-            return df
+        df = le_sql("""
+            SELECT DISTINCT
+                "MODELO" AS "MODELO"
+            FROM pecas_gerais
+        """, dbEngine, servico="catalogo")
+        return df
         
     except Exception as e:
         print(f"Erro ao executar a consulta: {e}")
@@ -99,7 +113,7 @@ def get_modelos(dbEngine):
 
 def get_modelos_pecas_odometro(dbEngine):
     # Lista de OS
-    df = pd.read_sql(
+    df = le_sql(
         """
         SELECT DISTINCT
             "modelo_frota" AS "MODELO"
@@ -107,13 +121,141 @@ def get_modelos_pecas_odometro(dbEngine):
             mat_view_os_pecas_hodometro_v3
         """,
         dbEngine,
+        servico="catalogo",
     )
     df = df.dropna(subset=["MODELO"])
     return df
 
-def gerar_excel(df):
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Dados")
-    output.seek(0)
-    return output.getvalue()
+
+###################################################################################
+# Catálogo das entidades
+###################################################################################
+#
+# As listas usadas nos filtros das páginas (modelos, oficinas, seções, peças, OS) são lidas uma única
+# vez para todas as páginas, quando alguma delas as pede, e guardadas em dois níveis:
+#   - num dicionário do próprio processo, consultado primeiro. Preenchido no master do gunicorn
+#     (preaquece, com --preload), é herdado pelos workers no fork e compartilhado com o master
+#     (copy-on-write) enquanto a lista não mudar;
+#   - no cache compartilhado entre os workers (modules/cache_utils.py), usado quando a lista do
+#     processo venceu, para que apenas um processo leia a lista nova do banco.
+# Cada lista é relida após CATALOGO_TTL ou quando a versão da tabela de origem muda; como os layouts
+# das páginas são funções, novos modelos aparecem sem reiniciar o servidor.
+
+# Tempo de vida (segundos) das listas do catálogo
+CATALOGO_TTL = int(os.getenv("CATALOGO_TTL", 900))
+
+
+def lista_catalogo(dependencias: tuple):
+    """
+    Decorador dos métodos do CatalogoEntidades: guarda a lista no dicionário do processo
+    (CatalogoEntidades._listas) e, quando ela vence, lê pelo cache compartilhado (cache_resultado).
+
+    A lista do processo é usada enquanto não passar CATALOGO_TTL e a versão das dependências for a
+    mesma da leitura. Quem chama recebe uma cópia: a lista guardada não é alterada pelas páginas.
+    """
+
+    def decorador(metodo):
+        metodo_cache = cache_resultado(ttl=CATALOGO_TTL, dependencias=dependencias)(metodo)
+
+        @functools.wraps(metodo)
+        def wrapper(self):
+            versoes = versao_dados.get_versoes(dependencias)
+
+            entrada = self._listas.get(metodo.__name__)
+            if entrada is not None:
+                df, versoes_lidas, expira_em = entrada
+                if versoes_lidas == versoes and time.time() < expira_em:
+                    return df.copy()
+
+            df = metodo_cache(self)
+            # Listas vazias (erro na leitura) não são guardadas, como no cache compartilhado
+            if not df.empty:
+                with self._lock:
+                    self._listas[metodo.__name__] = (df, versoes, time.time() + CATALOGO_TTL)
+
+            return df.copy()
+
+        return wrapper
+
+    return decorador
+
+
+
+def lista_com_todos(df: pd.DataFrame, coluna: str = "LABEL", termo_todos: str = "TODAS") -> list:
+    # Registros da entidade com a opção "todos" (ex: {"LABEL": "TODAS"}) no início, como usado nos filtros
+    lista = df.to_dict(orient="records")
+    lista.insert(0, {coluna: termo_todos})
+    return lista
+
+
+class CatalogoEntidades:
+    """
+    Listas das entidades do sistema, compartilhadas pelas páginas.
+
+    Cada lista é lida sob demanda e fica no processo e no cache compartilhado por CATALOGO_TTL, ou
+    até a tabela/view de origem ser atualizada. Em caso de erro, o método retorna um DataFrame vazio
+    (que não é guardado).
+    """
+
+    def __init__(self):
+        # {nome do método: (DataFrame, versões das dependências, expira_em)}
+        self._listas = {}
+        self._lock = Lock()
+
+    def _le(self, leitura, nome: str) -> pd.DataFrame:
+        try:
+            # Import tardio: o engine só é criado quando a primeira lista é pedida
+            from db import PostgresSingleton
+
+            return leitura(PostgresSingleton.get_instance().get_engine_leitura())
+        except Exception as e:
+            logging.error(f"Erro ao ler a lista de {nome} do catálogo: {e}")
+            return pd.DataFrame()
+
+    def preaquece(self):
+        # Lê todas as listas para o dicionário do processo (ex: no master do gunicorn com --preload,
+        # antes de criar os workers, que herdam as listas já carregadas)
+        executa_em_paralelo(
+            self.get_oficinas,
+            self.get_secoes,
+            self.get_pecas,
+            self.get_lista_os,
+            self.get_modelos,
+            self.get_modelos_pecas_odometro,
+        )
+
+    @lista_catalogo(("rmtc_linha_info",))
+    def get_linhas(self) -> pd.DataFrame:
+        return self._le(get_linhas, "linhas")
+
+    @lista_catalogo(("mat_view_retrabalho_10_dias",))
+    def get_oficinas(self) -> pd.DataFrame:
+        return self._le(get_oficinas, "oficinas")
+
+    @lista_catalogo(("mat_view_retrabalho_10_dias",))
+    def get_secoes(self) -> pd.DataFrame:
+        return self._le(get_secoes, "seções")
+
+    @lista_catalogo(("pecas_gerais",))
+    def get_pecas(self) -> pd.DataFrame:
+        return self._le(get_pecas, "peças")
+
+    @lista_catalogo(("colaboradores_frotas_os",))
+    def get_mecanicos(self) -> pd.DataFrame:
+        return self._le(get_mecanicos, "mecânicos")
+
+    @lista_catalogo(("mat_view_retrabalho_10_dias",))
+    def get_lista_os(self) -> pd.DataFrame:
+        return self._le(get_lista_os, "OS")
+
+    @lista_catalogo(("pecas_gerais",))
+    def get_modelos(self) -> pd.DataFrame:
+        return self._le(get_modelos, "modelos")
+
+    @lista_catalogo(("mat_view_os_pecas_hodometro_v3",))
+    def get_modelos_pecas_odometro(self) -> pd.DataFrame:
+        return self._le(get_modelos_pecas_odometro, "modelos (odômetro)")
+
+
+# Instância compartilhada pelas páginas
+catalogo_entidades = CatalogoEntidades()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Esquemas (tipos das colunas) dos resultados dos serviços
+#
+# Os DataFrames lidos do banco guardam textos repetidos (nome da peça, grupo, modelo, veículo) como
+# objetos Python e números como float64, e são esses DataFrames que ocupam o cache de resultados.
+# Cada método de serviço registrado em ESQUEMAS tem o resultado convertido logo após a leitura:
+#   - categoria: textos com poucos valores distintos (um código por linha + a lista de valores)
+#   - int32 / float32: contagens, dias e quilometragens exibidas (colunas monetárias continuam float64)
+#   - data: datetime64 (as datas chegam como texto ou objetos date)
+# O mesmo orçamento do cache (CACHE_MEMORIA_MB) passa a guardar várias vezes mais resultados.
+#
+# Na saída para o usuário (blocos do AG Grid e exportações), para_exibicao devolve os float32 com
+# as casas decimais originais e as datas sem horário.
+
+# Imports básicos
+import logging
+import functools
+
+import numpy as np
+import pandas as pd
+
+# Colunas do ciclo de vida (pecas_trocas_ciclo_vida), comuns às leituras de vida útil e do relatório
+ESQUEMA_TROCAS = {
+    "id_veiculo": "categoria",
+    "nome_pecas": "categoria",
+    "codigo_peca": "categoria",
+    "grupo_peca": "categoria",
+    "sub_grupo_peca": "categoria",
+    "status_veiculo": "categoria",
+    "numero_troca": "int32",
+    "duracao_dias_entre_trocas": "int32",
+    "data_primeira_troca": "data",
+    "data_odometro_primeira_troca": "data",
+    "data_segunda_troca": "data",
+    "data_odometro_segunda_troca": "data",
+    "data_hodometro_gps": "data",
+}
+
+# Quilometragens e quantidades em float32 (precisão de ~7 dígitos): apenas onde os valores são exibidos.
+# Na previsão do relatório elas entram em contas arredondadas para inteiro e continuam float64
+ESQUEMA_TROCAS_MEDIDAS = {
+    "quantidade_troca_1": "float32",
+    "quantidade_troca_2": "float32",
+    "odometro_primeira_troca": "float32",
+    "odometro_segunda_troca": "float32",
+    "duracao_km_entre_trocas": "float32",
+    "hodometro_atual_gps": "float32",
+}
+
+# Esquema de cada método de serviço ("Classe.metodo")
+ESQUEMAS = {
+    "VidaUtilService.get_pecas": {
+        **ESQUEMA_TROCAS,
+        **ESQUEMA_TROCAS_MEDIDAS,
+        "flag_troca": "categoria",
+        "Model": "categoria",
+        "AssetId": "categoria",
+        "km_efetivo_da_peca": "float32",
+        "dias_efetivo_da_peca": "int32",
+    },
+    "RelatorioPecasService.get_trocas_previsao": {
+        **ESQUEMA_TROCAS,
+        "modelo_veiculo": "categoria",
+        "AssetId": "categoria",
+    },
+}
+
+
+def converte_coluna(serie: pd.Series, tipo: str) -> pd.Series:
+    """
+    Converte a coluna para o tipo do esquema (categoria, int32, float32 ou data).
+    Inteiros com valores nulos viram float32, já que int32 não representa NaN.
+    """
+    if tipo == "categoria":
+        return serie.astype("category")
+
+    if tipo == "data":
+        convertida = pd.to_datetime(serie, errors="coerce")
+    else:
+        convertida = pd.to_numeric(serie, errors="coerce")
+
+    # Valores que não puderam ser convertidos seriam perdidos: mantém a coluna original
+    if convertida.isna().sum() > serie.isna().sum():
+        raise ValueError("valores fora do formato esperado")
+
+    if tipo == "data":
+        return convertida
+
+    numeros = convertida
+    if tipo == "int32":
+        if numeros.isna().any():
+            return numeros.astype("float32")
+        informacoes = np.iinfo(np.int32)
+        if numeros.between(informacoes.min, informacoes.max).all():
+            return numeros.astype("int32")
+        return numeros
+
+    return numeros.astype(tipo)
+
+
+def memoria_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1024 / 1024
+
+
+def aplica_esquema(df: pd.DataFrame, esquema: dict, nome: str = "") -> pd.DataFrame:
+    """
+    Converte as colunas do DataFrame presentes no esquema e registra a memória antes e depois.
+    Colunas que não puderem ser convertidas ficam como estão.
+    """
+    if not isinstance(df, pd.DataFrame) or df.empty:
+        return df
+
+    antes = memoria_mb(df)
+    for coluna, tipo in esquema.items():
+        if coluna not in df.columns:
+            continue
+        try:
+            df[coluna] = converte_coluna(df[coluna], tipo)
+        except Exception as e:
+            logging.error(f"Erro ao converter a coluna {coluna} para {tipo} ({nome}): {e}")
+
+    depois = memoria_mb(df)
+    logging.info(f"Esquema {nome}: {len(df)} linhas, {antes:.1f} MB -> {depois:.1f} MB ({antes / max(depois, 1e-9):.1f}x)")
+    return df
+
+
+def compacta_resultado(funcao):
+    """
+    Decorador para métodos de serviço: aplica ao DataFrame retornado o esquema registrado em ESQUEMAS
+    para o método. Deve ficar abaixo do cache_resultado, para o cache guardar o resultado já convertido.
+    """
+    nome = funcao.__qualname__
+    esquema = ESQUEMAS.get(nome)
+    if esquema is None:
+        logging.warning(f"Método sem esquema registrado: {nome}")
+        return funcao
+
+    @functools.wraps(funcao)
+    def wrapper(*args, **kwargs):
+        return aplica_esquema(funcao(*args, **kwargs), esquema, nome)
+
+    return wrapper
+
+
+def para_exibicao(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cópia do DataFrame para mostrar ou exportar: float32 volta a float64 com as casas decimais originais
+    (ex: 1234.3 e não 1234.300048828125) e datas sem horário voltam a ser date.
+    Use em blocos pequenos (ex: a página do grid), não no DataFrame inteiro.
+    """
+    colunas_float32 = [coluna for coluna in df.columns if df[coluna].dtype == np.float32]
+    colunas_data = [coluna for coluna in df.columns if pd.api.types.is_datetime64_any_dtype(df[coluna].dtype)]
+    if not colunas_float32 and not colunas_data:
+        return df
+
+    df = df.copy()
+    for coluna in colunas_float32:
+        # A representação textual do float32 é a mais curta que identifica o valor
+        df[coluna] = df[coluna].astype(str).astype("float64")
+
+    for coluna in colunas_data:
+        serie = df[coluna]
+        if (serie.isna() | (serie == serie.dt.normalize())).all():
+            df[coluna] = serie.dt.date
+
+    return df
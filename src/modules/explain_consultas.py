@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Verifica, com EXPLAIN, se os filtros de data das consultas usam os índices (sql/004_indices_datas.sql)
+#
+# Para cada coluna de data filtrada pelo dashboard, compara o plano do predicado usado pelos serviços
+# (coluna sem cast, intervalo semiaberto) com o do predicado antigo (cast ou função na coluna) e mostra
+# como a tabela é lida: Index Scan / Index Only Scan / Bitmap Heap Scan (usa o índice) ou Seq Scan.
+# Termina com código 1 se algum predicado novo não usar índice, para ser usado após as migrações.
+#
+# Num banco local com poucas linhas o Postgres prefere ler a tabela inteira mesmo com o índice;
+# use --sem-seqscan para verificar apenas se o índice pode ser usado pelo predicado.
+# Os mesmos planos são verificados num banco populado pelos testes (tests/test_explain_indices.py).
+#
+# Uso (a partir do diretório src):
+#   python -m modules.explain_consultas
+#   python -m modules.explain_consultas --inicio 2024-01-01 --fim 2024-01-31 --sem-seqscan
+
+# Imports básicos
+import sys
+import json
+import logging
+import argparse
+from datetime import date, timedelta
+
+import pandas as pd
+
+# Dotenv
+from dotenv import load_dotenv
+
+# Imports do banco
+from sqlalchemy import text
+
+# Imports auxiliares
+from modules.sql_utils import FiltroSQL
+
+# Nós do plano que leem a tabela pelo índice
+NOS_INDICE = ("Index Scan", "Index Only Scan", "Bitmap Heap Scan")
+
+# (nome, tabela, predicado atual, predicado antigo); os parâmetros vêm de FiltroSQL.intervalo
+PREDICADOS = [
+    (
+        "pecas_gerais.DATA",
+        "pecas_gerais",
+        '"DATA" >= :data_inicio AND "DATA" < :data_fim',
+        '"DATA"::DATE BETWEEN CAST(:data_inicio AS DATE) AND CAST(:data_fim AS DATE) - 1',
+    ),
+    (
+        "pecas_trocas_ciclo_vida.data_primeira_troca",
+        "pecas_trocas_ciclo_vida",
+        "data_primeira_troca >= :data_inicio AND data_primeira_troca < :data_fim",
+        "TO_DATE(data_primeira_troca::TEXT, 'YYYY-MM-DD') BETWEEN CAST(:data_inicio AS DATE) AND CAST(:data_fim AS DATE) - 1",
+    ),
+    (
+        "mat_view_os_pecas_hodometro_v3.data_peca",
+        "mat_view_os_pecas_hodometro_v3",
+        "data_peca >= :data_inicio",
+        "TO_DATE(data_peca::TEXT, 'YYYY-MM-DD') >= CAST(:data_inicio AS DATE)",
+    ),
+]
+
+
+def leituras_tabela(plano: dict, tabela: str) -> list:
+    """
+    Tipos dos nós do plano (EXPLAIN FORMAT JSON) que leem a tabela.
+    O Bitmap Index Scan (filho do Bitmap Heap Scan) não tem Relation Name e não entra na lista.
+    """
+    nos = []
+    if plano.get("Relation Name") == tabela:
+        nos.append(plano["Node Type"])
+    for filho in plano.get("Plans", []):
+        nos.extend(leituras_tabela(filho, tabela))
+
+    return nos
+
+
+def explica(conn, tabela: str, predicado: str, params: dict) -> str:
+    plano = conn.execute(text(f"EXPLAIN (FORMAT JSON) SELECT * FROM {tabela} WHERE {predicado}"), params).scalar()
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+
+    return ", ".join(leituras_tabela(plano[0]["Plan"], tabela)) or "-"
+
+
+def verifica_predicados(engine, datas: list, sem_seqscan: bool = False) -> pd.DataFrame:
+    """
+    Plano de leitura de cada tabela com o predicado atual e com o antigo.
+    """
+    params = FiltroSQL().intervalo(datas).params
+
+    linhas = []
+    with engine.begin() as conn:
+        if sem_seqscan:
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+
+        for nome, tabela, predicado, predicado_antigo in PREDICADOS:
+            # Savepoint: uma tabela ausente no banco local não interrompe as demais verificações
+            try:
+                with conn.begin_nested():
+                    atual = explica(conn, tabela, predicado, params)
+                    antigo = explica(conn, tabela, predicado_antigo, params)
+            except Exception as e:
+                logging.error(f"Erro ao executar o EXPLAIN de {nome}: {e}")
+                linhas.append({"coluna": nome, "atual": "erro", "antigo": "erro", "usa_indice": False})
+                continue
+
+            linhas.append(
+                {
+                    "coluna": nome,
+                    "atual": atual,
+                    "antigo": antigo,
+                    "usa_indice": any(no in atual for no in NOS_INDICE),
+                }
+            )
+
+    return pd.DataFrame(linhas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica com EXPLAIN se os filtros de data usam os índices")
+    parser.add_argument("--inicio", default=(date.today() - timedelta(days=30)).isoformat(), help="data inicial (YYYY-MM-DD)")
+    parser.add_argument("--fim", default=date.today().isoformat(), help="data final (YYYY-MM-DD)")
+    parser.add_argument("--sem-seqscan", action="store_true", help="desliga o Seq Scan (bancos locais pequenos)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    from db import PostgresSingleton
+
+    df = verifica_predicados(PostgresSingleton.get_instance().get_engine(), [args.inicio, args.fim], args.sem_seqscan)
+    print(df.to_string(index=False))
+
+    sys.exit(0 if df["usa_indice"].all() else 1)
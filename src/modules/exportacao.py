@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Exportação das tabelas (Excel, CSV e Parquet)
+#
+# O clique no botão é o único gatilho da exportação: os filtros (ou a chave dos dados já
+# materializados da página, ver guarda_dados_pagina) são lidos como State. Assim a exportação
+# não é executada a cada mudança de filtro e reaproveita o DataFrame em cache da página,
+# sem nova consulta ao banco.
+#
+# O arquivo não passa pela resposta do callback (dcc.send_bytes codifica tudo em base64 no JSON).
+# Um callback clientside envia os estados (fetch) para a rota ROTA_EXPORTACAO do servidor Flask,
+# que escreve o arquivo em blocos: o CSV é gerado e transmitido por fatias, enquanto o .xlsx
+# (xlsxwriter em modo constant_memory) e o Parquet (row groups) são escritos inteiros num arquivo
+# temporário antes do primeiro byte da resposta, e só então enviados em pedaços. O navegador salva
+# a resposta como arquivo; sem dados ou em caso de erro, mostra um aviso (ID_AVISOS_EXPORTACAO).
+
+# Imports básicos
+import os
+import json
+import logging
+import tempfile
+from datetime import date
+
+import pandas as pd
+
+# Imports do dash / flask
+import dash_mantine_components as dmc
+from dash import clientside_callback, html, Input, Output
+from flask import Response, abort, request, stream_with_context
+
+# Imports auxiliares
+from modules.esquemas import para_exibicao
+
+# Rota (no servidor Flask do dash) que gera os arquivos
+ROTA_EXPORTACAO = "/exportacao"
+
+# Linhas escritas por vez e tamanho dos pedaços transmitidos
+EXPORTACAO_LINHAS_BLOCO = 10_000
+EXPORTACAO_BYTES_PEDACO = 64 * 1024
+
+# Formatos suportados: extensão e mimetype
+FORMATOS_EXPORTACAO = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Exportações registradas pelas páginas: nome -> {"le_dados", "colunas", "formato"}
+EXPORTACOES = {}
+
+# Container dos avisos de exportação (dmc.Notification), incluído no layout do app (ver avisos_exportacao)
+ID_AVISOS_EXPORTACAO = "avisos-exportacao"
+
+
+###################################################################################
+# Escrita dos arquivos
+###################################################################################
+
+
+def _blocos(df: pd.DataFrame):
+    # Cada bloco sai com os tipos de exibição (ver modules/esquemas.py)
+    for inicio in range(0, len(df), EXPORTACAO_LINHAS_BLOCO):
+        yield inicio, para_exibicao(df.iloc[inicio : inicio + EXPORTACAO_LINHAS_BLOCO])
+
+
+def _transmite_arquivo(caminho: str):
+    # Lê o arquivo temporário em pedaços e o remove ao final (ou se o download for interrompido)
+    try:
+        with open(caminho, "rb") as arquivo:
+            while pedaco := arquivo.read(EXPORTACAO_BYTES_PEDACO):
+                yield pedaco
+    finally:
+        os.remove(caminho)
+
+
+def _arquivo_temporario(extensao: str) -> str:
+    descritor, caminho = tempfile.mkstemp(suffix=f".{extensao}")
+    os.close(descritor)
+    return caminho
+
+
+def escreve_xlsx(df: pd.DataFrame) -> str:
+    """
+    Escreve o DataFrame num .xlsx temporário com o xlsxwriter em modo constant_memory
+    (cada linha é descarregada no disco logo após escrita). Retorna o caminho do arquivo.
+    """
+    import xlsxwriter
+
+    caminho = _arquivo_temporario("xlsx")
+    workbook = xlsxwriter.Workbook(caminho, {"constant_memory": True, "default_date_format": "dd/mm/yyyy"})
+    planilha = workbook.add_worksheet("Dados")
+
+    planilha.write_row(0, 0, [str(coluna) for coluna in df.columns])
+    for inicio, bloco in _blocos(df):
+        # NaN/NaT viram células vazias
+        bloco = bloco.astype(object).where(bloco.notna(), None)
+        for deslocamento, linha in enumerate(bloco.itertuples(index=False, name=None)):
+            planilha.write_row(inicio + deslocamento + 1, 0, linha)
+
+    workbook.close()
+    return caminho
+
+
+def escreve_parquet(df: pd.DataFrame) -> str:
+    """
+    Escreve o DataFrame num .parquet temporário, em row groups de EXPORTACAO_LINHAS_BLOCO linhas.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    caminho = _arquivo_temporario("parquet")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), caminho, row_group_size=EXPORTACAO_LINHAS_BLOCO)
+    return caminho
+
+
+def gera_csv(df: pd.DataFrame):
+    """
+    Gera o CSV em pedaços (separador ";" e vírgula decimal, como o Excel em português espera).
+    """
+    yield "\ufeff".encode("utf-8")  # BOM para o Excel reconhecer o UTF-8
+    for inicio, bloco in _blocos(df):
+        yield bloco.to_csv(index=False, header=inicio == 0, sep=";", decimal=",").encode("utf-8")
+
+
+def gera_arquivo(df: pd.DataFrame, formato: str):
+    # Gerador com o conteúdo do arquivo no formato pedido. Apenas o CSV é gerado enquanto é enviado:
+    # o .xlsx e o Parquet são escritos inteiros no disco antes do primeiro pedaço
+    if formato == "csv":
+        return gera_csv(df)
+    if formato == "parquet":
+        return _transmite_arquivo(escreve_parquet(df))
+    return _transmite_arquivo(escreve_xlsx(df))
+
+
+###################################################################################
+# Rota no servidor
+###################################################################################
+
+
+def registra_rota_exportacao(server):
+    """
+    Registra a rota POST ROTA_EXPORTACAO/<nome> no servidor Flask do dash.
+    A rota fica atrás da mesma autenticação (dash_auth) das páginas.
+
+    Responde 204 quando não há dados para os filtros e 500 se a leitura falhar; o callback
+    clientside mostra um aviso nesses casos. O tempo até o primeiro byte inclui a escrita do
+    arquivo inteiro para .xlsx e Parquet (ver gera_arquivo).
+    """
+
+    @server.route(f"{ROTA_EXPORTACAO}/<nome>", methods=["POST"])
+    def exporta_arquivo(nome):
+        exportacao = EXPORTACOES.get(nome)
+        if exportacao is None:
+            abort(404)
+
+        formato = request.form.get("formato", exportacao["formato"])
+        if formato not in FORMATOS_EXPORTACAO:
+            abort(400)
+
+        try:
+            valores = json.loads(request.form.get("estados", "[]"))
+            df = exportacao["le_dados"](*valores)
+        except Exception as e:
+            logging.error(f"Erro ao ler os dados da exportação {nome}: {e}")
+            abort(500)
+
+        if df is None or df.empty:
+            return Response(status=204)
+
+        if exportacao["colunas"]:
+            df = df.rename(columns=exportacao["colunas"])
+
+        date_now = date.today().strftime("%d-%m-%Y")
+        return Response(
+            stream_with_context(gera_arquivo(df, formato)),
+            mimetype=FORMATOS_EXPORTACAO[formato],
+            headers={"Content-Disposition": f'attachment; filename="{nome}_{date_now}.{formato}"'},
+        )
+
+
+###################################################################################
+# Callbacks
+###################################################################################
+
+
+def registra_exportacao(
+    id_botao: str,
+    id_download: str,
+    estados: list,
+    le_dados,
+    nome_arquivo: str,
+    colunas: dict = None,
+    formato: str = "xlsx",
+):
+    """
+    Registra a exportação de uma tabela, disparada pelo clique no botão.
+
+    Args:
+        id_botao (str): Id do botão de exportação (único Input do callback).
+        id_download (str): Id do dcc.Download da tabela (apenas Output do callback clientside).
+        estados (list): States lidos no clique (ex: [State("store-dados-...", "data")]).
+        le_dados (callable): Recebe os valores dos estados e retorna o DataFrame a exportar.
+        nome_arquivo (str): Nome da exportação na rota e prefixo do arquivo (a data e a extensão são acrescentadas).
+        colunas (dict, opcional): Renomeação das colunas para o arquivo.
+        formato (str, opcional): xlsx, csv ou parquet.
+    """
+    EXPORTACOES[nome_arquivo] = {"le_dados": le_dados, "colunas": colunas, "formato": formato}
+
+    # Envia os estados para a rota com fetch e salva a resposta como arquivo. Sem dados (204) ou
+    # em caso de erro, retorna um dmc.Notification para o container dos avisos
+    clientside_callback(
+        f"""
+        async function(n_clicks, ...estados) {{
+            if (!n_clicks || n_clicks <= 0) {{
+                return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+            }}
+
+            const aviso = (titulo, mensagem, cor) => ({{
+                namespace: "dash_mantine_components",
+                type: "Notification",
+                props: {{
+                    id: "aviso-exportacao-{nome_arquivo}",
+                    action: "show",
+                    title: titulo,
+                    message: mensagem,
+                    color: cor,
+                    autoClose: 6000,
+                }},
+            }});
+
+            const corpo = new FormData();
+            corpo.append("estados", JSON.stringify(estados));
+            corpo.append("formato", "{formato}");
+
+            let resposta;
+            try {{
+                resposta = await fetch("{ROTA_EXPORTACAO}/{nome_arquivo}", {{method: "POST", body: corpo}});
+            }} catch (erro) {{
+                return [window.dash_clientside.no_update, aviso("Erro na exportação", "Não foi possível conectar ao servidor.", "red")];
+            }}
+
+            if (resposta.status === 204) {{
+                return [window.dash_clientside.no_update, aviso("Nada para exportar", "Não há dados para os filtros selecionados.", "yellow")];
+            }}
+            if (!resposta.ok) {{
+                return [window.dash_clientside.no_update, aviso("Erro na exportação", "Não foi possível gerar o arquivo. Tente novamente.", "red")];
+            }}
+
+            // Nome do arquivo do Content-Disposition (ex: attachment; filename="pecas_01-01-2025.xlsx")
+            const disposicao = resposta.headers.get("Content-Disposition") || "";
+            const nome = (disposicao.match(/filename="([^"]+)"/) || [])[1] || "{nome_arquivo}.{formato}";
+
+            const url = URL.createObjectURL(await resposta.blob());
+            const link = document.createElement("a");
+            link.href = url;
+            link.download = nome;
+            document.body.appendChild(link);
+            link.click();
+            link.remove();
+            setTimeout(() => URL.revokeObjectURL(url), 1000);
+
+            return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+        }}
+        """,
+        Output(id_download, "data"),
+        Output(ID_AVISOS_EXPORTACAO, "children", allow_duplicate=True),
+        Input(id_botao, "n_clicks"),
+        *estados,
+        prevent_initial_call=True,
+    )
+
+
+def avisos_exportacao():
+    """
+    Componentes do layout do app para os avisos das exportações: o provider das notificações
+    do Mantine e o container que recebe os dmc.Notification dos callbacks de exportação.
+    """
+    return [dmc.NotificationProvider(), html.Div(id=ID_AVISOS_EXPORTACAO)]
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Modelo de linhas no servidor para as tabelas AG Grid
+#
+# Em vez de enviar o DataFrame inteiro em rowData, as tabelas usam rowModelType="infinite":
+# o navegador pede apenas o bloco visível (getRowsRequest, com startRow/endRow, ordenação e
+# filtros) e o servidor responde (getRowsResponse) filtrando, ordenando e fatiando o DataFrame
+# já guardado no cache (ver guarda_dados_pagina em modules/cache_utils.py).
+#
+# Ler o DataFrame do cache (no disco, deserializado a cada leitura) e filtrá-lo e ordená-lo inteiro
+# a cada bloco custaria o mesmo que enviar a tabela toda. Por isso o resultado filtrado e ordenado
+# (a "visão" do grid) fica num LRU do próprio processo, por (dados da página, filtros, ordenação):
+# os blocos seguintes da mesma rolagem apenas fatiam a visão já pronta.
+
+# Imports básicos
+import os
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import pandas as pd
+
+# Imports auxiliares
+from modules.esquemas import para_exibicao
+from modules.cache_utils import tamanho_resultado
+
+# Imports do dash
+import dash
+from dash import callback, clientside_callback, Input, Output, State
+
+# Tamanho do bloco pedido pelo grid a cada rolagem
+TAMANHO_BLOCO_GRID = 100
+
+# Opções do grid para o modelo de linhas no servidor (somar ao dashGridOptions de cada tabela)
+OPCOES_GRID_SERVIDOR = {
+    "cacheBlockSize": TAMANHO_BLOCO_GRID,
+    "maxBlocksInCache": 10,
+    "infiniteInitialRowCount": 1,
+    "rowBuffer": 0,
+}
+
+# Memória (MB) e tempo de vida (s) das visões do grid guardadas em cada processo
+GRID_CACHE_MB = float(os.getenv("GRID_CACHE_MB", 128))
+GRID_CACHE_TTL = int(os.getenv("GRID_CACHE_TTL", 300))
+
+
+###################################################################################
+# Filtros
+###################################################################################
+
+
+def _filtra_texto(serie, tipo, valor):
+    texto = serie.astype("string").str.lower()
+    valor = str(valor or "").lower()
+
+    if tipo == "contains":
+        return texto.str.contains(valor, regex=False).fillna(False)
+    if tipo == "notContains":
+        return ~texto.str.contains(valor, regex=False).fillna(False)
+    if tipo == "equals":
+        return (texto == valor).fillna(False)
+    if tipo == "notEqual":
+        return (texto != valor).fillna(True)
+    if tipo == "startsWith":
+        return texto.str.startswith(valor).fillna(False)
+    if tipo == "endsWith":
+        return texto.str.endswith(valor).fillna(False)
+
+    return pd.Series(True, index=serie.index)
+
+
+def _filtra_intervalo(serie, tipo, valor, valor_ate):
+    if tipo == "equals":
+        return serie == valor
+    if tipo == "notEqual":
+        return serie != valor
+    if tipo == "lessThan":
+        return serie < valor
+    if tipo == "lessThanOrEqual":
+        return serie <= valor
+    if tipo == "greaterThan":
+        return serie > valor
+    if tipo == "greaterThanOrEqual":
+        return serie >= valor
+    if tipo == "inRange":
+        return (serie >= valor) & (serie <= valor_ate)
+
+    return pd.Series(True, index=serie.index)
+
+
+def _filtra_condicao(serie, condicao):
+    # Uma condição simples de um filtro de coluna do AG Grid (agTextColumnFilter, agNumberColumnFilter, agDateColumnFilter)
+    tipo = condicao.get("type")
+
+    if tipo == "blank":
+        return serie.isna() | (serie.astype("string") == "")
+    if tipo == "notBlank":
+        return serie.notna() & (serie.astype("string") != "")
+
+    tipo_filtro = condicao.get("filterType", "text")
+    if tipo_filtro == "number":
+        numeros = pd.to_numeric(serie, errors="coerce")
+        return _filtra_intervalo(numeros, tipo, condicao.get("filter"), condicao.get("filterTo")).fillna(False)
+
+    if tipo_filtro == "date":
+        datas = pd.to_datetime(serie, errors="coerce").dt.normalize()
+        data_de = pd.to_datetime(condicao.get("dateFrom"))
+        data_ate = pd.to_datetime(condicao.get("dateTo"))
+        return _filtra_intervalo(datas, tipo, data_de, data_ate).fillna(False)
+
+    return _filtra_texto(serie, tipo, condicao.get("filter"))
+
+
+def aplica_filtros_grid(df: pd.DataFrame, filter_model: dict) -> pd.DataFrame:
+    """
+    Aplica o filterModel do AG Grid ({coluna: filtro}) ao DataFrame.
+    Filtros combinados (operator AND/OR com conditions) também são suportados.
+    """
+    if not filter_model or df.empty:
+        return df
+
+    mascara = pd.Series(True, index=df.index)
+    for coluna, filtro in filter_model.items():
+        if coluna not in df.columns:
+            continue
+
+        serie = df[coluna]
+        if "conditions" in filtro:
+            condicoes = [_filtra_condicao(serie, {"filterType": filtro.get("filterType"), **c}) for c in filtro["conditions"]]
+            if filtro.get("operator") == "OR":
+                mascara_coluna = pd.concat(condicoes, axis=1).any(axis=1)
+            else:
+                mascara_coluna = pd.concat(condicoes, axis=1).all(axis=1)
+        else:
+            mascara_coluna = _filtra_condicao(serie, filtro)
+
+        mascara &= mascara_coluna
+
+    return df[mascara]
+
+
+###################################################################################
+# Ordenação e blocos
+###################################################################################
+
+
+def aplica_ordenacao_grid(df: pd.DataFrame, sort_model: list) -> pd.DataFrame:
+    # sortModel do AG Grid: [{"colId": coluna, "sort": "asc" | "desc"}, ...]
+    ordenacao = [s for s in (sort_model or []) if s.get("colId") in df.columns]
+    if not ordenacao or df.empty:
+        return df
+
+    return df.sort_values(
+        by=[s["colId"] for s in ordenacao],
+        ascending=[s.get("sort") != "desc" for s in ordenacao],
+        na_position="last",
+        kind="mergesort",
+    )
+
+
+def visao_grid(df: pd.DataFrame, request: dict) -> pd.DataFrame:
+    # DataFrame com os filtros e a ordenação do getRowsRequest (sem o recorte do bloco)
+    df = aplica_filtros_grid(df, request.get("filterModel"))
+    return aplica_ordenacao_grid(df, request.get("sortModel"))
+
+
+def fatia_grid(visao: pd.DataFrame, request: dict) -> dict:
+    """
+    Monta o getRowsResponse de um getRowsRequest do AG Grid (rowModelType="infinite") a partir
+    da visão já filtrada e ordenada.
+
+    Returns:
+        dict: {"rowData": linhas do bloco pedido, "rowCount": total de linhas após os filtros}
+    """
+    if visao is None or visao.empty:
+        return {"rowData": [], "rowCount": 0}
+
+    inicio = request.get("startRow", 0)
+    fim = request.get("endRow", inicio + TAMANHO_BLOCO_GRID)
+
+    return {"rowData": para_exibicao(visao.iloc[inicio:fim]).to_dict("records"), "rowCount": len(visao)}
+
+
+def bloco_grid(df: pd.DataFrame, request: dict) -> dict:
+    # getRowsResponse calculado sobre o DataFrame inteiro (sem o cache das visões)
+    if df is None or df.empty:
+        return {"rowData": [], "rowCount": 0}
+
+    return fatia_grid(visao_grid(df, request), request)
+
+
+class VisoesGrid:
+    """
+    LRU, no próprio processo, das visões (DataFrames filtrados e ordenados) dos grids.
+
+    Limitado pelo total de bytes (GRID_CACHE_MB); cada visão vale por GRID_CACHE_TTL segundos.
+    As visões são guardadas sem cópia: quem lê apenas fatia o DataFrame.
+    """
+
+    def __init__(self, memoria_mb: float = GRID_CACHE_MB, ttl: int = GRID_CACHE_TTL):
+        self.memoria_max = int(memoria_mb * 1024 * 1024)
+        self.ttl = ttl
+        self.memoria_usada = 0
+        self._visoes = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def chave(id_grid: str, dados, request: dict) -> str:
+        # O bloco pedido (startRow/endRow) não faz parte da chave: todos os blocos usam a mesma visão
+        return json.dumps(
+            [id_grid, dados, request.get("filterModel") or {}, request.get("sortModel") or []],
+            sort_keys=True,
+            default=str,
+        )
+
+    def get(self, chave):
+        with self._lock:
+            entrada = self._visoes.get(chave)
+            if entrada is None:
+                return None
+
+            visao, expira_em, _ = entrada
+            if time.time() > expira_em:
+                self._remove(chave)
+                return None
+
+            self._visoes.move_to_end(chave)
+            return visao
+
+    def set(self, chave, visao):
+        tamanho = tamanho_resultado(visao)
+        if tamanho > self.memoria_max:
+            return
+
+        with self._lock:
+            if chave in self._visoes:
+                self._remove(chave)
+
+            self._visoes[chave] = (visao, time.time() + self.ttl, tamanho)
+            self.memoria_usada += tamanho
+
+            while self.memoria_usada > self.memoria_max:
+                self._remove(next(iter(self._visoes)))
+
+    def _remove(self, chave):
+        _, _, tamanho = self._visoes.pop(chave)
+        self.memoria_usada -= tamanho
+
+
+# Instância compartilhada pelos grids do processo
+visoes_grid = VisoesGrid()
+
+
+###################################################################################
+# Callbacks
+###################################################################################
+
+
+def responde_bloco(id_grid: str, request: dict, dados, le_dados) -> dict:
+    """
+    getRowsResponse do bloco pedido: o DataFrame da página só é lido, filtrado e ordenado quando a
+    visão (dados, filtros, ordenação) não está no LRU do processo.
+    """
+    chave = VisoesGrid.chave(id_grid, dados, request)
+    visao = visoes_grid.get(chave)
+    if visao is None:
+        df = le_dados(dados)
+        if df is None or df.empty:
+            return {"rowData": [], "rowCount": 0}
+
+        visao = visao_grid(df, request)
+        visoes_grid.set(chave, visao)
+
+    return fatia_grid(visao, request)
+
+
+def registra_grid_servidor(id_grid: str, id_store: str, le_dados):
+    """
+    Registra os callbacks de uma tabela com modelo de linhas no servidor.
+
+    Args:
+        id_grid (str): Id do dag.AgGrid (com rowModelType="infinite").
+        id_store (str): Id do dcc.Store com a chave dos dados materializados da tabela.
+        le_dados (callable): Função que recebe o conteúdo do store e retorna o DataFrame da tabela.
+    """
+
+    @callback(
+        Output(id_grid, "getRowsResponse"),
+        Input(id_grid, "getRowsRequest"),
+        State(id_store, "data"),
+    )
+    def responde_bloco_grid(request, dados):
+        if not request:
+            return dash.no_update
+
+        return responde_bloco(id_grid, request, dados, le_dados)
+
+    # Quando os filtros da página mudam, descarta os blocos já carregados para o grid pedir os novos dados
+    clientside_callback(
+        """
+        function(dados, id) {
+            dash_ag_grid.getApiAsync(id).then((api) => api.purgeInfiniteCache());
+            return window.dash_clientside.no_update;
+        }
+        """,
+        Output(id_grid, "scrollTo"),
+        Input(id_store, "data"),
+        State(id_grid, "id"),
+        prevent_initial_call=True,
+    )
@@ -8,14 +8,22 @@ Este serviço busca e filtra informações essenciais como produtos/peças
 para exibir de forma resumida e objetiva na interface inicial da aplicação.
 """
 
-from typing import List
+from typing import Dict, List
+import numpy as np
 import pandas as pd
 import logging
 
 # Imports auxiliares
 from modules.sql_utils import *
+from modules.cache_utils import cache_resultado
+from db import somente_leitura
 
+# Tabelas/views lidas pelas consultas da Visão Geral (invalidam o cache ao serem atualizadas)
+DEPENDENCIAS_HOME = ("os_dados", "pecas_gerais", "mat_view_retrabalho_30_dias_distinct")
 
+
+# Consultas apenas de leitura: usam as réplicas do banco quando configuradas (DB_REPLICAS)
+@somente_leitura
 class HomeService:
     """
     Serviço responsável por obter informações e dados para a página inicial home (Visão Geral).
@@ -24,6 +32,15 @@ class HomeService:
         db_engine: Instância do SQLAlchemy Engine para conexão com o banco de dados.
     """
 
+    # Resultados retornados por get_snapshot_pecas
+    CHAVES_SNAPSHOT = (
+        "custo_mensal",
+        "troca_mensal",
+        "custo_mensal_retrabalho",
+        "rank_pecas",
+        "principais_pecas",
+    )
+
     def __init__(self, db_engine: any):
         """
         Inicializa o serviço com a conexão ao banco de dados.
@@ -33,6 +50,7 @@ class HomeService:
         """
         self.db_engine = db_engine
 
+    @cache_resultado(dependencias=DEPENDENCIAS_HOME)
     def get_pecas(
         self,
         datas: List[str],
@@ -58,26 +76,25 @@ class HomeService:
             raise ValueError("O parâmetro 'datas' deve conter duas datas: [data_inicial, data_final].")
 
         try:
-            data_inicio = pd.to_datetime(datas[0]).strftime("%d/%m/%Y")
-            data_fim = pd.to_datetime(datas[1]).strftime("%d/%m/%Y")
-
-            subquery_secoes_str = subquery_secoes(lista_secoes)
-            subquery_modelo_str = subquery_modelos(lista_modelos)
-            subquery_ofcina_str = subquery_oficinas(lista_oficinas)
+            filtro = (
+                FiltroSQL()
+                .intervalo(datas)
+                .secoes(lista_secoes)
+                .modelos(lista_modelos)
+                .oficinas(lista_oficinas)
+            )
                 
 
             query = f"""
                 SELECT DISTINCT "PRODUTO" AS "LABEL"
                 FROM pecas_gerais
                 LEFT JOIN os_dados ON "NUMERO DA OS" = "OS"
-                WHERE "DATA"::DATE  BETWEEN DATE '{data_inicio}' AND DATE '{data_fim}'    
+                WHERE "DATA" >= :data_inicio AND "DATA" < :data_fim
                 and "TIPO DE MANUTENCAO" = 'Corretiva'
-                {subquery_secoes_str}
-                {subquery_modelo_str}
-                {subquery_ofcina_str}
+                {filtro}
                 ORDER BY "PRODUTO"
             """
-            return pd.read_sql(query, self.db_engine)
+            return le_sql(filtro.texto(query), self.db_engine, params=filtro.params, servico="home")
         
         except ValueError as e:
             logging.error(f"Erro ao converter datas: get_pecas {e}")
@@ -87,6 +104,7 @@ class HomeService:
             return pd.DataFrame()
         
         
+    @cache_resultado(dependencias=DEPENDENCIAS_HOME)
     def get_custo_mensal_pecas(
         self,
         datas: List[str],
@@ -130,13 +148,14 @@ class HomeService:
             raise ValueError("O parâmetro 'datas' deve conter duas datas: [data_inicial, data_final].")
         
         try:
-            data_inicio = pd.to_datetime(datas[0]).strftime("%d/%m/%Y")
-            data_fim = pd.to_datetime(datas[1]).strftime("%d/%m/%Y")
-
-            subquery_secoes_str = subquery_secoes(lista_secoes)
-            subquery_modelo_str = subquery_modelos(lista_modelos)
-            subquery_ofcina_str = subquery_oficinas(lista_oficinas)
-            subquery_pecas_str = subquery_pecas(lista_pecas)
+            filtro = (
+                FiltroSQL()
+                .intervalo(datas)
+                .secoes(lista_secoes)
+                .modelos(lista_modelos)
+                .oficinas(lista_oficinas)
+                .pecas(lista_pecas)
+            )
                 
 
             query = f"""
@@ -144,7 +163,7 @@ class HomeService:
                     SELECT DISTINCT ON (pecas_gerais."KEY_HASH")
                         TO_CHAR("DATA"::DATE, 'YYYY-MM') AS mes,
                         CASE 
-                            WHEN LOWER("PRODUTO") ILIKE '%%recond%%' THEN 'Recondicionada'
+                            WHEN LOWER("PRODUTO") ILIKE '%recond%' THEN 'Recondicionada'
                             ELSE 'Nao Recondicionada'
                         END AS tipo_peca,
                         "VALOR"
@@ -152,12 +171,9 @@ class HomeService:
                         pecas_gerais
                     LEFT JOIN 
                         os_dados ON "NUMERO DA OS" = "OS"
-                    WHERE "DATA"::DATE  BETWEEN DATE '{data_inicio}' AND DATE '{data_fim}'
+                    WHERE "DATA" >= :data_inicio AND "DATA" < :data_fim
                     and "TIPO DE MANUTENCAO" = 'Corretiva'
-                    {subquery_secoes_str}
-                    {subquery_modelo_str}
-                    {subquery_ofcina_str}
-                    {subquery_pecas_str}
+                    {filtro}
                 )
                 SELECT
                     mes,
@@ -172,7 +188,7 @@ class HomeService:
                     mes, tipo_peca;
             """
             print(query) 
-            return pd.read_sql(query, self.db_engine)
+            return le_sql(filtro.texto(query), self.db_engine, params=filtro.params, servico="home")
         
         except ValueError as e:
             logging.error(f"Erro ao converter datas: get_custo_mensal_pecas {e}")
@@ -181,6 +197,7 @@ class HomeService:
             logging.error(f"Erro ao retornar os dados: get_custo_mensal_pecas {e}")
             return pd.DataFrame()
         
+    @cache_resultado(dependencias=DEPENDENCIAS_HOME)
     def get_custo_mensal_pecas_retrabalho(
         self,
         datas: List[str],
@@ -193,13 +210,14 @@ class HomeService:
             raise ValueError("O parâmetro 'datas' deve conter duas datas: [data_inicial, data_final].")
         
         try:
-            data_inicio = pd.to_datetime(datas[0]).strftime("%d/%m/%Y")
-            data_fim = pd.to_datetime(datas[1]).strftime("%d/%m/%Y")
-
-            subquery_secoes_str = subquery_secoes(lista_secoes)
-            subquery_modelo_str = subquery_modelos(lista_modelos)
-            subquery_ofcina_str = subquery_oficinas(lista_oficinas)
-            subquery_pecas_str = subquery_pecas(lista_pecas)
+            filtro = (
+                FiltroSQL()
+                .intervalo(datas)
+                .secoes(lista_secoes)
+                .modelos(lista_modelos)
+                .oficinas(lista_oficinas)
+                .pecas(lista_pecas)
+            )
 
             query = f"""  
                 WITH pecas AS (
@@ -213,12 +231,9 @@ class HomeService:
                     FROM view_pecas_desconsiderando_combustivel
                     LEFT JOIN os_dados 
                         ON "NUMERO DA OS" = "OS"
-                    WHERE "DATA"::DATE  BETWEEN DATE '{data_inicio}' AND DATE '{data_fim}'
+                    WHERE "DATA" >= :data_inicio AND "DATA" < :data_fim
                     and "TIPO DE MANUTENCAO" = 'Corretiva'
-                    {subquery_secoes_str}
-                    {subquery_modelo_str}
-                    {subquery_ofcina_str}
-                    {subquery_pecas_str}
+                    {filtro}
                 ),
                 -- CTE INICIAL DO RETRABALHO DA OS
                 retrabalho_os AS (
@@ -256,13 +271,14 @@ class HomeService:
                 SELECT  * from retrabalho_pecas
 
             """
-            return pd.read_sql(query, self.db_engine)
+            return le_sql(filtro.texto(query), self.db_engine, params=filtro.params, servico="home")
 
         except Exception as e:
             logging.error(f"Erro ao retornar os dados: get_custo_mensal_pecas_retrabalho {e}")
             return pd.DataFrame()
 
     
+    @cache_resultado(dependencias=DEPENDENCIAS_HOME)
     def get_troca_pecas_mensal(
         self,
         datas: List[str],
@@ -305,13 +321,14 @@ class HomeService:
             raise ValueError("O parâmetro 'datas' deve conter duas datas: [data_inicial, data_final].")
         
         try:
-            data_inicio = pd.to_datetime(datas[0]).strftime("%d/%m/%Y")
-            data_fim = pd.to_datetime(datas[1]).strftime("%d/%m/%Y")
-
-            subquery_secoes_str = subquery_secoes(lista_secoes)
-            subquery_modelo_str = subquery_modelos(lista_modelos)
-            subquery_ofcina_str = subquery_oficinas(lista_oficinas)
-            subquery_pecas_str = subquery_pecas(lista_pecas)
+            filtro = (
+                FiltroSQL()
+                .intervalo(datas)
+                .secoes(lista_secoes)
+                .modelos(lista_modelos)
+                .oficinas(lista_oficinas)
+                .pecas(lista_pecas)
+            )
                 
 
             query = f"""
@@ -319,7 +336,7 @@ class HomeService:
                     SELECT DISTINCT ON (pecas_gerais."KEY_HASH")
                         TO_CHAR("DATA"::DATE, 'YYYY-MM') AS mes,
                         CASE 
-                            WHEN LOWER("PRODUTO") ILIKE '%%recond%%' THEN 'Recondicionada'
+                            WHEN LOWER("PRODUTO") ILIKE '%recond%' THEN 'Recondicionada'
                             ELSE 'Nao Recondicionada'
                         END AS tipo_peca,
                         "QUANTIDADE"
@@ -327,12 +344,9 @@ class HomeService:
                         pecas_gerais
                     LEFT JOIN 
                         os_dados ON "NUMERO DA OS" = "OS"
-                    WHERE "DATA"::DATE  BETWEEN DATE '{data_inicio}' AND DATE '{data_fim}'     
+                    WHERE "DATA" >= :data_inicio AND "DATA" < :data_fim
                     and "TIPO DE MANUTENCAO" = 'Corretiva'
-                    {subquery_secoes_str}
-                    {subquery_modelo_str}
-                    {subquery_ofcina_str}
-                    {subquery_pecas_str}
+                    {filtro}
                 )
                 SELECT
                     mes,
@@ -346,7 +360,7 @@ class HomeService:
                 ORDER BY
                     mes, tipo_peca;
             """
-            return pd.read_sql(query, self.db_engine)
+            return le_sql(filtro.texto(query), self.db_engine, params=filtro.params, servico="home")
         
         except ValueError as e:
             logging.error(f"Erro ao converter datas: get_custo_mensal_pecas {e}")
@@ -355,6 +369,7 @@ class HomeService:
             logging.error(f"Erro ao retornar os dados: get_custo_mensal_pecas {e}")
             return pd.DataFrame()
         
+    @cache_resultado(dependencias=DEPENDENCIAS_HOME)
     def get_rank_pecas(
         self,
         datas: List[str],
@@ -401,13 +416,14 @@ class HomeService:
             raise ValueError("O parâmetro 'datas' deve conter duas datas: [data_inicial, data_final].")
         
         try:
-            data_inicio = pd.to_datetime(datas[0]).strftime("%d/%m/%Y")
-            data_fim = pd.to_datetime(datas[1]).strftime("%d/%m/%Y")
-
-            subquery_secoes_str = subquery_secoes(lista_secoes)
-            subquery_modelo_str = subquery_modelos(lista_modelos)
-            subquery_ofcina_str = subquery_oficinas(lista_oficinas)
-            subquery_pecas_str = subquery_pecas(lista_pecas)
+            filtro = (
+                FiltroSQL()
+                .intervalo(datas)
+                .secoes(lista_secoes)
+                .modelos(lista_modelos)
+                .oficinas(lista_oficinas)
+                .pecas(lista_pecas)
+            )
                 
 
             query = f"""
@@ -422,12 +438,9 @@ class HomeService:
                 FROM view_pecas_desconsiderando_combustivel
                 LEFT JOIN os_dados 
                     ON "NUMERO DA OS" = "OS"
-                WHERE "DATA"::DATE  BETWEEN DATE '{data_inicio}' AND DATE '{data_fim}'
+                WHERE "DATA" >= :data_inicio AND "DATA" < :data_fim
                 and "TIPO DE MANUTENCAO" = 'Corretiva'
-                {subquery_secoes_str}
-                {subquery_modelo_str}
-                {subquery_ofcina_str}
-                {subquery_pecas_str}
+                {filtro}
             ),
             -- CTE DE RANKING PARA ALGUNS VALORES
             ranked_pecas AS (
@@ -540,7 +553,7 @@ class HomeService:
                 on pt.nome_peca = r.nome_peca
             ORDER BY r.posicao;
             """
-            return pd.read_sql(query, self.db_engine)
+            return le_sql(filtro.texto(query), self.db_engine, params=filtro.params, servico="home")
         
         except ValueError as e:
             logging.error(f"Erro ao converter datas: get_custo_mensal_pecas {e}")
@@ -549,6 +562,7 @@ class HomeService:
             logging.error(f"Erro ao retornar os dados: get_custo_mensal_pecas {e}")
             return pd.DataFrame()
         
+    @cache_resultado(dependencias=DEPENDENCIAS_HOME)
     def get_principais_pecas(
         self,
         datas: List[str],
@@ -595,13 +609,14 @@ class HomeService:
             raise ValueError("O parâmetro 'datas' deve conter duas datas: [data_inicial, data_final].")
         
         try:
-            data_inicio = pd.to_datetime(datas[0]).strftime("%d/%m/%Y")
-            data_fim = pd.to_datetime(datas[1]).strftime("%d/%m/%Y")
-
-            subquery_secoes_str = subquery_secoes(lista_secoes)
-            subquery_modelo_str = subquery_modelos(lista_modelos)
-            subquery_ofcina_str = subquery_oficinas(lista_oficinas)
-            subquery_pecas_str = subquery_pecas(lista_pecas)
+            filtro = (
+                FiltroSQL()
+                .intervalo(datas)
+                .secoes(lista_secoes)
+                .modelos(lista_modelos)
+                .oficinas(lista_oficinas)
+                .pecas(lista_pecas)
+            )
                 
 
             query = f"""
@@ -616,12 +631,9 @@ class HomeService:
                 FROM view_pecas_desconsiderando_combustivel
                 LEFT JOIN os_dados 
                     ON "NUMERO DA OS" = "OS"
-                WHERE "DATA"::DATE  BETWEEN DATE '{data_inicio}' AND DATE '{data_fim}'
+                WHERE "DATA" >= :data_inicio AND "DATA" < :data_fim
                     and "TIPO DE MANUTENCAO" = 'Corretiva'
-                {subquery_secoes_str}
-                {subquery_modelo_str}
-                {subquery_ofcina_str}
-                {subquery_pecas_str}
+                {filtro}
             ),
             -- CTE DE RANKING PARA ALGUNS VALORES
             ranked_pecas AS (
@@ -734,7 +746,7 @@ class HomeService:
                 on pt.nome_peca = r.nome_peca
             ORDER BY r.posicao;
             """
-            return pd.read_sql(query, self.db_engine)
+            return le_sql(filtro.texto(query), self.db_engine, params=filtro.params, servico="home")
         
         except ValueError as e:
             logging.error(f"Erro ao converter datas: get_custo_mensal_pecas {e}")
@@ -744,86 +756,236 @@ class HomeService:
             return pd.DataFrame()
     
 
-# -----> Arrumar alguma forma de arrumar essas função        
-    # def get_troca_pecas_rank(
-    #     self,
-    #     datas: List[str],
-    #     lista_modelos: List[str],
-    #     lista_oficinas: List[str],
-    #     lista_secoes: List[str],
-    #     lista_pecas: List[str]
-    # )-> pd.DataFrame:
-        
-    #     # Validação simples de entrada
-    #     if not datas or len(datas) != 2:
-    #         raise ValueError("O parâmetro 'datas' deve conter duas datas: [data_inicial, data_final].")
-        
-    #     try:
-    #         data_inicio = pd.to_datetime(datas[0]).strftime("%d/%m/%Y")
-    #         data_fim = pd.to_datetime(datas[1]).strftime("%d/%m/%Y")
-
-    #         subquery_secoes_str = subquery_secoes(lista_secoes)
-    #         subquery_modelo_str = subquery_modelos(lista_modelos)
-    #         subquery_ofcina_str = subquery_oficinas(lista_oficinas)
-    #         subquery_pecas_str = subquery_pecas(lista_pecas)
-                
+    @cache_resultado(dependencias=DEPENDENCIAS_HOME)
+    def get_snapshot_pecas(
+        self,
+        datas: List[str],
+        lista_modelos: List[str],
+        lista_oficinas: List[str],
+        lista_secoes: List[str],
+        lista_pecas: List[str]
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Retorna, a partir de uma única consulta ao banco, todos os dados da página Visão Geral.
+
+        As linhas de peças filtradas (pecas_gerais + os_dados) são lidas uma única vez, já marcadas
+        com o indicador de retrabalho da OS e se pertencem à view_pecas_desconsiderando_combustivel.
+        Os cinco resultados são então calculados em memória, reproduzindo as consultas de
+        get_custo_mensal_pecas, get_troca_pecas_mensal, get_custo_mensal_pecas_retrabalho,
+        get_rank_pecas e get_principais_pecas.
+
+        O resultado fica no cache de serviços (cache_resultado), de modo que os callbacks irmãos
+        disparados pela mesma mudança de filtro reaproveitam o snapshot.
+
+        Parâmetros:
+        -----------
+        datas : List[str]
+            Lista com duas datas [data_inicial, data_final].
 
-    #         query = f"""
-    #             select
-    #                 "id",
-    #                 "EQUIPAMENTO",
-    #                 "MODELO",
-    #                 "PRODUTO" AS nome_peca,
-    #                 "QUANTIDADE",
-    #                 "VALOR",
-    #                 "DATA"
-    #             FROM pecas_gerais pg
-    #             LEFT JOIN os_dados od ON "NUMERO DA OS" = "OS"
-    #             WHERE "DATA" BETWEEN '{data_inicio}' AND '{data_fim}'    
-    #                 {subquery_secoes_str}
-    #                 {subquery_modelo_str}
-    #                 {subquery_ofcina_str}
-    #                 {subquery_pecas_str};
-    #         """
-    #         df = pd.read_sql(query, self.db_engine)
-
-    #         # Removendo duplicadas e convertendo para datetime antes do agrupamento
-    #         df.drop_duplicates(subset="id", inplace=True)
-    #         df["DATA"] = pd.to_datetime(df["DATA"], dayfirst=True, errors="coerce")
-
-    #         # 1. Agrupar dados por EQUIPAMENTO, MODELO e nome_peca
-    #         df["primeiro_mes"] = df.groupby(["EQUIPAMENTO", "MODELO", "nome_peca"])["DATA"].transform("min").dt.to_period("M").dt.to_timestamp()
-    #         df["ultimo_mes"] = df.groupby(["EQUIPAMENTO", "MODELO", "nome_peca"])["DATA"].transform("max").dt.to_period("M").dt.to_timestamp()
-    #          # Verificando se as colunas "primeiro_mes" e "ultimo_mes" foram criadas corretamente
-    #         print(df[["EQUIPAMENTO", "MODELO", "nome_peca", "primeiro_mes", "ultimo_mes"]].head())  
-
-    #         # 2. Calcular quantidade total e valor total
-    #         agg = df.groupby(["EQUIPAMENTO", "MODELO", "nome_peca"]).agg(
-    #             quantidade_total=("QUANTIDADE", "sum"),
-    #             valor_total=("VALOR", lambda x: (x * df.loc[x.index, "QUANTIDADE"]).sum())
-    #         ).reset_index()
-
-    #         # 3. Calcular meses de diferença e média mensal
-    #         agg["meses"] = ((agg["ultimo_mes"].dt.year - agg["primeiro_mes"].dt.year) * 12 +
-    #                         (agg["ultimo_mes"].dt.month - agg["primeiro_mes"].dt.month))
-    #         agg["media_mensal"] = agg["valor_total"] / agg["meses"].replace(0, pd.NA)
-
-    #         # 4. Calcular média por modelo
-    #         media_modelo = agg.groupby(["MODELO", "nome_peca"])["valor_total"].mean().reset_index(name="valor_medio_modelo")
-
-    #         # 5. Adicionar média do modelo diretamente no agg
-    #         agg = agg.merge(media_modelo, on=["MODELO", "nome_peca"], how="left")
-
-    #         # 6. Calcular a diferença de valor
-    #         agg["diferenca_valor"] = agg["valor_total"] - agg["valor_medio_modelo"]
-
-    #         # 7. Ordenar os resultados por quantidade
-    #         agg = agg.sort_values("quantidade_total", ascending=False)
-
-    #         return agg
-    #     except ValueError as e:
-    #         logging.error(f"Erro ao converter datas: get_custo_mensal_pecas {e}")
-    #         return pd.DataFrame()
-    #     except Exception as e:
-    #         logging.error(f"Erro ao retornar os dados: get_custo_mensal_pecas {e}")
-    #         return pd.DataFrame()        
+        lista_modelos, lista_oficinas, lista_secoes, lista_pecas : List[str]
+            Filtros aplicados às peças.
+
+        Retorno:
+        --------
+        Dict[str, pd.DataFrame]
+            Dicionário com as chaves 'custo_mensal', 'troca_mensal', 'custo_mensal_retrabalho',
+            'rank_pecas' e 'principais_pecas'. Em caso de erro, todos os DataFrames são vazios.
+        """
+        # Validação simples de entrada
+        if not datas or len(datas) != 2:
+            raise ValueError("O parâmetro 'datas' deve conter duas datas: [data_inicial, data_final].")
+
+        try:
+            df_fatos = self._get_fatos_pecas(datas, lista_modelos, lista_oficinas, lista_secoes, lista_pecas)
+            df_view = df_fatos[df_fatos["desconsidera_combustivel"]]
+
+            df_rank = self._calcula_rank_pecas(df_view)
+            snapshot = {
+                "custo_mensal": self._calcula_mensal_por_tipo(df_fatos, "VALOR", "custo_total"),
+                "troca_mensal": self._calcula_mensal_por_tipo(df_fatos, "QUANTIDADE", "quantidade_total"),
+                "custo_mensal_retrabalho": self._calcula_custo_mensal_retrabalho(df_view),
+                "rank_pecas": df_rank,
+                "principais_pecas": df_rank.copy(),
+            }
+
+        except ValueError as e:
+            logging.error(f"Erro ao converter datas: get_snapshot_pecas {e}")
+            return {nome: pd.DataFrame() for nome in self.CHAVES_SNAPSHOT}
+        except Exception as e:
+            logging.error(f"Erro ao retornar os dados: get_snapshot_pecas {e}")
+            return {nome: pd.DataFrame() for nome in self.CHAVES_SNAPSHOT}
+
+        return snapshot
+
+    def _get_fatos_pecas(
+        self,
+        datas: List[str],
+        lista_modelos: List[str],
+        lista_oficinas: List[str],
+        lista_secoes: List[str],
+        lista_pecas: List[str]
+    ) -> pd.DataFrame:
+        """
+        Lê as linhas de peças (uma por KEY_HASH) que atendem aos filtros, já com as informações
+        de retrabalho da OS agregadas por número de OS.
+        """
+        filtro = (
+            FiltroSQL()
+            .intervalo(datas)
+            .secoes(lista_secoes)
+            .modelos(lista_modelos)
+            .oficinas(lista_oficinas)
+            .pecas(lista_pecas)
+        )
+
+        query = f"""
+            WITH pecas AS (
+                SELECT DISTINCT ON (pecas_gerais."KEY_HASH")
+                    pecas_gerais."KEY_HASH",
+                    "PRODUTO" AS nome_peca,
+                    "QUANTIDADE",
+                    "VALOR",
+                    "OS",
+                    TO_CHAR("DATA"::DATE, 'YYYY-MM') AS mes
+                FROM
+                    pecas_gerais
+                LEFT JOIN
+                    os_dados ON "NUMERO DA OS" = "OS"
+                WHERE "DATA" >= :data_inicio AND "DATA" < :data_fim
+                and "TIPO DE MANUTENCAO" = 'Corretiva'
+                {filtro}
+            ),
+            -- RETRABALHO AGREGADO POR OS (QUANTIDADE DE LINHAS DA OS NA VIEW E SE FOI RETRABALHO)
+            retrabalho_os AS (
+                SELECT
+                    "NUMERO DA OS",
+                    COUNT(*) AS qtd_linhas_retrabalho,
+                    BOOL_OR("retrabalho") AS retrabalho
+                FROM mat_view_retrabalho_30_dias_distinct
+                where "TIPO DE MANUTENCAO" = 'Corretiva'
+                GROUP BY "NUMERO DA OS"
+            )
+            SELECT
+                p.*,
+                p."KEY_HASH" IN (
+                    SELECT "KEY_HASH" FROM view_pecas_desconsiderando_combustivel
+                ) AS desconsidera_combustivel,
+                COALESCE(r.qtd_linhas_retrabalho, 0) AS qtd_linhas_retrabalho,
+                COALESCE(r.retrabalho, FALSE) AS retrabalho
+            FROM pecas p
+            LEFT JOIN retrabalho_os r
+                ON p."OS" = r."NUMERO DA OS";
+        """
+        df = le_sql(filtro.texto(query), self.db_engine, params=filtro.params, servico="home")
+        df["desconsidera_combustivel"] = df["desconsidera_combustivel"].astype(bool)
+        df["retrabalho"] = df["retrabalho"].astype(bool)
+        return df
+
+    @staticmethod
+    def _calcula_mensal_por_tipo(df_fatos: pd.DataFrame, coluna: str, nome_total: str) -> pd.DataFrame:
+        """
+        Soma a coluna informada por mês e tipo de peça (recondicionada ou não).
+        Equivale às consultas de get_custo_mensal_pecas e get_troca_pecas_mensal.
+        """
+        df = df_fatos[["mes", "nome_peca", coluna]].copy()
+        df["tipo_peca"] = np.where(
+            df["nome_peca"].str.lower().str.contains("recond", na=False),
+            "Recondicionada",
+            "Nao Recondicionada",
+        )
+        df_mensal = df.groupby(["mes", "tipo_peca"], as_index=False)[coluna].sum()
+        df_mensal[coluna] = df_mensal[coluna].astype(float).round(2)
+        df_mensal = df_mensal.rename(columns={coluna: nome_total})
+        return df_mensal.sort_values(["mes", "tipo_peca"]).reset_index(drop=True)
+
+    @staticmethod
+    def _expande_retrabalho(df_view: pd.DataFrame) -> pd.DataFrame:
+        """
+        Reproduz o LEFT JOIN das peças com mat_view_retrabalho_30_dias_distinct.
+
+        Cada peça vira max(qtd_linhas_retrabalho, 1) linhas no join. A coluna 'qtde_linhas' segue
+        o COUNT(*) OVER (PARTITION BY "PRODUTO", r."NUMERO DA OS") das consultas originais,
+        onde as peças sem retrabalho caem todas na partição (PRODUTO, NULL).
+        """
+        df = df_view.copy()
+        df["linhas_join"] = df["qtd_linhas_retrabalho"].clip(lower=1)
+        df["os_retrabalho"] = df["OS"].where(df["qtd_linhas_retrabalho"] > 0)
+        df["qtde_linhas"] = df.groupby(["nome_peca", "os_retrabalho"], dropna=False)["linhas_join"].transform("sum")
+        return df
+
+    @classmethod
+    def _calcula_custo_mensal_retrabalho(cls, df_view: pd.DataFrame) -> pd.DataFrame:
+        """
+        Calcula o gasto e a quantidade mensais de peças em OS de retrabalho.
+        Equivale à consulta de get_custo_mensal_pecas_retrabalho.
+        """
+        df = cls._expande_retrabalho(df_view)
+        df = df[df["qtde_linhas"] == 1]
+        df = df.assign(
+            total_gasto_retrabalho=df["VALOR"].where(df["retrabalho"], 0),
+            total_quantidade_retrabalho=df["QUANTIDADE"].where(df["retrabalho"], 0),
+        )
+        df_mensal = df.groupby("mes", as_index=False)[["total_gasto_retrabalho", "total_quantidade_retrabalho"]].sum()
+        return df_mensal.sort_values("mes").reset_index(drop=True)
+
+    @classmethod
+    def _calcula_rank_pecas(cls, df_view: pd.DataFrame) -> pd.DataFrame:
+        """
+        Calcula o ranking de peças por valor gasto, com o percentual de retrabalho e o indicador
+        de confiabilidade. Equivale às consultas de get_rank_pecas e get_principais_pecas.
+        """
+        # CTE ranked_pecas
+        df_rank = df_view.groupby("nome_peca", as_index=False).agg(
+            quantidade=("QUANTIDADE", "sum"),
+            frequencia=("QUANTIDADE", "size"),
+            valor_total=("VALOR", "sum"),
+        )
+        df_rank["valor_por_unidade"] = df_rank["valor_total"] / df_rank["quantidade"].replace(0, np.nan)
+        df_rank["posicao"] = df_rank["valor_total"].rank(method="min", ascending=False).astype(int)
+
+        # CTE retrabalho_pecas (apenas os grupos com uma única linha no join)
+        df_join = cls._expande_retrabalho(df_view)
+        df_sem_duplicadas = df_join[df_join["qtde_linhas"] == 1]
+        df_retrabalho = (
+            df_sem_duplicadas.assign(gasto_retrabalho=df_sem_duplicadas["VALOR"].where(df_sem_duplicadas["retrabalho"], 0))
+            .groupby("nome_peca", as_index=False)
+            .agg(total_gasto_retrabalho=("gasto_retrabalho", "sum"), total_gasto=("VALOR", "sum"))
+        )
+
+        # CTEs contagem / classificacao / percentuais (por peça e número da OS)
+        df_contagem = df_join.groupby(["nome_peca", "OS"], as_index=False, dropna=False)["linhas_join"].sum()
+        df_contagem["unica"] = (df_contagem["linhas_join"] == 1).astype(int)
+        df_contagem["duplicada"] = (df_contagem["linhas_join"] > 1).astype(int)
+        df_percentuais = df_contagem.groupby("nome_peca", as_index=False).agg(
+            perc_unica=("unica", "mean"),
+            perc_duplicada=("duplicada", "mean"),
+        )
+        df_percentuais["perc_unica"] = (df_percentuais["perc_unica"] * 100).round(2)
+        df_percentuais["perc_duplicada"] = (df_percentuais["perc_duplicada"] * 100).round(2)
+
+        # Cálculo final
+        df = df_rank.merge(df_retrabalho, on="nome_peca", how="left").merge(df_percentuais, on="nome_peca", how="left")
+        df["total_gasto_retrabalho"] = df["total_gasto_retrabalho"].fillna(0)
+        df["total_gasto_com_left"] = df["total_gasto"].fillna(0)
+        df["perc_gasto_retrabalho"] = (
+            (df["total_gasto_retrabalho"] / df["valor_total"].replace(0, np.nan)) * 100
+        ).round(2).fillna(0)
+        df = df.rename(columns={"perc_unica": "indicador_confiabibilidade_retrabalho"})
+
+        for coluna in ["quantidade", "frequencia", "valor_total", "valor_por_unidade", "total_gasto_retrabalho", "total_gasto_com_left"]:
+            df[coluna] = df[coluna].astype(float).round(2)
+
+        colunas = [
+            "posicao",
+            "nome_peca",
+            "quantidade",
+            "frequencia",
+            "valor_total",
+            "valor_por_unidade",
+            "total_gasto_retrabalho",
+            "total_gasto_com_left",
+            "perc_gasto_retrabalho",
+            "indicador_confiabibilidade_retrabalho",
+            "perc_duplicada",
+        ]
+        return df.sort_values("posicao")[colunas].reset_index(drop=True)
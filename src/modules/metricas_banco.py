@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Métricas das consultas ao banco (por processo)
+#
+# Registra, por serviço, a quantidade de consultas, quantas estouraram o tempo máximo
+# (statement_timeout ou espera por conexão da pool) e o tempo de espera por uma conexão livre.
+# Esperas longas indicam pool pequena para a carga (DB_POOL_SIZE / DB_MAX_OVERFLOW).
+# As métricas ficam na memória do processo: cada worker do gunicorn tem as suas.
+
+# Imports básicos
+import os
+import time
+from collections import deque
+from threading import Lock
+
+import numpy as np
+
+# Imports do flask
+from flask import jsonify
+
+# Rota das métricas
+ROTA_METRICAS = "/metricas/banco"
+
+# Quantidade de esperas guardadas por serviço para as estatísticas
+METRICAS_JANELA = int(os.getenv("METRICAS_JANELA", 1000))
+
+
+class MetricasBanco:
+    """
+    Contadores e últimas esperas por conexão de cada serviço.
+    """
+
+    def __init__(self, janela: int = METRICAS_JANELA):
+        self.janela = janela
+        self._servicos = {}
+        self._lock = Lock()
+
+    def _servico(self, servico):
+        if servico not in self._servicos:
+            self._servicos[servico] = {"consultas": 0, "estouros": 0, "esperas": deque(maxlen=self.janela)}
+        return self._servicos[servico]
+
+    def registra_espera(self, servico: str, segundos: float):
+        # Tempo até obter uma conexão da pool (uma vez por consulta)
+        with self._lock:
+            dados = self._servico(servico)
+            dados["consultas"] += 1
+            dados["esperas"].append(segundos * 1000)
+
+    def registra_estouro(self, servico: str):
+        with self._lock:
+            self._servico(servico)["estouros"] += 1
+
+    def resumo(self, engine=None, replicas: list = None) -> dict:
+        """
+        Métricas de cada serviço (esperas em ms) e, se informados, o estado da pool do engine e das réplicas.
+        """
+        with self._lock:
+            servicos = {}
+            for servico, dados in self._servicos.items():
+                esperas = np.array(dados["esperas"])
+                servicos[servico] = {
+                    "consultas": dados["consultas"],
+                    "estouros": dados["estouros"],
+                    "espera_media_ms": round(float(esperas.mean()), 2) if esperas.size else 0,
+                    "espera_p95_ms": round(float(np.percentile(esperas, 95)), 2) if esperas.size else 0,
+                    "espera_max_ms": round(float(esperas.max()), 2) if esperas.size else 0,
+                }
+
+        resumo = {"pid": os.getpid(), "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S"), "servicos": servicos}
+        if engine is not None:
+            pool = engine.pool
+            resumo["pool"] = {
+                "tamanho": pool.size(),
+                "em_uso": pool.checkedout(),
+                "livres": pool.checkedin(),
+                "overflow": pool.overflow(),
+            }
+        if replicas:
+            resumo["replicas"] = replicas
+
+        return resumo
+
+
+# Instância compartilhada pelas consultas do processo
+metricas_banco = MetricasBanco()
+
+
+def registra_rota_metricas(server):
+    """
+    Registra a rota GET ROTA_METRICAS, com as métricas do worker que atendeu a requisição (JSON).
+    """
+
+    @server.route(ROTA_METRICAS)
+    def metricas():
+        # Import tardio: não cria o engine se ele ainda não foi usado
+        from db import PostgresSingleton
+
+        banco = PostgresSingleton.get_instance()
+        return jsonify(metricas_banco.resumo(banco.get_engine(), banco.estado_replicas()))
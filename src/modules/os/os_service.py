@@ -4,7 +4,14 @@ import logging
 
 # Imports auxiliares
 from modules.sql_utils import *
+from modules.cache_utils import cache_resultado
+from db import somente_leitura
 
+# Tabelas/views lidas pelas consultas de OS (invalidam o cache ao serem atualizadas)
+DEPENDENCIAS_OS = ("os_dados", "pecas_gerais")
+
+# Consultas apenas de leitura: usam as réplicas do banco quando configuradas (DB_REPLICAS)
+@somente_leitura
 class ServiceOS:
     """
     Classe responsável por fornecer serviços relacionados a Ordens de Serviço (OS),
@@ -20,6 +27,7 @@ class ServiceOS:
         """
         self.db_engine = db_engine
 
+    @cache_resultado(dependencias=DEPENDENCIAS_OS)
     def get_os(
         self,
         datas: List[str],
@@ -47,14 +55,14 @@ class ServiceOS:
             raise ValueError("O parâmetro 'datas' deve conter duas datas: [data_inicial, data_final].")
 
         try:
-            # Converte as datas para o formato desejado (dd/mm/yyyy)
-            data_inicio = pd.to_datetime(datas[0]).strftime("%d/%m/%Y")
-            data_fim = pd.to_datetime(datas[1]).strftime("%d/%m/%Y")
-
-            # Gera subqueries SQL a partir das listas de filtros
-            subquery_secoes_str = subquery_secoes(lista_secoes)
-            subquery_modelo_str = subquery_modelos(lista_modelos)
-            subquery_ofcina_str = subquery_oficinas(lista_oficinas)
+            # Gera os filtros (período e listas) como parâmetros vinculados
+            filtro = (
+                FiltroSQL()
+                .intervalo(datas)
+                .secoes(lista_secoes)
+                .modelos(lista_modelos)
+                .oficinas(lista_oficinas)
+            )
 
             # Monta a query final com os filtros aplicados
             query = f"""
@@ -62,16 +70,14 @@ class ServiceOS:
                     "DESCRICAO DO SERVICO" as "LABEL"
                 FROM os_dados
                 LEFT JOIN view_pecas_desconsiderando_combustivel ON "NUMERO DA OS" = "OS"
-                WHERE "DATA"::DATE  BETWEEN DATE '{data_inicio}' AND DATE '{data_fim}'
+                WHERE "DATA" >= :data_inicio AND "DATA" < :data_fim
                 and "TIPO DE MANUTENCAO" = 'Corretiva'
-                {subquery_secoes_str}
-                {subquery_modelo_str}
-                {subquery_ofcina_str}
+                {filtro}
                 ORDER BY "DESCRICAO DO SERVICO";
             """
 
             # Executa a consulta e retorna os dados como DataFrame
-            return pd.read_sql(query, self.db_engine)
+            return le_sql(filtro.texto(query), self.db_engine, params=filtro.params, servico="os")
 
         except ValueError as e:
             # Erro ao converter datas
@@ -83,6 +89,7 @@ class ServiceOS:
             logging.error(f"Erro ao retornar os dados: get_os - {e}")
             return pd.DataFrame()
         
+    @cache_resultado(dependencias=DEPENDENCIAS_OS)
     def get_pecas_trocadas_por_os(
         self,
         datas: List[str],
@@ -96,15 +103,15 @@ class ServiceOS:
             raise ValueError("O parâmetro 'datas' deve conter duas datas: [data_inicial, data_final].")
 
         try:
-            # Converte as datas para o formato desejado (dd/mm/yyyy)
-            data_inicio = pd.to_datetime(datas[0]).strftime("%d/%m/%Y")
-            data_fim = pd.to_datetime(datas[1]).strftime("%d/%m/%Y")
-
-            # Gera subqueries SQL a partir das listas de filtros
-            subquery_secoes_str = subquery_secoes(lista_secoes)
-            subquery_modelo_str = subquery_modelos(lista_modelos)
-            subquery_ofcina_str = subquery_oficinas(lista_oficinas)
-            subquery_os_str = subquery_os(lista_os)
+            # Gera os filtros (período e listas) como parâmetros vinculados
+            filtro = (
+                FiltroSQL()
+                .intervalo(datas)
+                .secoes(lista_secoes)
+                .modelos(lista_modelos)
+                .oficinas(lista_oficinas)
+                .os(lista_os)
+            )
 
             # Monta a query final com os filtros aplicados
             query = f"""
@@ -115,16 +122,13 @@ class ServiceOS:
                 LEFT JOIN 
                         os_dados ON "NUMERO DA OS" = "OS"
                 WHERE 
-                    "DATA"::DATE  BETWEEN DATE '{data_inicio}' AND DATE '{data_fim}'
+                    "DATA" >= :data_inicio AND "DATA" < :data_fim
                         and "TIPO DE MANUTENCAO" = 'Corretiva'
-                    {subquery_secoes_str}
-                    {subquery_modelo_str}
-                    {subquery_ofcina_str}
-                    {subquery_os_str}
+                    {filtro}
                 GROUP BY "PRODUTO"
                 ORDER BY total_trocas DESC;
             """
-            df = pd.read_sql(query, self.db_engine)
+            df = le_sql(filtro.texto(query), self.db_engine, params=filtro.params, servico="os")
             df["percentual"] = (df["total_trocas"] / df["total_trocas"].sum()) * 100
             # Executa a consulta e retorna os dados como DataFrame
             return df
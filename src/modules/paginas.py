@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Carregamento preguiçoso das páginas (PAGINAS_LAZY)
+#
+# Por padrão o dash importa todos os módulos de pages/ ao criar o app, e cada worker do gunicorn
+# paga o import de todas as páginas (plotly.express, dash_ag_grid, serviços, ...) antes de atender.
+# No modo preguiçoso, o app registra as páginas apenas com os metadados do dash.register_page de
+# cada arquivo (lidos sem executá-lo) e o módulo da página só é importado na primeira requisição
+# daquele caminho; as requisições internas do dash (/_dash-*) e as rotas das páginas (ex: exportação)
+# são associadas à página pelo Referer.
+#
+# O navegador recebe a lista de callbacks (/_dash-dependencies) apenas ao carregar a página, então
+# no modo preguiçoso a navegação entre as páginas recarrega a página inteira (external_link no menu).
+#
+# O modo preguiçoso usa partes internas do dash (callbacks globais, _got_first_request, _callback_list
+# e a chave ignore_register_page do contexto), que mudam entre versões: se alguma não existir, as
+# páginas são importadas ao criar o app, como no modo normal, e um aviso é registrado no log.
+
+# Imports básicos
+import os
+import ast
+import time
+import logging
+import importlib
+from threading import RLock
+from urllib.parse import urlparse
+
+# Imports do dash / flask
+import dash
+from flask import request
+
+# Partes internas do dash usadas no modo preguiçoso (ver _internos_dash_disponiveis)
+try:
+    from dash import _callback
+    from dash._callback_context import context_value
+except ImportError:
+    _callback = None
+    context_value = None
+
+# Liga o modo preguiçoso
+PAGINAS_LAZY = os.getenv("PAGINAS_LAZY", "False").lower() in ("true", "1", "yes")
+
+# Diretório e pacote das páginas
+DIR_PAGINAS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pages")
+PACOTE_PAGINAS = "pages"
+
+# Página exibida nos caminhos desconhecidos (o dash a reconhece pelo nome do módulo)
+ARQUIVO_PAGINA_404 = "not_found_404.py"
+
+# Páginas já importadas neste processo
+_paginas_carregadas = set()
+_lock_paginas = RLock()
+
+
+###################################################################################
+# Metadados
+###################################################################################
+
+
+def le_metadados_paginas(diretorio: str = DIR_PAGINAS) -> list:
+    """
+    Lê os argumentos do dash.register_page de cada arquivo de páginas, sem importá-lo.
+
+    Returns:
+        list: [{"module": "pages.<arquivo>", "name": ..., "path": ..., ...}, ...]
+    """
+    paginas = []
+    for arquivo in sorted(os.listdir(diretorio)):
+        if arquivo.startswith(("_", ".")) or not arquivo.endswith(".py"):
+            continue
+
+        with open(os.path.join(diretorio, arquivo), encoding="utf-8") as f:
+            arvore = ast.parse(f.read(), filename=arquivo)
+
+        for no in ast.walk(arvore):
+            if (
+                isinstance(no, ast.Call)
+                and isinstance(no.func, ast.Attribute)
+                and no.func.attr == "register_page"
+            ):
+                # Apenas argumentos literais (name, path, icon, ...) podem ser lidos sem executar o módulo
+                metadados = {kw.arg: ast.literal_eval(kw.value) for kw in no.keywords}
+                metadados["module"] = f"{PACOTE_PAGINAS}.{arquivo[:-3]}"
+                paginas.append(metadados)
+                break
+
+    return paginas
+
+
+###################################################################################
+# Carregamento
+###################################################################################
+
+
+def carrega_pagina(app, modulo: str):
+    """
+    Importa o módulo da página (uma única vez por processo) e registra no app os callbacks dele.
+    """
+    if modulo in _paginas_carregadas:
+        return
+
+    with _lock_paginas:
+        if modulo in _paginas_carregadas:
+            return
+
+        # A página já foi registrada com os metadados: o dash.register_page do módulo é ignorado
+        # (ele não pode ser chamado durante uma requisição), como o dash faz nos callbacks em segundo plano
+        inicio = time.perf_counter()
+        token = context_value.set({"ignore_register_page": True})
+        try:
+            pagina = importlib.import_module(modulo)
+        finally:
+            context_value.reset(token)
+
+        dash.page_registry[modulo]["layout"] = pagina.layout
+
+        # Depois da primeira requisição o dash não lê mais os callbacks globais (dash.callback);
+        # os callbacks da página são copiados para o app como o dash faz ao iniciar o servidor
+        if app._got_first_request["setup_server"]:
+            for chave in list(_callback.GLOBAL_CALLBACK_MAP):
+                app.callback_map[chave] = _callback.GLOBAL_CALLBACK_MAP.pop(chave)
+            app._callback_list.extend(_callback.GLOBAL_CALLBACK_LIST)
+            _callback.GLOBAL_CALLBACK_LIST.clear()
+
+        _paginas_carregadas.add(modulo)
+        logging.info(f"Página {modulo} carregada em {time.perf_counter() - inicio:.2f} s")
+
+
+def _layout_lazy(app, modulo: str):
+    # Layout registrado antes do import: carrega a página e delega ao layout dela (função ou componente)
+    def layout(**kwargs):
+        carrega_pagina(app, modulo)
+        layout_pagina = dash.page_registry[modulo]["layout"]
+        return layout_pagina(**kwargs) if callable(layout_pagina) else layout_pagina
+
+    return layout
+
+
+def _pagina_da_requisicao(app):
+    # Requisições internas do dash e rotas auxiliares são associadas à página pelo Referer
+    caminho = request.path
+    if caminho.startswith(("/_dash", "/_reload", "/assets/", "/_favicon")) or request.method == "POST":
+        caminho = urlparse(request.referrer or "").path
+
+    caminho = app.strip_relative_path(caminho or "/") or ""
+    for modulo, pagina in dash.page_registry.items():
+        if pagina["path"].strip("/") == caminho.strip("/"):
+            return modulo
+
+    return None
+
+
+def _internos_dash_disponiveis(app) -> bool:
+    # Partes internas do dash das quais o modo preguiçoso depende (ver carrega_pagina)
+    if _callback is None or context_value is None:
+        return False
+    if not all(hasattr(_callback, nome) for nome in ("GLOBAL_CALLBACK_MAP", "GLOBAL_CALLBACK_LIST")):
+        return False
+    if not isinstance(getattr(app, "_got_first_request", None), dict) or "setup_server" not in app._got_first_request:
+        return False
+    if not isinstance(getattr(app, "_callback_list", None), list):
+        return False
+
+    # O dash.register_page precisa ignorar o registro com a chave ignore_register_page no contexto
+    sonda = f"{PACOTE_PAGINAS}._sonda_paginas_lazy"
+    token = context_value.set({"ignore_register_page": True})
+    try:
+        dash.register_page(sonda, path=f"/{sonda}", layout="")
+    except Exception:
+        pass
+    finally:
+        context_value.reset(token)
+
+    return dash.page_registry.pop(sonda, None) is None
+
+
+def _metadados_pagina_404(paginas: list):
+    # O not_found_404.py não chama dash.register_page: registrado com o caminho do comentário do arquivo
+    modulo = f"{PACOTE_PAGINAS}.{ARQUIVO_PAGINA_404[:-3]}"
+    if not os.path.exists(os.path.join(DIR_PAGINAS, ARQUIVO_PAGINA_404)):
+        return None
+    if any(pagina["module"] == modulo for pagina in paginas):
+        return None
+    return {"module": modulo, "path": "/404"}
+
+
+def _registra_paginas_importando(paginas: list):
+    # Modo normal: cada módulo chama o próprio dash.register_page e os callbacks são lidos ao iniciar o servidor
+    for metadados in paginas:
+        modulo = metadados["module"]
+        pagina = importlib.import_module(modulo)
+        if modulo not in dash.page_registry:
+            dash.register_page(modulo, **{chave: valor for chave, valor in metadados.items() if chave != "module"})
+        if dash.page_registry[modulo].get("layout") is None:
+            dash.page_registry[modulo]["layout"] = pagina.layout
+
+
+def registra_paginas_lazy(app):
+    """
+    Registra as páginas de pages/ sem importá-las (o app deve ser criado com pages_folder="").
+
+    Se as partes internas do dash usadas no carregamento não existirem nesta versão, importa todas as
+    páginas agora (como no modo normal) e registra um aviso no log.
+    """
+    paginas = le_metadados_paginas(DIR_PAGINAS)
+    pagina_404 = _metadados_pagina_404(paginas)
+    if pagina_404 is not None:
+        paginas.append(pagina_404)
+
+    if not _internos_dash_disponiveis(app):
+        logging.warning(
+            f"PAGINAS_LAZY ignorado: partes internas do dash {dash.__version__} usadas no carregamento "
+            "preguiçoso não encontradas; páginas importadas ao criar o app"
+        )
+        _registra_paginas_importando(paginas)
+        return
+
+    for metadados in paginas:
+        modulo = metadados.pop("module")
+        dash.register_page(modulo, layout=_layout_lazy(app, modulo), **metadados)
+
+    @app.server.before_request
+    def carrega_pagina_da_requisicao():
+        modulo = _pagina_da_requisicao(app)
+        if modulo is not None:
+            carrega_pagina(app, modulo)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Relatório do custo de import dos módulos na inicialização
+#
+# Executa o import das páginas (ou de outros módulos) num processo novo com "python -X importtime"
+# e resume o tempo gasto: o custo de cada módulo de nível superior (ex: pages.home) e os módulos mais
+# pesados, com a página que os importou primeiro. No modo padrão os imports acontecem em sequência num
+# único processo, como num worker do gunicorn, e as dependências compartilhadas contam para a primeira
+# página que as importa; com --isolado cada módulo é medido num processo próprio.
+#
+# Uso (a partir do diretório src):
+#   python -m modules.perfil_importacao
+#   python -m modules.perfil_importacao --alvos pages.vida_util --top 40 --csv perfil.csv
+
+# Imports básicos
+import os
+import re
+import sys
+import logging
+import argparse
+import subprocess
+
+import pandas as pd
+
+# Imports auxiliares
+from modules.paginas import le_metadados_paginas
+
+# Diretório src (os módulos são importados a partir dele, como no gunicorn)
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Carrega o .env e cria o app com páginas antes dos imports (o dash.register_page das páginas exige um app)
+CODIGO_APP = (
+    "from dotenv import load_dotenv; load_dotenv(); "
+    'import dash; app = dash.Dash(__name__, use_pages=True, pages_folder="")'
+)
+
+# Linha do -X importtime: "import time:  self [us] | cumulative | imported package"
+PADRAO_LINHA = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def mede_importacao(alvos: list) -> pd.DataFrame:
+    """
+    Importa os alvos, em sequência, num processo novo com -X importtime.
+
+    Returns:
+        pd.DataFrame: Uma linha por módulo importado, na ordem do import, com proprio_ms, cumulativo_ms,
+            nivel (0 = import feito diretamente pelo processo) e importado_por (módulo de nível 0).
+    """
+    codigo = "; ".join([CODIGO_APP] + [f"import {alvo}" for alvo in alvos])
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=DIR_SRC,
+        capture_output=True,
+        text=True,
+    )
+    if processo.returncode != 0:
+        erro = processo.stderr.strip().splitlines()
+        logging.error(f"Erro ao importar {', '.join(alvos)}: {erro[-1] if erro else processo.returncode}")
+
+    linhas = []
+    for linha in processo.stderr.splitlines():
+        encontrado = PADRAO_LINHA.match(linha)
+        if encontrado is None:
+            continue
+        proprio, cumulativo, recuo, modulo = encontrado.groups()
+        linhas.append(
+            {
+                "modulo": modulo,
+                "proprio_ms": int(proprio) / 1000,
+                "cumulativo_ms": int(cumulativo) / 1000,
+                "nivel": (len(recuo) - 1) // 2,
+            }
+        )
+
+    df = pd.DataFrame(linhas, columns=["modulo", "proprio_ms", "cumulativo_ms", "nivel"])
+
+    # O -X importtime lista cada módulo ao terminar o import dele: os filhos vêm antes do módulo de nível 0
+    importado_por = []
+    pendentes = 0
+    for indice, linha in enumerate(df.itertuples()):
+        if linha.nivel == 0:
+            importado_por.extend([linha.modulo] * (indice + 1 - pendentes))
+            pendentes = indice + 1
+    importado_por.extend([None] * (len(df) - len(importado_por)))
+    df["importado_por"] = importado_por
+
+    return df
+
+
+def gera_relatorio(df: pd.DataFrame, top: int = 25) -> str:
+    """
+    Texto do relatório: custo dos módulos de nível 0 e os módulos mais pesados.
+    """
+    nivel_0 = df[df["nivel"] == 0].sort_values("cumulativo_ms", ascending=False)
+    mais_pesados = df.sort_values("proprio_ms", ascending=False).head(top)
+
+    return "\n".join(
+        [
+            f"Total: {nivel_0['cumulativo_ms'].sum():.0f} ms em {len(df)} módulos",
+            "",
+            "Custo por módulo de nível superior (ms):",
+            nivel_0[["modulo", "cumulativo_ms"]].to_string(index=False),
+            "",
+            f"{top} módulos mais pesados (tempo próprio, ms):",
+            mais_pesados[["modulo", "proprio_ms", "cumulativo_ms", "importado_por"]].to_string(index=False),
+        ]
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o custo de import dos módulos na inicialização")
+    parser.add_argument("--alvos", nargs="+", help="módulos a importar (padrão: todas as páginas)")
+    parser.add_argument("--top", type=int, default=25, help="quantidade de módulos mais pesados listados")
+    parser.add_argument("--isolado", action="store_true", help="mede cada alvo num processo próprio")
+    parser.add_argument("--csv", help="grava a medição completa neste arquivo")
+    args = parser.parse_args()
+
+    alvos = args.alvos or [pagina["module"] for pagina in le_metadados_paginas()]
+
+    if args.isolado:
+        medicoes = []
+        for alvo in alvos:
+            df_alvo = mede_importacao([alvo])
+            print(f"=== {alvo}\n{gera_relatorio(df_alvo, args.top)}\n")
+            medicoes.append(df_alvo.assign(alvo=alvo))
+        df = pd.concat(medicoes, ignore_index=True)
+    else:
+        df = mede_importacao(alvos)
+        print(gera_relatorio(df, args.top))
+
+    if args.csv:
+        df.to_csv(args.csv, index=False)
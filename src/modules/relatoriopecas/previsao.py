@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Previsão da próxima troca de peças (relatório de peças)
+#
+# Cálculos vetorizados (NumPy/pandas) que antes eram feitos pelas CTEs media_pecas, estimativa
+# e calculo_previsao_dia do RelatorioPecasService. Recebem as trocas já lidas do banco
+# (RelatorioPecasService.get_trocas_previsao) e produzem as mesmas colunas da consulta SQL,
+# de modo que uma única leitura alimenta a tabela, o boxplot e os gráficos mensais.
+#
+# Os valores NULL do SQL são representados por NaN:
+#   - operações aritméticas com NaN resultam em NaN, como com NULL;
+#   - comparações com NaN são falsas, o que equivale ao ELSE dos CASE da consulta: class_peca 'D',
+#     data_estimada na data atual e ultrapassou_estimativa False (o CASE ... ELSE FALSE da consulta
+#     também retornava FALSE, e não NULL, sem hodômetro ou sem média);
+#   - os filtros NOT IN de grupo e subgrupo descartam as trocas com grupo ou subgrupo nulo.
+# Única diferença: com média de km entre trocas (ou de km diário) igual a zero a consulta falhava por
+# divisão por zero; aqui porcentagem_vida_util e calculo_dias ficam NaN.
+
+# Imports básicos
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# Hodômetro volta a zero ao passar de 1.000.000 km
+KM_MAXIMO_HODOMETRO = 1_000_000
+
+# Média de km diário usada quando o veículo não tem odômetro nos últimos 30 dias
+MEDIA_KM_DIARIO_PADRAO = 150
+
+# Limites (fração da média de km entre trocas) das classes da peça
+LIMITE_CLASSE_C = 0.9
+LIMITE_CLASSE_B = 0.65
+
+# Grupos e subgrupos que não entram no relatório
+GRUPOS_DESCONSIDERADOS = ("CONSUMO PARA FROTAS", "MATERIAL DE CONSUMO", "Pneumáticos")
+SUB_GRUPOS_DESCONSIDERADOS = ("Parafusos", "Tintas")
+
+# Colunas da previsão, na mesma ordem da consulta SQL (estimativa + calculo_previsao_dia)
+COLUNAS_PREVISAO = [
+    "AssetId",
+    "id_veiculo",
+    "modelo_veiculo",
+    "nome_peça",
+    "media_km_entre_trocas",
+    "media_valor_peca_troca",
+    "qtd_amostras_media",
+    "data_primeira_troca",
+    "odometro_troca",
+    "hodometro_atual_gps",
+    "estimativa_odometro_proxima_troca",
+    "diferenca_entre_hodometro_estimativa_e_atual",
+    "total_km_peca",
+    "ultrapassou_estimativa",
+    "class_peca",
+    "porcentagem_vida_util",
+    "flag_ultima_troca",
+    "media_km_diario_veiculo",
+    "km_efetivo_da_peca",
+    "situacao_peca_porcentagem",
+    "calculo_dias",
+    "data_estimada",
+]
+
+
+def arredonda(valores, casas: int = 0) -> np.ndarray:
+    """
+    Arredonda como o ROUND(numeric) do Postgres: metade para longe do zero
+    (np.round arredonda metade para o par).
+    """
+    valores = np.asarray(valores, dtype="float64")
+    fator = 10.0**casas
+    return np.sign(valores) * np.floor(np.abs(valores) * fator + 0.5) / fator
+
+
+def calcula_km_efetivo(duracao_km, hodometro_atual, odometro_primeira_troca, odometro_segunda_troca) -> np.ndarray:
+    """
+    Km rodados pela peça: até a troca seguinte, ou até o hodômetro atual se a peça ainda está no veículo.
+    Considera a virada do hodômetro ao passar de KM_MAXIMO_HODOMETRO.
+    """
+    duracao_km = np.asarray(duracao_km, dtype="float64")
+    hodometro_atual = np.asarray(hodometro_atual, dtype="float64")
+    odometro_primeira_troca = np.asarray(odometro_primeira_troca, dtype="float64")
+    odometro_segunda_troca = np.asarray(odometro_segunda_troca, dtype="float64")
+
+    km_efetivo = np.select(
+        [
+            ~np.isnan(duracao_km),
+            hodometro_atual >= odometro_primeira_troca,
+            duracao_km < 0,
+        ],
+        [
+            duracao_km,
+            hodometro_atual - odometro_primeira_troca,
+            (KM_MAXIMO_HODOMETRO - odometro_primeira_troca) + odometro_segunda_troca,
+        ],
+        default=(KM_MAXIMO_HODOMETRO - odometro_primeira_troca) + hodometro_atual,
+    )
+    return arredonda(km_efetivo, 2)
+
+
+def classifica_pecas(hodometro_atual, odometro_troca, media_km_entre_trocas) -> np.ndarray:
+    """
+    Classe da peça pelo km rodado em relação à média entre trocas:
+    A (< 65%), B (> 65%), C (> 90%) e D (acima da média ou sem informação).
+    """
+    hodometro_atual = np.asarray(hodometro_atual, dtype="float64")
+    odometro_troca = np.asarray(odometro_troca, dtype="float64")
+    media_km_entre_trocas = np.asarray(media_km_entre_trocas, dtype="float64")
+
+    return np.select(
+        [
+            hodometro_atual > odometro_troca + media_km_entre_trocas,
+            hodometro_atual > odometro_troca + media_km_entre_trocas * LIMITE_CLASSE_C,
+            hodometro_atual > odometro_troca + media_km_entre_trocas * LIMITE_CLASSE_B,
+            hodometro_atual < odometro_troca + media_km_entre_trocas * LIMITE_CLASSE_B,
+        ],
+        ["D", "C", "B", "A"],
+        default="D",
+    )
+
+
+def calcula_media_pecas(df_trocas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Médias por peça (nome_pecas, codigo_peca) das trocas que tiveram a troca seguinte.
+    """
+    validas = df_trocas[(df_trocas["valor_peca"] > 0) & (df_trocas["duracao_km_entre_trocas"] > 0)]
+
+    # observed=True: com as colunas categóricas (modules/esquemas.py), apenas as combinações existentes
+    media = validas.groupby(["nome_pecas", "codigo_peca"], sort=False, observed=True).agg(
+        media_km_entre_trocas=("duracao_km_entre_trocas", "mean"),
+        media_dias_troca=("duracao_dias_entre_trocas", "mean"),
+        media_valor_peca_troca=("valor_peca", "mean"),
+        qtd_amostras_media=("valor_peca", "size"),
+    )
+    for coluna in ["media_km_entre_trocas", "media_dias_troca", "media_valor_peca_troca"]:
+        media[coluna] = arredonda(media[coluna])
+
+    return media.reset_index()
+
+
+def calcula_previsao(df_trocas: pd.DataFrame, data_atual: date = None) -> pd.DataFrame:
+    """
+    Calcula a previsão de troca para todas as trocas recebidas.
+
+    Args:
+        df_trocas (pd.DataFrame): Trocas de veículos ativos (uma linha por troca), com as colunas de
+            pecas_trocas_ciclo_vida, modelo_veiculo, AssetId, hodometro_atual_gps e media_km_diario.
+        data_atual (date, opcional): Data base da previsão. Padrão: hoje.
+
+    Returns:
+        pd.DataFrame: Colunas COLUNAS_PREVISAO, uma linha por troca (antes do filtro de última troca).
+    """
+    data_atual = data_atual or date.today()
+
+    df_media = calcula_media_pecas(df_trocas)
+
+    # Peças consideradas no relatório (NOT IN no SQL: grupo ou subgrupo nulo também fica de fora)
+    df = df_trocas[
+        df_trocas["grupo_peca"].notna()
+        & df_trocas["sub_grupo_peca"].notna()
+        & ~df_trocas["grupo_peca"].isin(GRUPOS_DESCONSIDERADOS)
+        & ~df_trocas["sub_grupo_peca"].isin(SUB_GRUPOS_DESCONSIDERADOS)
+        & (df_trocas["valor_peca"] > 0)
+    ]
+    df = df.merge(df_media, on=["nome_pecas", "codigo_peca"], how="left")
+
+    odometro = df["odometro_primeira_troca"].to_numpy(dtype="float64")
+    hodometro = df["hodometro_atual_gps"].to_numpy(dtype="float64")
+    media_km = df["media_km_entre_trocas"].to_numpy(dtype="float64")
+    media_km_diario = df["media_km_diario"].fillna(MEDIA_KM_DIARIO_PADRAO).to_numpy(dtype="float64")
+
+    diferenca = arredonda(media_km + odometro - hodometro)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        porcentagem = arredonda(((hodometro - odometro) * 100.0) / media_km, 1)
+        calculo_dias = arredonda(diferenca / media_km_diario)
+    porcentagem[np.isinf(porcentagem)] = np.nan
+    calculo_dias[np.isinf(calculo_dias)] = np.nan
+
+    # Data estimada: hoje + dias até a troca (ou hoje, se a estimativa já foi ultrapassada)
+    dias_ate_troca = np.where(diferenca > 0, calculo_dias, 0)
+    dias_ate_troca = np.nan_to_num(dias_ate_troca, nan=0, posinf=0, neginf=0)
+    data_estimada = pd.Timestamp(data_atual) + pd.to_timedelta(dias_ate_troca, unit="D")
+
+    df_previsao = pd.DataFrame(
+        {
+            "AssetId": df["AssetId"].to_numpy(),
+            "id_veiculo": df["id_veiculo"].to_numpy(),
+            "modelo_veiculo": df["modelo_veiculo"].to_numpy(),
+            "nome_peça": df["nome_pecas"].to_numpy(),
+            "media_km_entre_trocas": media_km,
+            "media_valor_peca_troca": df["media_valor_peca_troca"].to_numpy(dtype="float64"),
+            "qtd_amostras_media": df["qtd_amostras_media"].to_numpy(dtype="float64"),
+            "data_primeira_troca": df["data_primeira_troca"].to_numpy(),
+            "odometro_troca": arredonda(odometro),
+            "hodometro_atual_gps": arredonda(hodometro),
+            "estimativa_odometro_proxima_troca": arredonda(media_km + odometro),
+            "diferenca_entre_hodometro_estimativa_e_atual": diferenca,
+            "total_km_peca": arredonda(hodometro - odometro),
+            "ultrapassou_estimativa": hodometro > (media_km + odometro),
+            "class_peca": classifica_pecas(hodometro, odometro, media_km),
+            "porcentagem_vida_util": porcentagem,
+            "flag_ultima_troca": 0,
+            "media_km_diario_veiculo": media_km_diario,
+            "km_efetivo_da_peca": calcula_km_efetivo(
+                df["duracao_km_entre_trocas"], hodometro, odometro, df["odometro_segunda_troca"]
+            ),
+            "situacao_peca_porcentagem": porcentagem,
+            "calculo_dias": calculo_dias,
+            "data_estimada": data_estimada.date,
+        }
+    )
+
+    # Ordem da troca dentro de (veículo, peça), seguindo numero_troca (crescente) como na consulta SQL
+    ordem = np.lexsort(
+        (
+            df["numero_troca"].to_numpy(),
+            df["nome_pecas"].astype(str).to_numpy(),
+            df["id_veiculo"].astype(str).to_numpy(),
+        )
+    )
+    flag = df_previsao.iloc[ordem].groupby(["id_veiculo", "nome_peça"], sort=False).cumcount() + 1
+    df_previsao["flag_ultima_troca"] = flag.sort_index().to_numpy()
+
+    return df_previsao[COLUNAS_PREVISAO]
+
+
+def filtra_ultimas_trocas(df_previsao: pd.DataFrame, datas) -> pd.DataFrame:
+    """
+    Mantém a troca de referência (flag_ultima_troca = 1) com data_primeira_troca dentro do período.
+    """
+    data_inicio = pd.to_datetime(datas[0]).normalize()
+    data_fim = pd.to_datetime(datas[1]).normalize()
+    data_troca = pd.to_datetime(df_previsao["data_primeira_troca"], errors="coerce")
+
+    return df_previsao[
+        (df_previsao["flag_ultima_troca"] == 1) & data_troca.between(data_inicio, data_fim)
+    ]
+
+
+def agrega_previsao_mensal(df_ultimas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Quantidade de peças e valor esperado das trocas por peça e mês da data estimada.
+    """
+    df = df_ultimas[df_ultimas["media_valor_peca_troca"].notna()].copy()
+    df["mes_ano"] = pd.to_datetime(df["data_estimada"]).dt.to_period("M").dt.to_timestamp()
+
+    df_mensal = df.groupby(["nome_peça", "mes_ano"]).agg(
+        media_valor_money=("media_valor_peca_troca", "mean"),
+        qtd_pecas_para_trocar=("media_valor_peca_troca", "size"),
+    )
+    df_mensal["valor_esperado"] = df_mensal["qtd_pecas_para_trocar"] * df_mensal["media_valor_money"]
+
+    return df_mensal.reset_index()[
+        ["nome_peça", "media_valor_money", "mes_ano", "qtd_pecas_para_trocar", "valor_esperado"]
+    ]
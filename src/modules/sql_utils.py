@@ -3,119 +3,344 @@
 
 # Funções utilitárias para construção das queries SQL
 
+# Imports básicos
+import io
+import os
+import time
+import threading
+import contextvars
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
 
-# Subqueries para filtrar as oficinas, seções e ordens de serviço quando TODAS não for selecionado
-def subquery_oficinas(lista_oficinas, prefix="", termo_all="TODAS"):
-    query = ""
-    if termo_all not in lista_oficinas:
-        query = f"""AND {prefix}"DESCRICAO DA OFICINA" IN ({', '.join([f"'{x}'" for x in lista_oficinas])})"""
-
-    return query
+import pandas as pd
 
+# Imports do banco
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from db import timeout_consulta
 
-def subquery_secoes(lista_secaos, prefix="", termo_all="TODAS"):
-    query = ""
-    if termo_all not in lista_secaos:
-        query = f"""AND {prefix}"DESCRICAO DA SECAO" IN ({', '.join([f"'{x}'" for x in lista_secaos])})"""
-
-    return query
-
-
-def subquery_os(lista_os, prefix="", termo_all="TODAS"):
-    if not lista_os or termo_all in lista_os:
-        return ""
-    valores = ", ".join([f"'{x}'" for x in lista_os if x])  
-    if not valores:  
-        return ""
-
-    return f'AND {prefix}"DESCRICAO DO SERVICO" IN ({valores})'
-
-def subquery_pecas(lista_os, prefix="", termo_all="TODAS"):
-    if not lista_os or termo_all in lista_os:
-        return ""
-    valores = ", ".join([f"'{x}'" for x in lista_os if x])  
-    if not valores:  
-        return ""
-
-    return f'AND {prefix}"PRODUTO" IN ({valores})'
-
-def subquery_pecas2(lista_os, prefix="", termo_all="TODAS"):
-    if not lista_os or termo_all in lista_os:
-        return ""
-    valores = ", ".join([f"'{x}'" for x in lista_os if x])  
-    if not valores:  
-        return ""
-
-    return f'AND {prefix}"nome_pecas" IN ({valores})'
-
-def subquery_pecas3(lista_os, prefix="", termo_all="TODAS"):
-    if not lista_os or termo_all in lista_os:
-        return ""
-    valores = ", ".join([f"'{x}'" for x in lista_os if x])  
-    if not valores:  
-        return ""
-
-    return f'AND {prefix}"nome_peça" IN ({valores})'
-
-def subquery_modelos(lista_modelos, prefix="", termo_all="TODOS"):
-    query = ""
-    if termo_all not in lista_modelos:
-        query = f"""AND {prefix}"MODELO" IN ({', '.join([f"'{x}'" for x in lista_modelos])})"""
-
-    return query
-
-def subquery_modelos_peças(lista_modelos, prefix="", termo_all="TODOS"):
-    query = ""
-    if termo_all not in lista_modelos:
-        query = f"""AND {prefix}"Model" IN ({', '.join([f"'{x}'" for x in lista_modelos])})"""
-
-    return query
-
-def subquery_veiculos(lista_veiculos, prefix="", termo_all="TODAS"):
-    query = ""
-    if termo_all not in lista_veiculos:
-        query = f"""AND {prefix}"CODIGO DO VEICULO" IN ({', '.join([f"'{x}'" for x in lista_veiculos])})"""
-
-    return query
-
-
-def subquery_equipamentos(lista_veiculos, prefix=""):
-    query = ""
-    if "TODAS" not in lista_veiculos:
-        query = f"""AND {prefix}"EQUIPAMENTO" IN ({', '.join([f"'{x}'" for x in lista_veiculos])})"""
-    return query
-
-def subquery_modelos_veiculos(lista_modelos, prefix=""):
-    #query = ""
-    if not lista_modelos or "TODOS" in lista_modelos:
-        return ""  # Não adiciona a cláusula IN se a lista estiver vazia ou for "TODOS":
-    query = f"""AND {prefix}"DESCRICAO DO MODELO" IN ({', '.join([f"'{x}'" for x in lista_modelos])})"""
-    return query
-
-def subquery_modelos_pecas(lista_modelos, prefix=""):
-    #query = ""
-    if not lista_modelos or "TODOS" in lista_modelos:
-        return ""  # Não adiciona a cláusula IN se a lista estiver vazia ou for "TODOS":
-    query = f"""AND {prefix}"MODELO" IN ({', '.join([f"'{x}'" for x in lista_modelos])})"""
-    return query
-
-def subquery_modelos_combustivel(lista_modelos, prefix=""):
-    #query = ""
-    if not lista_modelos or "TODOS" in lista_modelos:
-        return ""  # Não adiciona a cláusula IN se a lista estiver vazia ou for "TODOS":
-    query = f"""AND {prefix} vec_model IN ({', '.join([f"'{x}'" for x in [lista_modelos]])})"""
-    return query
-
-def subquery_linha_combustivel(lista_linhas, prefix=""):
-    #query = ""
-    if not lista_linhas or "TODAS" in lista_linhas:
-        return ""  # Não adiciona a cláusula IN se a lista estiver vazia ou for "TODOS":
-    query = f"""AND {prefix} encontrou_numero_linha IN ({', '.join([f"'{x}'" for x in lista_linhas])})"""
-    return query
-
-def subquery_sentido_combustivel(sentido_linha, prefix=""):
-    #query = ""
-    if not sentido_linha or "IDA_VOLTA" in sentido_linha:
-        return ""  # Não adiciona a cláusula IN se a lista estiver vazia ou for "TODOS":
-    query = f"""AND {prefix} encontrou_numero_linha IN ({', '.join([f"'{x}'" for x in sentido_linha])})"""
-    return query
\ No newline at end of file
+# Imports auxiliares
+from modules.metricas_banco import metricas_banco
+
+# SQLSTATE do Postgres para consulta cancelada (statement_timeout)
+CONSULTA_CANCELADA = "57014"
+
+# Marca que a última consulta do contexto atual estourou o tempo máximo; o cache de resultados
+# usa a marca para devolver a cópia reserva em vez do DataFrame vazio (ver cache_utils.cache_resultado)
+consulta_estourou_tempo = ContextVar("consulta_estourou_tempo", default=False)
+
+
+# Leitura por COPY (ver le_sql_copy); desative para voltar ao pd.read_sql
+SQL_COPY = os.getenv("SQL_COPY", "True").lower() in ("true", "1", "yes")
+
+# Tipos do Postgres (OID) lidos diretamente nos tipos das colunas; os demais são lidos como texto
+TIPOS_COPY = {
+    16: "bool",
+    20: "int64",  # int8
+    21: "int64",  # int2
+    23: "int64",  # int4
+    700: "float64",  # float4
+    701: "float64",  # float8
+    1700: "float64",  # numeric (o pd.read_sql também converte para float, exceto em colunas só com NULL)
+    1082: "date32",  # date
+    1114: "timestamp",  # timestamp
+}
+
+# timestamptz: convertido depois, com o fuso (o parser CSV do pyarrow não lê o "-03" do Postgres)
+TIPO_TIMESTAMPTZ = 1184
+
+
+def _tipo_arrow(nome):
+    import pyarrow as pa
+
+    if nome == "date32":
+        return pa.date32()
+    if nome == "timestamp":
+        return pa.timestamp("us")
+    return pa.type_for_alias(nome)
+
+
+# Colunas e tipos do resultado de cada query (texto com os parâmetros :nome), para não descrever
+# a query (LIMIT 0) a cada leitura; o texto só muda com os filtros ativos (ver FiltroSQL)
+DESCRICOES_MAX = 512
+_descricoes = {}
+_lock_descricoes = threading.Lock()
+
+
+def _descreve(cursor, chave, sql, renova=False):
+    # Colunas e tipos (OID) do resultado, do cache ou de um SELECT ... LIMIT 0 (planeja a query sem executá-la)
+    with _lock_descricoes:
+        descricao = None if renova else _descricoes.get(chave)
+    if descricao is not None:
+        return descricao
+
+    cursor.execute(f"SELECT * FROM ({sql}) AS consulta LIMIT 0")
+    descricao = ([coluna.name for coluna in cursor.description], [coluna.type_code for coluna in cursor.description])
+
+    with _lock_descricoes:
+        if len(_descricoes) >= DESCRICOES_MAX:
+            _descricoes.clear()
+        _descricoes[chave] = descricao
+
+    return descricao
+
+
+class ColunasRepetidas(ValueError):
+    """Resultado com nomes de colunas repetidos, que o parser CSV do pyarrow não aceita (ver _le_resultado)."""
+
+
+def _converte_csv(buffer, colunas, tipos) -> pd.DataFrame:
+    # CSV do COPY -> DataFrame, com os tipos das colunas da descrição da query
+    import pyarrow.csv as pa_csv
+
+    if len(set(colunas)) != len(colunas):
+        raise ColunasRepetidas(f"Colunas repetidas no resultado: {colunas}")
+
+    buffer.seek(0)
+    tabela = pa_csv.read_csv(
+        buffer,
+        read_options=pa_csv.ReadOptions(column_names=colunas),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={
+                coluna: _tipo_arrow(TIPOS_COPY.get(tipo, "string")) for coluna, tipo in zip(colunas, tipos)
+            },
+            true_values=["t"],
+            false_values=["f"],
+            # Postgres: NULL é vazio sem aspas, texto vazio é ""
+            null_values=[""],
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,
+        ),
+    )
+    df = tabela.to_pandas(coerce_temporal_nanoseconds=True)
+
+    for coluna, tipo in zip(colunas, tipos):
+        if tipo == TIPO_TIMESTAMPTZ:
+            df[coluna] = pd.to_datetime(df[coluna], utc=True, format="ISO8601")
+
+    return df
+
+
+def le_sql_copy(query, conn, params=None) -> pd.DataFrame:
+    """
+    Lê o resultado da query com COPY ... TO STDOUT (CSV) e converte as colunas com o parser do pyarrow.
+
+    Substitui o pd.read_sql nos resultados grandes: o driver não cria uma tupla Python por linha e o CSV
+    é convertido em colunas tipadas (em várias threads). Os tipos vêm da descrição da query (LIMIT 0),
+    não da inferência do CSV, então códigos numéricos em colunas texto continuam texto. Diferenças para o
+    pd.read_sql: numeric é sempre float64 (mesmo numa coluna só com NULL) e tipos sem correspondência (json, arrays, ...)
+    vêm como texto.
+
+    O COPY não aceita parâmetros: os valores são escapados pelo driver (mogrify) e vão literais no texto
+    da query, como no pd.read_sql com o psycopg2 (ver FiltroSQL). A descrição fica em cache por texto da
+    query (com os parâmetros :nome), então o LIMIT 0 só é executado na primeira leitura de cada combinação
+    de filtros no processo; se o resultado não bater com a descrição guardada (ex: após uma migração que
+    mudou as colunas), a query é descrita de novo.
+
+    Args:
+        query (TextClause): Query com parâmetros no formato :nome.
+        conn (Connection): Conexão SQLAlchemy com driver psycopg2 (dentro de uma transação).
+        params (dict, opcional): Valores dos parâmetros.
+    """
+    from psycopg2.extensions import encodings
+
+    compilada = query.compile(dialect=conn.dialect)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        sql = cursor.mogrify(compilada.string, compilada.construct_params(params or {}))
+        sql = sql.decode(encodings[conn.connection.dbapi_connection.encoding]).strip().rstrip(";")
+
+        buffer = io.BytesIO()
+        cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv)", buffer)
+
+        colunas, tipos = _descreve(cursor, compilada.string, sql)
+        if buffer.tell() == 0:
+            return pd.DataFrame(columns=colunas)
+
+        try:
+            return _converte_csv(buffer, colunas, tipos)
+        except Exception:
+            # Descrição em cache desatualizada: descreve a query de novo e relê o mesmo CSV
+            colunas_atuais, tipos_atuais = _descreve(cursor, compilada.string, sql, renova=True)
+            if (colunas_atuais, tipos_atuais) == (colunas, tipos):
+                raise
+            return _converte_csv(buffer, colunas_atuais, tipos_atuais)
+    finally:
+        cursor.close()
+
+
+# Queries com colunas repetidas no resultado (ex: SELECT a.*, b.* com colunas de mesmo nome), lidas
+# pelo pd.read_sql, que as aceita; guardadas para não executar o COPY de novo a cada leitura
+_consultas_colunas_repetidas = set()
+
+
+def _le_resultado(query, conn, params):
+    # COPY quando o driver permite (psycopg2), senão pd.read_sql
+    chave = str(query)
+    if SQL_COPY and conn.dialect.driver == "psycopg2" and chave not in _consultas_colunas_repetidas:
+        try:
+            return le_sql_copy(query, conn, params)
+        except ColunasRepetidas:
+            with _lock_descricoes:
+                if len(_consultas_colunas_repetidas) >= DESCRICOES_MAX:
+                    _consultas_colunas_repetidas.clear()
+                _consultas_colunas_repetidas.add(chave)
+    return pd.read_sql(query, conn, params=params)
+
+
+def le_sql(query, engine, params=None, servico: str = None) -> pd.DataFrame:
+    """
+    Executa a query com o tempo máximo do serviço (statement_timeout, ver db.timeout_consulta) e retorna o DataFrame.
+
+    O limite vale apenas para a transação da consulta. O tempo de espera por uma conexão da pool e as
+    consultas que estouram o tempo (no banco ou na espera pela pool) são registrados em modules/metricas_banco.py.
+    O resultado é lido por COPY (le_sql_copy), ou pelo pd.read_sql com SQL_COPY=False.
+    Os erros são relançados para o serviço tratar, como no pd.read_sql.
+    """
+    if isinstance(query, str):
+        query = text(query)
+
+    servico = servico or "padrao"
+    inicio = time.perf_counter()
+    try:
+        with engine.begin() as conn:  # Gerencia transação + rollback automático
+            metricas_banco.registra_espera(servico, time.perf_counter() - inicio)
+            conn.execute(
+                text("SELECT set_config('statement_timeout', :timeout, true)"),
+                {"timeout": str(timeout_consulta(servico))},
+            )
+            return _le_resultado(query, conn, params)
+    except Exception as e:
+        # Erros do SQLAlchemy guardam o do driver em .orig; o COPY levanta o erro do psycopg2 diretamente
+        if isinstance(e, PoolTimeoutError) or getattr(getattr(e, "orig", e), "pgcode", None) == CONSULTA_CANCELADA:
+            metricas_banco.registra_estouro(servico)
+            consulta_estourou_tempo.set(True)
+        raise
+
+
+# Quantidade de consultas independentes executadas ao mesmo tempo por processo (cada uma numa conexão da pool)
+CONSULTAS_PARALELAS = int(os.getenv("CONSULTAS_PARALELAS", 4))
+
+# Pool de threads das consultas, criada sob demanda em cada processo (as threads não sobrevivem ao fork)
+_executor = None
+_executor_pid = None
+_lock_executor = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+
+    with _lock_executor:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=CONSULTAS_PARALELAS, thread_name_prefix="consulta")
+            _executor_pid = os.getpid()
+
+    return _executor
+
+
+def executa_em_paralelo(*chamadas) -> list:
+    """
+    Executa chamadas independentes ao mesmo tempo e retorna os resultados na mesma ordem.
+    A latência passa a ser a da chamada mais lenta, em vez da soma de todas.
+
+    Cada chamada é uma função sem argumentos (ex: functools.partial(servico.get_x, datas, lista_modelos)).
+    Exceções são relançadas ao ler o resultado; os métodos dos serviços já as tratam e retornam DataFrames vazios.
+
+    Exemplo:
+        df_modelos, df_oficinas = executa_em_paralelo(catalogo_entidades.get_modelos, catalogo_entidades.get_oficinas)
+    """
+    # Dentro da própria pool executa em sequência: esperar por outras tarefas da pool poderia travá-la
+    if len(chamadas) <= 1 or threading.current_thread().name.startswith("consulta"):
+        return [chamada() for chamada in chamadas]
+
+    executor = _get_executor()
+    futuros = [executor.submit(contextvars.copy_context().run, chamada) for chamada in chamadas]
+    return [futuro.result() for futuro in futuros]
+
+
+class FiltroSQL:
+    """
+    Especificação dos filtros de uma query com parâmetros vinculados (bind parameters).
+
+    Cada filtro gera uma cláusula fixa (ex: ``AND "MODELO" = ANY(:modelos)``) e guarda o valor em ``params``.
+    Assim o texto da query no código não muda com os valores selecionados (só com os filtros ativos) e os valores
+    são escapados pelo driver: aspas nos nomes (ex: peças) não quebram mais a consulta.
+
+    Com o psycopg2 os parâmetros são interpolados no cliente: o Postgres recebe a query com os valores literais,
+    sem PREPARE no servidor, e a planeja a cada execução (não há reaproveitamento de plano entre as chamadas).
+    A leitura por COPY (le_sql_copy) faz o mesmo com o mogrify, já que o COPY não aceita parâmetros: em troca
+    de planejar a query a cada leitura, o resultado chega ao pandas cerca de 2 a 3 vezes mais rápido.
+
+    Exemplo:
+        filtro = FiltroSQL().intervalo(datas).modelos(lista_modelos).oficinas(lista_oficinas)
+        query = f'''SELECT * FROM pecas_gerais WHERE "DATA" >= :data_inicio AND "DATA" < :data_fim {filtro}'''
+        df = le_sql(filtro.texto(query), engine, params=filtro.params, servico="home")
+    """
+
+    def __init__(self):
+        self.clausulas = []
+        self.params = {}
+
+    def __str__(self):
+        return "\n".join(self.clausulas)
+
+    def texto(self, query):
+        # Compila a query para um TextClause do SQLAlchemy (parâmetros no formato :nome)
+        return text(query)
+
+    def intervalo(self, datas, nome="data"):
+        """
+        Registra :<nome>_inicio e :<nome>_fim para o intervalo semiaberto [data_inicial, dia seguinte à data_final),
+        a ser usado sem cast na coluna: ``"DATA" >= :data_inicio AND "DATA" < :data_fim``.
+
+        Com a coluna sem cast (ex: ``"DATA"::DATE``) o Postgres pode usar o índice dela, e o limite exclusivo
+        inclui todo o último dia quando a coluna tem horário. As datas vão como texto ISO (YYYY-MM-DD), que o
+        Postgres converte para o tipo da coluna: funciona com date, timestamp e texto ISO.
+        """
+        data_inicio = pd.to_datetime(datas[0]).normalize()
+        data_fim = pd.to_datetime(datas[1]).normalize() + pd.Timedelta(days=1)
+
+        self.params[f"{nome}_inicio"] = data_inicio.strftime("%Y-%m-%d")
+        self.params[f"{nome}_fim"] = data_fim.strftime("%Y-%m-%d")
+        return self
+
+    def lista(self, coluna, valores, nome, termo_all="TODAS"):
+        # Filtro genérico: não adiciona a cláusula se a lista estiver vazia ou contiver o termo "todas"
+        if not valores or termo_all in valores:
+            return self
+
+        valores = [x for x in valores if x]
+        if not valores:
+            return self
+
+        self.clausulas.append(f"AND {coluna} = ANY(:{nome})")
+        self.params[nome] = valores
+        return self
+
+    def oficinas(self, lista_oficinas, prefix="", nome="oficinas"):
+        return self.lista(f'{prefix}"DESCRICAO DA OFICINA"', lista_oficinas, nome)
+
+    def secoes(self, lista_secoes, prefix="", nome="secoes"):
+        return self.lista(f'{prefix}"DESCRICAO DA SECAO"', lista_secoes, nome)
+
+    def os(self, lista_os, prefix="", nome="lista_os"):
+        return self.lista(f'{prefix}"DESCRICAO DO SERVICO"', lista_os, nome)
+
+    def pecas(self, lista_pecas, prefix="", nome="pecas"):
+        return self.lista(f'{prefix}"PRODUTO"', lista_pecas, nome)
+
+    def nome_pecas(self, lista_pecas, prefix="", nome="nome_pecas"):
+        return self.lista(f'{prefix}"nome_pecas"', lista_pecas, nome)
+
+    def nome_peca(self, lista_pecas, prefix="", nome="nome_peca"):
+        return self.lista(f'{prefix}"nome_peça"', lista_pecas, nome)
+
+    def modelos(self, lista_modelos, prefix="", nome="modelos"):
+        return self.lista(f'{prefix}"MODELO"', lista_modelos, nome, termo_all="TODOS")
+
+    def modelos_pecas(self, lista_modelos, prefix="", nome="modelos", coluna='"Model"'):
+        return self.lista(f"{prefix}{coluna}", lista_modelos, nome, termo_all="TODOS")
+
+    def veiculos(self, lista_veiculos, prefix="", nome="veiculos"):
+        return self.lista(f'{prefix}"CODIGO DO VEICULO"', lista_veiculos, nome)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Fila de tarefas em segundo plano (exportações e relatórios pesados)
+#
+# Exportar o relatório completo (todas as peças e modelos) pode levar minutos. Em vez de prender
+# um worker do gunicorn, a página enfileira a tarefa com os filtros e acompanha o progresso; a
+# tarefa roda num pool de processos local e grava o arquivo em TAREFAS_DIR, de onde é baixado
+# pela rota ROTA_TAREFAS/<id>/arquivo.
+#
+# O estado das tarefas fica num SQLite em TAREFAS_DIR, compartilhado por todos os workers do
+# gunicorn: qualquer worker informa o progresso, e uma tarefa idêntica (mesmo nome e filtros
+# normalizados) já na fila ou em execução é reaproveitada em vez de executada de novo.
+
+# Imports básicos
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+# Imports do flask
+from flask import abort, send_file
+
+# Imports auxiliares
+from modules.cache_utils import normaliza_argumento, normaliza_datas
+
+# Configuração das tarefas
+TAREFAS_DIR = os.getenv("TAREFAS_DIR", os.path.join(tempfile.gettempdir(), "ra_dash_pecas_tarefas"))
+TAREFAS_PROCESSOS = int(os.getenv("TAREFAS_PROCESSOS", 2))
+TAREFAS_RETENCAO_HORAS = float(os.getenv("TAREFAS_RETENCAO_HORAS", 24))
+
+# Tarefas na fila ou em execução sem atualização há mais que isso (segundos) são consideradas perdidas
+# (ex: worker reiniciado); mesmo timeout do gunicorn
+TAREFAS_TIMEOUT = int(os.getenv("TAREFAS_TIMEOUT", 600))
+
+# Rota (no servidor Flask do dash) para baixar o arquivo gerado
+ROTA_TAREFAS = "/tarefas"
+
+# Estados de uma tarefa
+NA_FILA = "fila"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+ERRO = "erro"
+
+# Tarefas registradas pelas páginas: nome -> função(filtros, progresso) que retorna o caminho do arquivo
+TAREFAS = {}
+
+
+###################################################################################
+# Armazenamento (SQLite)
+###################################################################################
+
+
+def _conexao():
+    os.makedirs(TAREFAS_DIR, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(TAREFAS_DIR, "tarefas.sqlite"), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tarefas (
+            id TEXT PRIMARY KEY,
+            nome TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            filtros TEXT NOT NULL,
+            estado TEXT NOT NULL,
+            progresso REAL NOT NULL DEFAULT 0,
+            mensagem TEXT,
+            arquivo TEXT,
+            criada_em REAL NOT NULL,
+            atualizada_em REAL NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tarefas_chave ON tarefas (chave, estado)")
+    return conn
+
+
+def _atualiza(id_tarefa: str, **campos):
+    campos["atualizada_em"] = time.time()
+    atribuicoes = ", ".join(f"{campo} = :{campo}" for campo in campos)
+    conn = _conexao()
+    try:
+        conn.execute(f"UPDATE tarefas SET {atribuicoes} WHERE id = :id", {**campos, "id": id_tarefa})
+    finally:
+        conn.close()
+
+
+def get_tarefa(id_tarefa: str):
+    """
+    Retorna o estado da tarefa (dict com estado, progresso, mensagem e arquivo) ou None se não existir.
+    """
+    if not id_tarefa:
+        return None
+
+    conn = _conexao()
+    try:
+        linha = conn.execute("SELECT * FROM tarefas WHERE id = ?", (id_tarefa,)).fetchone()
+    finally:
+        conn.close()
+
+    if linha is None:
+        return None
+
+    tarefa = dict(linha)
+    if tarefa["estado"] in (NA_FILA, EXECUTANDO) and time.time() - tarefa["atualizada_em"] > TAREFAS_TIMEOUT:
+        tarefa["estado"] = ERRO
+        tarefa["mensagem"] = "A tarefa foi interrompida. Tente novamente."
+        _atualiza(id_tarefa, estado=ERRO, mensagem=tarefa["mensagem"])
+
+    return tarefa
+
+
+def chave_tarefa(nome: str, filtros: dict) -> str:
+    # Tarefas com o mesmo nome e os mesmos filtros normalizados são idênticas
+    normalizados = []
+    for filtro, valor in sorted(filtros.items()):
+        valor = normaliza_datas(valor) if filtro == "datas" else normaliza_argumento(valor)
+        normalizados.append((filtro, valor))
+
+    return f"{nome}:{hashlib.sha1(repr(tuple(normalizados)).encode('utf-8')).hexdigest()}"
+
+
+def _limpa_tarefas_antigas(conn):
+    # Remove os registros e arquivos de tarefas mais antigas que TAREFAS_RETENCAO_HORAS
+    limite = time.time() - TAREFAS_RETENCAO_HORAS * 3600
+    for linha in conn.execute("SELECT arquivo FROM tarefas WHERE criada_em < ?", (limite,)).fetchall():
+        if linha["arquivo"] and os.path.exists(linha["arquivo"]):
+            os.remove(linha["arquivo"])
+    conn.execute("DELETE FROM tarefas WHERE criada_em < ?", (limite,))
+
+
+###################################################################################
+# Execução
+###################################################################################
+
+_executor = None
+_executor_lock = Lock()
+
+
+def _get_executor():
+    # Pool criado sob demanda em cada processo web (fork: as tarefas registradas são herdadas;
+    # a pool de conexões herdada é descartada no filho pelo PostgresSingleton)
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=TAREFAS_PROCESSOS,
+                mp_context=multiprocessing.get_context("fork"),
+            )
+        return _executor
+
+
+def _executa_tarefa(id_tarefa: str, nome: str, filtros: dict):
+    def progresso(fracao: float, mensagem: str = None):
+        _atualiza(id_tarefa, progresso=max(0.0, min(1.0, fracao)), mensagem=mensagem)
+
+    _atualiza(id_tarefa, estado=EXECUTANDO, progresso=0.0)
+    try:
+        arquivo = TAREFAS[nome](filtros, progresso)
+        if arquivo is None:
+            _atualiza(id_tarefa, estado=ERRO, mensagem="Nenhum dado encontrado para os filtros selecionados.")
+            return
+
+        # O arquivo fica em TAREFAS_DIR até a limpeza das tarefas antigas
+        destino = os.path.join(TAREFAS_DIR, f"{id_tarefa}{os.path.splitext(arquivo)[1]}")
+        os.replace(arquivo, destino)
+        _atualiza(id_tarefa, estado=CONCLUIDA, progresso=1.0, arquivo=destino, mensagem=None)
+    except Exception as e:
+        logging.error(f"Erro ao executar a tarefa {nome} ({id_tarefa}): {e}")
+        _atualiza(id_tarefa, estado=ERRO, mensagem="Erro ao gerar o arquivo.")
+
+
+def enfileira_tarefa(nome: str, filtros: dict) -> str:
+    """
+    Enfileira a tarefa com os filtros e retorna o id. Se uma tarefa idêntica já estiver na fila
+    ou em execução, retorna o id dela.
+    """
+    if nome not in TAREFAS:
+        raise ValueError(f"Tarefa não registrada: {nome}")
+
+    chave = chave_tarefa(nome, filtros)
+    agora = time.time()
+
+    conn = _conexao()
+    try:
+        conn.execute("BEGIN IMMEDIATE")  # Serializa o enfileiramento entre os workers
+        existente = conn.execute(
+            """
+            SELECT id FROM tarefas
+            WHERE chave = ? AND estado IN (?, ?) AND atualizada_em > ?
+            ORDER BY criada_em DESC
+            LIMIT 1
+            """,
+            (chave, NA_FILA, EXECUTANDO, agora - TAREFAS_TIMEOUT),
+        ).fetchone()
+        if existente is not None:
+            conn.execute("COMMIT")
+            return existente["id"]
+
+        _limpa_tarefas_antigas(conn)
+
+        id_tarefa = uuid.uuid4().hex
+        conn.execute(
+            """
+            INSERT INTO tarefas (id, nome, chave, filtros, estado, progresso, criada_em, atualizada_em)
+            VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+            """,
+            (id_tarefa, nome, chave, json.dumps(filtros, default=str), NA_FILA, agora, agora),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    _get_executor().submit(_executa_tarefa, id_tarefa, nome, filtros)
+    return id_tarefa
+
+
+def registra_tarefa(nome: str):
+    """
+    Decorador que registra uma tarefa em segundo plano.
+
+    A função recebe (filtros, progresso), onde progresso(fracao, mensagem) informa o andamento,
+    e retorna o caminho do arquivo gerado (ou None se não houver dados).
+    """
+
+    def decorador(funcao):
+        TAREFAS[nome] = funcao
+        return funcao
+
+    return decorador
+
+
+###################################################################################
+# Rota no servidor
+###################################################################################
+
+
+def registra_rota_tarefas(server):
+    """
+    Registra a rota GET ROTA_TAREFAS/<id>/arquivo, que baixa o arquivo de uma tarefa concluída.
+    """
+
+    @server.route(f"{ROTA_TAREFAS}/<id_tarefa>/arquivo")
+    def baixa_arquivo_tarefa(id_tarefa):
+        tarefa = get_tarefa(id_tarefa)
+        if tarefa is None or tarefa["estado"] != CONCLUIDA or not os.path.exists(tarefa["arquivo"] or ""):
+            abort(404)
+
+        extensao = os.path.splitext(tarefa["arquivo"])[1]
+        data_criacao = time.strftime("%d-%m-%Y", time.localtime(tarefa["criada_em"]))
+        return send_file(tarefa["arquivo"], as_attachment=True, download_name=f"{tarefa['nome']}_{data_criacao}{extensao}")
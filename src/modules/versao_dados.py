@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Versão dos dados (tabelas e materialized views) usados pelos serviços
+#
+# As views só mudam quando são atualizadas (REFRESH). Cada atualização incrementa a versão
+# registrada na tabela log_atualizacao_dados (ver sql/001_log_atualizacao_dados.sql).
+# O cache de resultados inclui na chave a versão das dependências de cada consulta, então
+# um resultado deixa de ser usado exatamente quando uma das views da qual depende é atualizada.
+
+# Imports básicos
+import os
+import time
+import logging
+from datetime import date
+from threading import Lock
+
+# Imports do banco
+from sqlalchemy import text
+
+# Intervalo (segundos) entre as leituras da tabela de versões
+VERSAO_DADOS_INTERVALO = int(os.getenv("VERSAO_DADOS_INTERVALO", 60))
+
+# Dependência especial para consultas que usam CURRENT_DATE (o resultado muda a cada dia)
+DATA_ATUAL = "CURRENT_DATE"
+
+
+class VersaoDados:
+    """
+    Lê periodicamente a tabela log_atualizacao_dados e informa a versão atual das dependências.
+
+    A tabela é consultada no máximo uma vez a cada VERSAO_DADOS_INTERVALO segundos por processo.
+    Se a tabela não existir ou não tiver registro de alguma dependência, a versão é desconhecida
+    e o cache volta a depender apenas do TTL.
+    """
+
+    def __init__(self, intervalo: int = VERSAO_DADOS_INTERVALO):
+        self.intervalo = intervalo
+        self._versoes = {}
+        self._lido_em = 0
+        self._lock = Lock()
+        self._erro_registrado = False
+
+    def _le_versoes(self):
+        # Import tardio: o engine só é criado quando a primeira consulta versionada é feita.
+        # A versão é lida no mesmo servidor (réplica ou primário) das consultas do processo
+        from db import PostgresSingleton
+
+        engine = PostgresSingleton.get_instance().get_engine_leitura()
+        with engine.connect() as conn:
+            linhas = conn.execute(text("SELECT nome, versao FROM log_atualizacao_dados")).fetchall()
+
+        return {nome: int(versao) for nome, versao in linhas}
+
+    def _atualiza(self):
+        with self._lock:
+            if time.time() - self._lido_em < self.intervalo:
+                return
+
+            try:
+                self._versoes = self._le_versoes()
+                self._erro_registrado = False
+            except Exception as e:
+                # Mantém as versões anteriores; registra o erro apenas uma vez
+                if not self._erro_registrado:
+                    logging.error(f"Erro ao ler as versões dos dados (log_atualizacao_dados): {e}")
+                    self._erro_registrado = True
+
+            self._lido_em = time.time()
+
+    def get_versoes(self, dependencias):
+        """
+        Retorna um dicionário {dependência: versão} ou None se alguma versão for desconhecida.
+        """
+        self._atualiza()
+
+        versoes = {}
+        for nome in dependencias:
+            if nome == DATA_ATUAL:
+                versoes[nome] = date.today().isoformat()
+            elif nome in self._versoes:
+                versoes[nome] = self._versoes[nome]
+            else:
+                return None
+
+        return versoes
+
+    def assinatura(self) -> str:
+        """
+        Texto que muda quando qualquer dependência é atualizada ou o dia vira.
+        Usado no cache_by dos callbacks em segundo plano (app.py).
+        """
+        self._atualiza()
+        return f"{date.today().isoformat()}:{sorted(self._versoes.items())}"
+
+    def invalida(self):
+        # Força a releitura das versões na próxima consulta
+        with self._lock:
+            self._lido_em = 0
+
+
+# Instância compartilhada pelo cache dos serviços
+versao_dados = VersaoDados()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Job de atualização da tabela pecas_trocas_ciclo_vida (ver sql/002_pecas_trocas_ciclo_vida.sql)
+#
+# A tabela guarda, para cada troca de peça, o par com a troca seguinte (LEAD) da mesma peça
+# no mesmo veículo. Os serviços de vida útil e do relatório de peças apenas filtram essa tabela,
+# em vez de recalcular as janelas sobre toda a mat_view_os_pecas_hodometro_v3 a cada callback.
+#
+# A atualização é incremental (ver sql/003_pecas_trocas_ciclo_vida_incremental.sql): apenas os
+# pares (id_veiculo, codigo_peca) com trocas a partir da marca d'água (data_peca) da execução
+# anterior, menos CICLO_VIDA_JANELA_DIAS, são recalculados e gravados com upsert. Na primeira
+# execução, ou com --completo, a tabela é recalculada inteira.
+#
+# Correções lançadas com data anterior à janela (OS antigas alteradas, apagadas ou recodificadas
+# em veículos sem trocas recentes) não são vistas pela atualização incremental: agende também uma
+# execução com --completo periódica (ex: semanal, fora do horário de uso).
+#
+# Uso (a partir de src/, após o refresh da mat_view_os_pecas_hodometro_v3):
+#     python -m modules.vidautil.ciclo_vida [--completo]
+
+# Imports básicos
+import os
+import time
+import logging
+import argparse
+
+# Imports do banco
+from sqlalchemy import text
+
+# Nome da tabela (também usado como dependência no cache dos serviços)
+TABELA_CICLO_VIDA = "pecas_trocas_ciclo_vida"
+
+# Dias antes da marca d'água que também são verificados, para pegar OS lançadas com atraso
+CICLO_VIDA_JANELA_DIAS = int(os.getenv("CICLO_VIDA_JANELA_DIAS", 7))
+
+# Colunas atualizadas no upsert (todas as colunas da view, exceto a chave)
+COLUNAS_ATUALIZADAS = [
+    "nome_pecas",
+    "grupo_peca",
+    "sub_grupo_peca",
+    "status_veiculo",
+    "numero_os",
+    "valor_peca",
+    "data_primeira_troca",
+    "data_odometro_primeira_troca",
+    "odometro_primeira_troca",
+    "quantidade_troca_1",
+    "quantidade_troca_2",
+    "odometro_segunda_troca",
+    "data_segunda_troca",
+    "data_odometro_segunda_troca",
+    "duracao_km_entre_trocas",
+    "duracao_dias_entre_trocas",
+]
+
+
+def _atualiza_marca_dagua(conn):
+    # Guarda a maior data_peca atual da mat view. Só a data é usada: os dias da marca d'água e os
+    # CICLO_VIDA_JANELA_DIAS anteriores são sempre verificados inteiros, então a OS da última troca
+    # não serviria de limite dentro do dia
+    conn.execute(text("DELETE FROM pecas_trocas_ciclo_vida_controle"))
+    conn.execute(
+        text(
+            """
+            INSERT INTO pecas_trocas_ciclo_vida_controle (data_peca, atualizado_em)
+            SELECT data_peca, NOW()
+            FROM mat_view_os_pecas_hodometro_v3
+            WHERE valor_peca > 0
+            ORDER BY data_peca DESC  -- texto YYYY-MM-DD: mesma ordem das datas, usa o índice
+            LIMIT 1
+            """
+        )
+    )
+
+
+def _atualiza_completo(conn) -> tuple:
+    removidas = conn.execute(text(f"DELETE FROM {TABELA_CICLO_VIDA}")).rowcount
+    gravadas = conn.execute(text(f"INSERT INTO {TABELA_CICLO_VIDA} SELECT * FROM view_pecas_trocas_ciclo_vida")).rowcount
+    return gravadas, removidas
+
+
+def _atualiza_incremental(conn, marca_dagua) -> tuple:
+    # Pares (veículo, peça) com trocas após a marca d'água (menos a janela de atraso), mais os
+    # demais códigos com o mesmo nome de peça no veículo: quantidade_troca_2 é pareada pelo nome
+    # (sql/007_pecas_trocas_ciclo_vida_quantidade.sql). Os pares com trocas no mesmo período na
+    # tabela também entram, para remover as trocas cujas OS foram apagadas da mat view
+    conn.execute(
+        text(
+            """
+            CREATE TEMP TABLE ciclo_vida_particoes ON COMMIT DROP AS
+            WITH recentes AS (
+                SELECT DISTINCT id_veiculo, codigo_peca, nome_pecas
+                FROM mat_view_os_pecas_hodometro_v3
+                WHERE
+                    valor_peca > 0
+                    -- Sem função na coluna (usa o índice de data_peca); inclui o dia inteiro do limite
+                    AND data_peca >= TO_CHAR(TO_DATE(:data_peca, 'YYYY-MM-DD') - CAST(:janela_dias AS INTEGER), 'YYYY-MM-DD')
+            )
+            SELECT id_veiculo, codigo_peca FROM recentes
+            UNION
+            SELECT m.id_veiculo, m.codigo_peca
+            FROM mat_view_os_pecas_hodometro_v3 m
+            JOIN recentes r
+                ON r.id_veiculo = m.id_veiculo
+                AND r.nome_pecas = m.nome_pecas
+            WHERE m.valor_peca > 0
+            UNION
+            SELECT id_veiculo, codigo_peca
+            FROM pecas_trocas_ciclo_vida
+            WHERE data_primeira_troca >= CAST(:data_peca AS DATE) - CAST(:janela_dias AS INTEGER)
+            """
+        ),
+        {
+            "data_peca": marca_dagua.data_peca,
+            "janela_dias": CICLO_VIDA_JANELA_DIAS,
+        },
+    )
+
+    veiculos, pecas = conn.execute(
+        text("SELECT array_agg(DISTINCT id_veiculo), array_agg(DISTINCT codigo_peca) FROM ciclo_vida_particoes")
+    ).first()
+    if not veiculos:
+        return 0, 0
+
+    # O filtro por = ANY em id_veiculo (coluna do PARTITION BY das duas janelas) é levado para dentro
+    # da view pelo Postgres, então as janelas (LEAD) são calculadas apenas para os veículos alterados;
+    # codigo_peca não está na janela por nome, e os filtros por peça são aplicados após as janelas
+    filtro_particoes = """
+        t.id_veiculo = ANY(:veiculos)
+        AND t.codigo_peca = ANY(:pecas)
+        AND (t.id_veiculo, t.codigo_peca) IN (SELECT id_veiculo, codigo_peca FROM ciclo_vida_particoes)
+    """
+    params = {"veiculos": veiculos, "pecas": pecas}
+
+    colunas_update = ",\n".join(f"{coluna} = EXCLUDED.{coluna}" for coluna in COLUNAS_ATUALIZADAS)
+    gravadas = conn.execute(
+        text(
+            f"""
+            INSERT INTO {TABELA_CICLO_VIDA}
+            SELECT t.*
+            FROM view_pecas_trocas_ciclo_vida t
+            WHERE {filtro_particoes}
+            ON CONFLICT (id_veiculo, codigo_peca, numero_troca) DO UPDATE SET
+            {colunas_update}
+            """
+        ),
+        params,
+    ).rowcount
+
+    # Remove trocas que deixaram de existir na mat view (numero_troca acima do total atual do par)
+    removidas = conn.execute(
+        text(
+            f"""
+            DELETE FROM {TABELA_CICLO_VIDA} c
+            USING (
+                SELECT t.id_veiculo, t.codigo_peca, MAX(t.numero_troca) AS total_trocas
+                FROM view_pecas_trocas_ciclo_vida t
+                WHERE {filtro_particoes}
+                GROUP BY t.id_veiculo, t.codigo_peca
+            ) n
+            WHERE
+                c.id_veiculo = n.id_veiculo
+                AND c.codigo_peca = n.codigo_peca
+                AND c.numero_troca > n.total_trocas
+            """
+        ),
+        params,
+    ).rowcount
+
+    # Remove os pares dos veículos alterados que não existem mais na mat view (todas as OS do par
+    # apagadas ou a peça recodificada): o DELETE acima só alcança pares que ainda estão na view
+    removidas += conn.execute(
+        text(
+            f"""
+            DELETE FROM {TABELA_CICLO_VIDA} c
+            WHERE
+                c.id_veiculo = ANY(:veiculos)
+                AND NOT EXISTS (
+                    SELECT 1
+                    FROM mat_view_os_pecas_hodometro_v3 m
+                    WHERE
+                        m.valor_peca > 0
+                        AND m.id_veiculo = c.id_veiculo
+                        AND m.codigo_peca = c.codigo_peca
+                )
+            """
+        ),
+        {"veiculos": veiculos},
+    ).rowcount
+
+    return gravadas, removidas
+
+
+def atualiza_ciclo_vida(db_engine, completo: bool = False) -> int:
+    """
+    Atualiza a tabela pecas_trocas_ciclo_vida a partir da view_pecas_trocas_ciclo_vida.
+
+    Tudo é feito numa única transação, então as consultas do dashboard continuam vendo os dados
+    anteriores até o commit. Um advisory lock impede duas atualizações simultâneas.
+
+    Args:
+        db_engine: Engine SQLAlchemy para acessar o banco de dados.
+        completo (bool): Recalcula a tabela inteira em vez de apenas os pares alterados.
+
+    Returns:
+        int: Quantidade de trocas gravadas.
+    """
+    inicio = time.time()
+
+    with db_engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:nome))"), {"nome": TABELA_CICLO_VIDA})
+
+        marca_dagua = conn.execute(text("SELECT data_peca FROM pecas_trocas_ciclo_vida_controle")).first()
+        if completo or marca_dagua is None:
+            modo = "completa"
+            gravadas, removidas = _atualiza_completo(conn)
+        else:
+            modo = "incremental"
+            gravadas, removidas = _atualiza_incremental(conn, marca_dagua)
+
+        _atualiza_marca_dagua(conn)
+
+        # Só registra nova versão (invalidando o cache dos serviços) se alguma troca foi gravada ou removida
+        if modo == "completa" or gravadas > 0 or removidas > 0:
+            conn.execute(text("SELECT registra_atualizacao_dados(:nome)"), {"nome": TABELA_CICLO_VIDA})
+
+    logging.info(
+        f"{TABELA_CICLO_VIDA} atualizada ({modo}): {gravadas} trocas gravadas, {removidas} removidas "
+        f"em {time.time() - inicio:.1f}s"
+    )
+    return gravadas
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Atualiza a tabela pecas_trocas_ciclo_vida")
+    parser.add_argument("--completo", action="store_true", help="recalcula a tabela inteira")
+    args = parser.parse_args()
+
+    from db import PostgresSingleton
+
+    atualiza_ciclo_vida(PostgresSingleton.get_instance().get_engine(), completo=args.completo)
@@ -4,7 +4,16 @@ import logging
 
 # Imports auxiliares
 from modules.sql_utils import *
+from modules.cache_utils import cache_resultado
+from modules.esquemas import compacta_resultado
+from db import somente_leitura
 
+# Tabelas/views lidas pelas consultas de vida útil (invalidam o cache ao serem atualizadas)
+# A dim_veiculos é recalculada junto com a carga da veiculos_api (sql/006_dim_veiculos.sql)
+DEPENDENCIAS_VIDA_UTIL = ("pecas_trocas_ciclo_vida", "mat_view_odometro_diario", "veiculos_api")
+
+# Consultas apenas de leitura: usam as réplicas do banco quando configuradas (DB_REPLICAS)
+@somente_leitura
 class VidaUtilService:
     """
     Serviço para manipulação de dados relacionados à Vida Útil de Ordens de Serviço (OS).
@@ -18,6 +27,7 @@ class VidaUtilService:
         """
         self.db_engine = db_engine
 
+    @cache_resultado(dependencias=DEPENDENCIAS_VIDA_UTIL)
     def get_pecas_input(self, datas: List[str], lista_modelos: List[str]) -> pd.DataFrame:
         """
         Obtém as peças trocadas em ordens de serviço dentro de um intervalo de datas e filtradas por modelos.
@@ -31,143 +41,34 @@ class VidaUtilService:
             raise ValueError("O parâmetro 'datas' deve conter duas datas: [data_inicial, data_final].")
 
         try:
-            # Converte as datas para o formato desejado (dd/mm/yyyy)
-            data_inicio = pd.to_datetime(datas[0]).strftime("%Y-%m-%d")
-            data_fim = pd.to_datetime(datas[1]).strftime("%Y-%m-%d")
-
-
-            
-            # Gera subqueries SQL a partir das listas de filtros
-            subquery_modelo_str = subquery_modelos_peças(lista_modelos, prefix="DF.")
+            # Gera os filtros como parâmetros vinculados (data_primeira_troca é DATE; as datas YYYY-MM-DD dos parâmetros são convertidas pelo Postgres)
+            filtro = (
+                FiltroSQL()
+                .intervalo(datas)
+                .modelos_pecas(lista_modelos, prefix="dv.")
+            )
 
             # Monta a query final com os filtros aplicados
             query = f"""
-            select nome_pecas, 
-                Count(nome_pecas) as quantidade
-            from (
-            --
-            --
-            --
-            --QUERY ORIGINAL
-            WITH ultimo_hodometro_gps AS (
-                SELECT
-                    va."AssetId",
-                    mvd."maior_km_dia",
-                    mvd."year_month_day"
-                FROM veiculos_api va
-                LEFT JOIN LATERAL (
-                    SELECT 
-                        mvod."year_month_day",
-                        mvod."maior_km_dia"
-                    FROM mat_view_odometro_diario mvod
-                    WHERE mvod."AssetId" = va."AssetId"
-                    ORDER BY mvod."year_month_day" DESC
-                    LIMIT 1
-                ) mvd ON TRUE
-            ),
-            trocas AS (
-                    SELECT 
-                        id_veiculo,
-                        nome_pecas,
-                        data_peca as data_primeira_troca,
-                        data_ultimo_hodometro as data_odometro_primeira_troca,
-                        ultimo_hodometro as odometro_primeira_troca,
-                        codigo_peca,
-                        grupo_peca,
-                        sub_grupo_peca,
-                        quantidade_peca as quantidade_troca_1,
-                        valor_peca,
-                        LEAD(quantidade_peca) OVER (
-                            PARTITION BY id_veiculo, nome_pecas
-                            ORDER BY TO_DATE(data_peca, 'YYYY-MM-DD')
-                        ) AS quantidade_troca_2,
-                        LEAD(ultimo_hodometro) OVER (
-                            PARTITION BY id_veiculo, codigo_peca
-                            ORDER BY TO_DATE(data_peca, 'YYYY-MM-DD')
-                        ) AS odometro_segunda_troca,
-                        LEAD(TO_DATE(data_peca, 'YYYY-MM-DD')) OVER (
-                            PARTITION BY id_veiculo, codigo_peca
-                            ORDER BY TO_DATE(data_peca, 'YYYY-MM-DD')
-                        ) AS data_segunda_troca,
-                    LEAD(TO_DATE(data_ultimo_hodometro, 'YYYY-MM-DD')) OVER (
-                            PARTITION BY id_veiculo, codigo_peca
-                            ORDER BY TO_DATE(data_peca, 'YYYY-MM-DD')
-                        ) AS data_odometro_segunda_troca,
-                        LEAD(ultimo_hodometro) OVER (
-                            PARTITION BY id_veiculo, codigo_peca
-                            ORDER BY TO_DATE(data_peca, 'YYYY-MM-DD')
-                        ) - ultimo_hodometro AS duracao_km_entre_trocas,
-                        LEAD(TO_DATE(data_peca, 'YYYY-MM-DD')) OVER (
-                            PARTITION BY id_veiculo, codigo_peca
-                            ORDER BY TO_DATE(data_peca, 'YYYY-MM-DD')
-                        ) - TO_DATE(data_peca, 'YYYY-MM-DD') AS duracao_dias_entre_trocas
-                    FROM
-                        mat_view_os_pecas_hodometro_v3 as vph
-                    where 
-	    	        valor_peca > 0 -- NÃO PEGAR as PEÇAS COM VALOR NEGATIVO
-            ),
-            trocas_detalhadas AS (
-                SELECT 
-                    trocas.*,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY id_veiculo, codigo_peca
-                        ORDER BY data_primeira_troca
-                    ) AS numero_troca,
-                    CASE 
-                        WHEN duracao_km_entre_trocas is NOT NULL 
-                        THEN 'TEVE PAR'
-                        ELSE 'NÃO TEVE PAR'
-                    END AS flag_troca,
-                    va."Model",
-                    va."AssetId",
-                    uhg."maior_km_dia" AS hodometro_atual_gps,
-                    uhg."year_month_day" AS data_hodometro_gps,
-                    ROUND(
-                        CASE
-                            WHEN trocas.duracao_km_entre_trocas IS NOT NULL THEN trocas.duracao_km_entre_trocas
-                            WHEN uhg."maior_km_dia" >= trocas.odometro_primeira_troca THEN uhg."maior_km_dia" - trocas.odometro_primeira_troca
-                            WHEN duracao_km_entre_trocas < 0 THEN (1000000 - trocas.odometro_primeira_troca) + trocas.odometro_segunda_troca
-                            ELSE (1000000 - trocas.odometro_primeira_troca) + uhg."maior_km_dia"
-                        END::numeric, 
-                    2
-                    ) AS km_efetivo_da_peca,
-                    CASE
-                        WHEN trocas.duracao_dias_entre_trocas IS NOT NULL THEN trocas.duracao_dias_entre_trocas
-                        ELSE (CURRENT_DATE - trocas.data_primeira_troca::date)
-                    END AS dias_efetivo_da_peca
-                FROM trocas
-                LEFT JOIN veiculos_api va
-                    ON regexp_replace(va."Description", '\s*-\s*.*$', '') = trocas.id_veiculo
-                LEFT JOIN ultimo_hodometro_gps uhg 
-                    ON va."AssetId" = uhg."AssetId"
-                WHERE
-                    duracao_km_entre_trocas IS NOT NULL
-                    and duracao_km_entre_trocas > 0
-                    AND valor_peca > 0
-            )
-            SELECT 
-                *
-                FROM trocas_detalhadas
-            WHERE 
-                --km_efetivo_da_peca < 123000
-                grupo_peca NOT IN ('CONSUMO PARA FROTAS','MATERIAL DE CONSUMO', 'Pneumáticos')
-                AND sub_grupo_peca NOT IN ('Parafusos', 'Tintas')
-            ORDER BY
-                nome_pecas, id_veiculo, TO_DATE(data_primeira_troca, 'YYYY-MM-DD')
-            ---
-            --
-            --
-            ) as DF
-            WHERE   DF.duracao_km_entre_trocas IS NOT NULL
-                    AND DF.valor_peca > 0
-                    AND DF.data_primeira_troca BETWEEN '{data_inicio}' AND '{data_fim}'
-                    {subquery_modelo_str}
-
-            group by    
-                nome_pecas
+            SELECT
+                trocas.nome_pecas,
+                COUNT(trocas.nome_pecas) AS quantidade
+            FROM pecas_trocas_ciclo_vida trocas
+            LEFT JOIN dim_veiculos dv
+                ON dv.codigo_veiculo = trocas.id_veiculo
+            WHERE
+                trocas.duracao_km_entre_trocas IS NOT NULL
+                AND trocas.duracao_km_entre_trocas > 0
+                AND trocas.valor_peca > 0
+                AND trocas.grupo_peca NOT IN ('CONSUMO PARA FROTAS','MATERIAL DE CONSUMO', 'Pneumáticos')
+                AND trocas.sub_grupo_peca NOT IN ('Parafusos', 'Tintas')
+                AND trocas.data_primeira_troca >= :data_inicio AND trocas.data_primeira_troca < :data_fim
+                {filtro}
+            GROUP BY
+                trocas.nome_pecas
             """
             # Executa a consulta e retorna os dados como DataFrame
-            return pd.read_sql(query, self.db_engine)
+            return le_sql(filtro.texto(query), self.db_engine, params=filtro.params, servico="vida_util")
 
         except ValueError as e:
             # Erro ao converter datas
@@ -180,6 +81,8 @@ class VidaUtilService:
             return pd.DataFrame()
         
 
+    @cache_resultado(dependencias=DEPENDENCIAS_VIDA_UTIL)
+    @compacta_resultado
     def get_pecas(self, datas: List[str], lista_modelos: List[str], lista_peças: List[str]) -> pd.DataFrame:
         """
         Obtém as peças trocadas em ordens de serviço dentro de um intervalo de datas e filtradas por modelos.
@@ -193,129 +96,92 @@ class VidaUtilService:
             raise ValueError("O parâmetro 'datas' deve conter duas datas: [data_inicial, data_final].")
 
         try:
-            # Converte as datas para o formato desejado (dd/mm/yyyy)
-            data_inicio = pd.to_datetime(datas[0]).strftime("%Y-%m-%d")
-            data_fim = pd.to_datetime(datas[1]).strftime("%Y-%m-%d")
-
-            
-            # Gera subqueries SQL a partir das listas de filtros
-            subquery_modelo_str = subquery_modelos_peças(lista_modelos)
-            subquery_peças_str = subquery_pecas2(lista_peças)
+            # Gera os filtros como parâmetros vinculados (data_primeira_troca é DATE; as datas YYYY-MM-DD dos parâmetros são convertidas pelo Postgres)
+            filtro = (
+                FiltroSQL()
+                .intervalo(datas)
+                .modelos_pecas(lista_modelos, prefix="dv.")
+                .nome_pecas(lista_peças, prefix="trocas.")
+            )
             # Monta a query final com os filtros aplicados
             query = f"""
             WITH ultimo_hodometro_gps AS (
                 SELECT
-                    va."AssetId",
+                    dv."AssetId",
                     mvd."maior_km_dia",
                     mvd."year_month_day"
-                FROM veiculos_api va
+                FROM dim_veiculos dv
                 LEFT JOIN LATERAL (
                     SELECT 
                         mvod."year_month_day",
                         mvod."maior_km_dia"
                     FROM mat_view_odometro_diario mvod
-                    WHERE mvod."AssetId" = va."AssetId"
+                    WHERE mvod."AssetId" = dv."AssetId"
                     ORDER BY mvod."year_month_day" DESC
                     LIMIT 1
                 ) mvd ON TRUE
-            ),
-            trocas AS (
-                    SELECT 
-                        id_veiculo,
-                        nome_pecas,
-                        data_peca as data_primeira_troca,
-                        data_ultimo_hodometro as data_odometro_primeira_troca,
-                        ultimo_hodometro as odometro_primeira_troca,
-                        codigo_peca,
-                        grupo_peca,
-                        sub_grupo_peca,
-                        quantidade_peca as quantidade_troca_1,
-                        valor_peca,
-                        LEAD(quantidade_peca) OVER (
-                            PARTITION BY id_veiculo, nome_pecas
-                            ORDER BY TO_DATE(data_peca, 'YYYY-MM-DD')
-                        ) AS quantidade_troca_2,
-                        LEAD(ultimo_hodometro) OVER (
-                            PARTITION BY id_veiculo, codigo_peca
-                            ORDER BY TO_DATE(data_peca, 'YYYY-MM-DD')
-                        ) AS odometro_segunda_troca,
-                        LEAD(TO_DATE(data_peca, 'YYYY-MM-DD')) OVER (
-                            PARTITION BY id_veiculo, codigo_peca
-                            ORDER BY TO_DATE(data_peca, 'YYYY-MM-DD')
-                        ) AS data_segunda_troca,
-                    LEAD(TO_DATE(data_ultimo_hodometro, 'YYYY-MM-DD')) OVER (
-                            PARTITION BY id_veiculo, codigo_peca
-                            ORDER BY TO_DATE(data_peca, 'YYYY-MM-DD')
-                        ) AS data_odometro_segunda_troca,
-                        LEAD(ultimo_hodometro) OVER (
-                            PARTITION BY id_veiculo, codigo_peca
-                            ORDER BY TO_DATE(data_peca, 'YYYY-MM-DD')
-                        ) - ultimo_hodometro AS duracao_km_entre_trocas,
-                        LEAD(TO_DATE(data_peca, 'YYYY-MM-DD')) OVER (
-                            PARTITION BY id_veiculo, codigo_peca
-                            ORDER BY TO_DATE(data_peca, 'YYYY-MM-DD')
-                        ) - TO_DATE(data_peca, 'YYYY-MM-DD') AS duracao_dias_entre_trocas
-                    FROM
-                        mat_view_os_pecas_hodometro_v3 as vph
-                    where 
-	    	        valor_peca > 0 -- NÃO PEGAR as PEÇAS COM VALOR NEGATIVO
-            ),
-            trocas_detalhadas AS (
-                SELECT 
-                    trocas.*,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY id_veiculo, codigo_peca
-                        ORDER BY data_primeira_troca
-                    ) AS numero_troca,
-                    CASE 
-                        WHEN duracao_km_entre_trocas is NOT NULL 
-                        THEN 'TEVE PAR'
-                        ELSE 'NÃO TEVE PAR'
-                    END AS flag_troca,
-                    va."Model",
-                    va."AssetId",
-                    uhg."maior_km_dia" AS hodometro_atual_gps,
-                    uhg."year_month_day" AS data_hodometro_gps,
-                    ROUND(
-                        CASE
-                            WHEN trocas.duracao_km_entre_trocas IS NOT NULL THEN trocas.duracao_km_entre_trocas
-                            WHEN uhg."maior_km_dia" >= trocas.odometro_primeira_troca THEN uhg."maior_km_dia" - trocas.odometro_primeira_troca
-                            WHEN duracao_km_entre_trocas < 0 THEN (1000000 - trocas.odometro_primeira_troca) + trocas.odometro_segunda_troca
-                            ELSE (1000000 - trocas.odometro_primeira_troca) + uhg."maior_km_dia"
-                        END::numeric, 
-                    2
-                    ) AS km_efetivo_da_peca,
-                    CASE
-                        WHEN trocas.duracao_dias_entre_trocas IS NOT NULL THEN trocas.duracao_dias_entre_trocas
-                        ELSE (CURRENT_DATE - trocas.data_primeira_troca::date)
-                    END AS dias_efetivo_da_peca
-                FROM trocas
-                LEFT JOIN veiculos_api va
-                    ON regexp_replace(va."Description", '\s*-\s*.*$', '') = trocas.id_veiculo
-                LEFT JOIN ultimo_hodometro_gps uhg 
-                    ON va."AssetId" = uhg."AssetId"
-                WHERE
-                    duracao_km_entre_trocas IS NOT NULL
-                    and duracao_km_entre_trocas > 0
-                    AND valor_peca > 0
             )
             SELECT 
-                *
-                FROM trocas_detalhadas
+                trocas.id_veiculo,
+                trocas.nome_pecas,
+                trocas.data_primeira_troca,
+                trocas.data_odometro_primeira_troca,
+                trocas.odometro_primeira_troca,
+                trocas.codigo_peca,
+                trocas.grupo_peca,
+                trocas.sub_grupo_peca,
+                trocas.quantidade_troca_1,
+                trocas.valor_peca,
+                trocas.quantidade_troca_2,
+                trocas.odometro_segunda_troca,
+                trocas.data_segunda_troca,
+                trocas.data_odometro_segunda_troca,
+                trocas.duracao_km_entre_trocas,
+                trocas.duracao_dias_entre_trocas,
+                trocas.numero_troca_par AS numero_troca,
+                'TEVE PAR' AS flag_troca, -- só entram trocas com a troca seguinte (duracao_km_entre_trocas > 0)
+                dv."Model",
+                dv."AssetId",
+                uhg."maior_km_dia" AS hodometro_atual_gps,
+                uhg."year_month_day" AS data_hodometro_gps,
+                ROUND(trocas.duracao_km_entre_trocas::numeric, 2) AS km_efetivo_da_peca,
+                trocas.duracao_dias_entre_trocas AS dias_efetivo_da_peca
+            FROM (
+                -- numero_troca da vida útil conta apenas as trocas com a troca seguinte (duracao_km_entre_trocas > 0),
+                -- em todo o histórico do par (veículo, peça) e não apenas no período filtrado
+                SELECT
+                    t.*,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY t.id_veiculo, t.codigo_peca
+                        ORDER BY t.numero_troca
+                    ) AS numero_troca_par
+                FROM pecas_trocas_ciclo_vida t
+                WHERE
+                    t.duracao_km_entre_trocas > 0
+                    AND t.valor_peca > 0
+                    -- Apenas os pares com trocas no período (o filtro de data em si fica fora da janela)
+                    AND (t.id_veiculo, t.codigo_peca) IN (
+                        SELECT id_veiculo, codigo_peca
+                        FROM pecas_trocas_ciclo_vida
+                        WHERE data_primeira_troca >= :data_inicio AND data_primeira_troca < :data_fim
+                    )
+            ) trocas
+            LEFT JOIN dim_veiculos dv
+                ON dv.codigo_veiculo = trocas.id_veiculo
+            LEFT JOIN ultimo_hodometro_gps uhg 
+                ON dv."AssetId" = uhg."AssetId"
             WHERE 
-                --km_efetivo_da_peca < 123000
-                grupo_peca NOT IN ('CONSUMO PARA FROTAS','MATERIAL DE CONSUMO', 'Pneumáticos')
-                AND sub_grupo_peca NOT IN ('Parafusos', 'Tintas')
-                AND data_primeira_troca BETWEEN '{data_inicio}' AND '{data_fim}'
-                    {subquery_modelo_str}
-                    {subquery_peças_str}
+                trocas.grupo_peca NOT IN ('CONSUMO PARA FROTAS','MATERIAL DE CONSUMO', 'Pneumáticos')
+                AND trocas.sub_grupo_peca NOT IN ('Parafusos', 'Tintas')
+                AND trocas.data_primeira_troca >= :data_inicio AND trocas.data_primeira_troca < :data_fim
+                {filtro}
             ORDER BY
-                nome_pecas, id_veiculo, TO_DATE(data_primeira_troca, 'YYYY-MM-DD')
+                trocas.nome_pecas, trocas.id_veiculo, trocas.data_primeira_troca
             """
 
             
             # Executa a consulta e retorna os dados como DataFrame
-            df = pd.read_sql(query, self.db_engine)
+            df = le_sql(filtro.texto(query), self.db_engine, params=filtro.params, servico="vida_util")
             return df
 
         except ValueError as e:
@@ -35,6 +35,10 @@ from db import PostgresSingleton
 from modules.entities_utils import *
 # Imports específicos
 from modules.home.home_service import HomeService
+from modules.cache_utils import guarda_dados_pagina, le_dados_pagina
+from modules.sql_utils import executa_em_paralelo
+from modules.grid_utils import OPCOES_GRID_SERVIDOR, registra_grid_servidor
+from modules.exportacao import registra_exportacao
 from modules.home.graficos import *
 import modules.home.tabelas as home_tabelas
 
@@ -48,29 +52,6 @@ pgEngine = pgDB.get_engine()
 # Cria o serviço
 home_service = HomeService(pgEngine)
 
-# Modelos de veículos
-df_modelos_veiculos = get_modelos(pgEngine)
-lista_todos_modelos_veiculos = df_modelos_veiculos.to_dict(orient="records")
-lista_todos_modelos_veiculos.insert(0, {"MODELO": "TODOS"})
-
-# Obtem a lista de Oficinas
-df_oficinas = get_oficinas(pgEngine)
-lista_todas_oficinas = df_oficinas.to_dict(orient="records")
-lista_todas_oficinas.insert(0, {"LABEL": "TODAS"})
-
-# Obtem a lista de Seções
-df_secoes = get_secoes(pgEngine)
-lista_todas_secoes = df_secoes.to_dict(orient="records")
-lista_todas_secoes.insert(0, {"LABEL": "TODAS"})
-
-# Colaboradores / Mecânicos
-df_mecanicos = get_mecanicos(pgEngine)
-
-# Obtem a lista de OS
-df_lista_pecas = get_pecas(pgEngine)
-lista_todas_pecas = df_lista_pecas.to_dict(orient="records")
-lista_todas_pecas.insert(0, {"LABEL": "TODAS"})
-
 
 ##############################################################################
 # CALLBACKS ##################################################################
@@ -173,7 +154,7 @@ def corrige_input_pecas(datas, lista_modelos, lista_oficina, lista_secao, lista_
             - options (list[dict]): Lista de opções para o dropdown no formato {"label": ..., "value": ...}.
             - value (list): Lista de valores corrigida para manter a seleção válida com base nos filtros.
     """
-    df_lista_pecas_secao = df_lista_pecas
+    df_lista_pecas_secao = catalogo_entidades.get_pecas()
 
     if "TODAS" not in lista_secao:
         df_lista_pecas_secao = home_service.get_pecas(datas, lista_modelos, lista_oficina, lista_secao)
@@ -213,13 +194,13 @@ def plota_grafico_linha_custo_mensal(datas, lista_modelos, lista_oficina, lista_
     if not input_valido(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas):
         return go.Figure()
 
-    # Obtem os dados
-    df_custo = home_service.get_custo_mensal_pecas(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas)
-    df_quantidade = home_service.get_troca_pecas_mensal(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas)
-    df_custo_retrabalho = home_service.get_custo_mensal_pecas_retrabalho(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas)
+    # Obtem os dados (snapshot único compartilhado com as tabelas da página)
+    snapshot = home_service.get_snapshot_pecas(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas)
 
     # Gera o gráfico
-    fig = grafico_custo_quantidade_mensal(df_custo, df_quantidade, df_custo_retrabalho)
+    fig = grafico_custo_quantidade_mensal(
+        snapshot["custo_mensal"], snapshot["troca_mensal"], snapshot["custo_mensal_retrabalho"]
+    )
     return fig
 
 
@@ -228,10 +209,22 @@ def plota_grafico_linha_custo_mensal(datas, lista_modelos, lista_oficina, lista_
 ##############################################################################
 
 
+def le_df_rank_pecas(dados):
+    # Lê o ranking guardado para os filtros; recalcula se a entrada saiu do cache
+    if not dados:
+        return pd.DataFrame()
+
+    df = le_dados_pagina(dados["chave"])
+    if df is None:
+        df = home_service.get_snapshot_pecas(**dados["filtros"])["rank_pecas"]
+
+    return df
+
+
 @callback(
     [
         Output("loading-overlay-visao-geral", "visible"),
-        Output("tabela-ranking-de-pecas-mais-caras", "rowData"),
+        Output("store-dados-rank-pecas", "data"),
     ],
     [
         Input("input-intervalo-datas-geral", "value"),
@@ -244,38 +237,36 @@ def plota_grafico_linha_custo_mensal(datas, lista_modelos, lista_oficina, lista_
 def atualiza_tabela_rank_pecas(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas):
     # Valida input
     if not input_valido(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas):
-        return False, []
+        return False, None
 
     # Obtem dados
-    df = home_service.get_rank_pecas(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas)
-
-    return False, df.to_dict("records")
-
-# Callback para atualizar o link de download quando o botão for clicado
-@callback(
-    Output("download-excel-tabela-rank-pecas", "data"),
-    [
-        Input("btn-exportar-rank-pecas", "n_clicks"),
-        Input("input-intervalo-datas-geral", "value"),
-        Input("input-select-modelo-veiculos-visao-geral", "value"),
-        Input("input-select-oficina-visao-geral", "value"),
-        Input("input-select-secao-visao-geral", "value"),
-        Input("input-select-pecas-visao-geral", "value"),
-    ],
-    prevent_initial_call=True
+    filtros = {
+        "datas": datas,
+        "lista_modelos": lista_modelos,
+        "lista_oficinas": lista_oficina,
+        "lista_secoes": lista_secao,
+        "lista_pecas": lista_pecas,
+    }
+    df = home_service.get_snapshot_pecas(**filtros)["rank_pecas"]
+
+    if df.empty:
+        return False, None
+
+    # A tabela não recebe as linhas: guarda o ranking no servidor e o grid pede os blocos visíveis
+    chave = guarda_dados_pagina("rank_pecas", df, **filtros)
+    return False, {"chave": chave, "filtros": filtros}
+
+
+registra_grid_servidor("tabela-ranking-de-pecas-mais-caras", "store-dados-rank-pecas", le_df_rank_pecas)
+
+# Exporta o ranking já guardado para os filtros (o botão é o único gatilho)
+registra_exportacao(
+    "btn-exportar-rank-pecas",
+    "download-excel-tabela-rank-pecas",
+    [State("store-dados-rank-pecas", "data")],
+    le_df_rank_pecas,
+    "tabela_rank_pecas",
 )
-def download_excel_tabela_top_rank_pecas(n_clicks, datas, lista_modelos, lista_oficina, lista_secao, lista_pecas):
-    if not n_clicks or n_clicks <= 0: # Garantre que ao iniciar ou carregar a page, o arquivo não seja baixado
-        return dash.no_update
-
-    date_now = date.today().strftime('%d-%m-%Y')
-    
-    # Obtem os dados
-    df = home_service.get_rank_pecas(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas)
-
-    excel_data = gerar_excel(df=df)
-    return dcc.send_bytes(excel_data, f"tabela_rank_pecas_{date_now}.xlsx")
-
 
 
 @callback(
@@ -294,34 +285,32 @@ def atualiza_tabela_principais_pecas(datas, lista_modelos, lista_oficina, lista_
         return []
 
     # Obtem dados
-    df = home_service.get_principais_pecas(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas)
+    df = home_service.get_snapshot_pecas(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas)["principais_pecas"]
 
     return df.to_dict("records")
 
-# Callback para atualizar o link de download quando o botão for clicado
-@callback(
-    Output("download-excel-tabela-principais-pecas", "data"),
+def le_df_principais_pecas(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas):
+    # O snapshot da página está em cache para os filtros, então a exportação não consulta o banco de novo
+    if not input_valido(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas):
+        return None
+
+    return home_service.get_snapshot_pecas(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas)["principais_pecas"]
+
+
+# Exporta as principais peças (os filtros são lidos apenas no clique)
+registra_exportacao(
+    "btn-exportar-tabela-principais-pecas",
+    "download-excel-tabela-principais-pecas",
     [
-        Input("btn-exportar-tabela-principais-pecas", "n_clicks"),
-        Input("input-intervalo-datas-geral", "value"),
-        Input("input-select-modelo-veiculos-visao-geral", "value"),
-        Input("input-select-oficina-visao-geral", "value"),
-        Input("input-select-secao-visao-geral", "value"),
-        Input("input-select-pecas-visao-geral", "value"),
+        State("input-intervalo-datas-geral", "value"),
+        State("input-select-modelo-veiculos-visao-geral", "value"),
+        State("input-select-oficina-visao-geral", "value"),
+        State("input-select-secao-visao-geral", "value"),
+        State("input-select-pecas-visao-geral", "value"),
     ],
-    prevent_initial_call=True
+    le_df_principais_pecas,
+    "tabela_principais_pecas",
 )
-def download_excel_principais_pecas(n_clicks, datas, lista_modelos, lista_oficina, lista_secao, lista_pecas):
-    if not n_clicks or n_clicks <= 0: # Garantre que ao iniciar ou carregar a page, o arquivo não seja baixado
-        return dash.no_update
-
-    date_now = date.today().strftime('%d-%m-%Y')
-    
-    # Obtem os dados
-    df = home_service.get_principais_pecas(datas, lista_modelos, lista_oficina, lista_secao, lista_pecas)
-
-    excel_data = gerar_excel(df=df)
-    return dcc.send_bytes(excel_data, f"tabela_principais_pecas_{date_now}.xlsx")
 
 ##############################################################################
 ### Callbacks para os labels #################################################
@@ -387,442 +376,455 @@ def gera_labels_inputs(campo):
 ##############################################################################
 # Layout #####################################################################
 ##############################################################################
-layout = dbc.Container(
-    [
-        # Loading
-        dmc.LoadingOverlay(
-            visible=True,
-            id="loading-overlay-visao-geral",
-            loaderProps={"size": "xl"},
-            overlayProps={
-                "radius": "lg",
-                "blur": 2,
-                "style": {
-                    "top": 0,  # Start from the top of the viewport
-                    "left": 0,  # Start from the left of the viewport
-                    "width": "100vw",  # Cover the entire width of the viewport
-                    "height": "100vh",  # Cover the entire height of the viewport
+def layout(**kwargs):
+    # Listas dos filtros lidas do catálogo a cada carregamento da página (ver CatalogoEntidades)
+    # As listas são independentes: lidas ao mesmo tempo quando não estão no cache
+    df_modelos, df_oficinas, df_pecas = executa_em_paralelo(
+        catalogo_entidades.get_modelos, catalogo_entidades.get_oficinas, catalogo_entidades.get_pecas
+    )
+    lista_todos_modelos_veiculos = lista_com_todos(df_modelos, "MODELO", "TODOS")
+    lista_todas_oficinas = lista_com_todos(df_oficinas)
+    lista_todas_pecas = lista_com_todos(df_pecas)
+
+    return dbc.Container(
+        [
+            # Loading
+            dmc.LoadingOverlay(
+                visible=True,
+                id="loading-overlay-visao-geral",
+                loaderProps={"size": "xl"},
+                overlayProps={
+                    "radius": "lg",
+                    "blur": 2,
+                    "style": {
+                        "top": 0,  # Start from the top of the viewport
+                        "left": 0,  # Start from the left of the viewport
+                        "width": "100vw",  # Cover the entire width of the viewport
+                        "height": "100vh",  # Cover the entire height of the viewport
+                    },
                 },
-            },
-            zIndex=10,
-        ),
-        # Cabeçalho
-        dbc.Row(
-            [
-                dbc.Col(
-                    [
-                        # Cabeçalho e Inputs
-                        dbc.Row(
-                            [
-                                html.Hr(),
-                                dbc.Row(
-                                    [
-                                        dbc.Col(DashIconify(icon="mdi:tools", width=45), width="auto"),
-                                        dbc.Col(
-                                            html.H1(
-                                                [
-                                                    "Visão geral das\u00a0",
-                                                    html.Strong("peças"),
-                                                ],
-                                                className="align-self-center",
-                                            ),
-                                            width=True,
-                                        ),
-                                    ],
-                                    align="center",
-                                ),
-                                dmc.Space(h=15),
-                                html.Hr(),
-                                dbc.Col(
-                                    dbc.Card(
+                zIndex=10,
+            ),
+            # Chave do ranking de peças para os filtros atuais (os dados ficam no servidor)
+            dcc.Store(id="store-dados-rank-pecas"),
+            # Cabeçalho
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            # Cabeçalho e Inputs
+                            dbc.Row(
+                                [
+                                    html.Hr(),
+                                    dbc.Row(
                                         [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("Data (intervalo) de análise"),
-                                                    dmc.DatePicker(
-                                                        id="input-intervalo-datas-geral",
-                                                        allowSingleDateInRange=True,
-                                                        type="range",
-                                                        minDate=date(2024, 8, 1),
-                                                        maxDate=date.today(),
-                                                        value=[date(2024, 8, 1), date.today()],
-                                                    ),
-                                                ],
-                                                className="dash-bootstrap",
+                                            dbc.Col(DashIconify(icon="mdi:tools", width=45), width="auto"),
+                                            dbc.Col(
+                                                html.H1(
+                                                    [
+                                                        "Visão geral das\u00a0",
+                                                        html.Strong("peças"),
+                                                    ],
+                                                    className="align-self-center",
+                                                ),
+                                                width=True,
                                             ),
                                         ],
-                                        body=True,
+                                        align="center",
                                     ),
-                                    md=6,
-                                ),
-                                dbc.Col(
-                                    dbc.Card(
-                                        [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("Modelos de Veículos"),
-                                                    dcc.Dropdown(
-                                                        id="input-select-modelo-veiculos-visao-geral",
-                                                        options=[
-                                                            {
-                                                                "label": os["MODELO"],
-                                                                "value": os["MODELO"],
-                                                            }
-                                                            for os in lista_todos_modelos_veiculos
-                                                        ],
-                                                        multi=True,
-                                                        value=["TODOS"],
-                                                        placeholder="Selecione um ou mais modelos...",
-                                                    ),
-                                                ],
-                                                className="dash-bootstrap",
-                                            ),
-                                        ],
-                                        body=True,
+                                    dmc.Space(h=15),
+                                    html.Hr(),
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Data (intervalo) de análise"),
+                                                        dmc.DatePicker(
+                                                            id="input-intervalo-datas-geral",
+                                                            allowSingleDateInRange=True,
+                                                            type="range",
+                                                            minDate=date(2024, 8, 1),
+                                                            maxDate=date.today(),
+                                                            value=[date(2024, 8, 1), date.today()],
+                                                        ),
+                                                    ],
+                                                    className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=6,
                                     ),
-                                    md=6,
-                                ),
-                                dmc.Space(h=10),
-                                dbc.Col(
-                                    dbc.Card(
-                                        [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("Oficinas"),
-                                                    dcc.Dropdown(
-                                                        id="input-select-oficina-visao-geral",
-                                                        options=[{"label": os["LABEL"], "value": os["LABEL"]} for os in lista_todas_oficinas],
-                                                        multi=True,
-                                                        value=["TODAS"],
-                                                        placeholder="Selecione uma ou mais oficinas...",
-                                                    ),
-                                                ],
-                                                className="dash-bootstrap",
-                                            ),
-                                        ],
-                                        body=True,
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Modelos de Veículos"),
+                                                        dcc.Dropdown(
+                                                            id="input-select-modelo-veiculos-visao-geral",
+                                                            options=[
+                                                                {
+                                                                    "label": os["MODELO"],
+                                                                    "value": os["MODELO"],
+                                                                }
+                                                                for os in lista_todos_modelos_veiculos
+                                                            ],
+                                                            multi=True,
+                                                            value=["TODOS"],
+                                                            placeholder="Selecione um ou mais modelos...",
+                                                        ),
+                                                    ],
+                                                    className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=6,
                                     ),
-                                    md=6,
-                                ),
-                                dbc.Col(
-                                    dbc.Card(
-                                        [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("Seções (categorias) de manutenção"),
-                                                    dcc.Dropdown(
-                                                        id="input-select-secao-visao-geral",
-                                                        options=[
-                                                            # {"label": "TODAS", "value": "TODAS"},
-                                                            # {
-                                                            #     "label": "BORRACHARIA",
-                                                            #     "value": "MANUTENCAO BORRACHARIA",
-                                                            # },
-                                                            {
-                                                                "label": "ELETRICA",
-                                                                "value": "MANUTENCAO ELETRICA",
-                                                            },
-                                                            # {"label": "GARAGEM", "value": "MANUTENÇÃO GARAGEM"},
-                                                            # {
-                                                            #     "label": "LANTERNAGEM",
-                                                            #     "value": "MANUTENCAO LANTERNAGEM",
-                                                            # },
-                                                            # {"label": "LUBRIFICAÇÃO", "value": "LUBRIFICAÇÃO"},
-                                                            {
-                                                                "label": "MECANICA",
-                                                                "value": "MANUTENCAO MECANICA",
-                                                            },
-                                                            # {"label": "PINTURA", "value": "MANUTENCAO PINTURA"},
-                                                            # {
-                                                            #     "label": "SERVIÇOS DE TERCEIROS",
-                                                            #     "value": "SERVIÇOS DE TERCEIROS",
-                                                            # },
-                                                            # {
-                                                            #     "label": "SETOR DE ALINHAMENTO",
-                                                            #     "value": "SETOR DE ALINHAMENTO",
-                                                            # },
-                                                            # {
-                                                            #     "label": "SETOR DE POLIMENTO",
-                                                            #     "value": "SETOR DE POLIMENTO",
-                                                            # },
-                                                        ],
-                                                        multi=True,
-                                                        value=["MANUTENCAO ELETRICA", "MANUTENCAO MECANICA"],
-                                                        placeholder="Selecione uma ou mais seções...",
-                                                    ),
-                                                ],
-                                                # className="dash-bootstrap",
-                                            ),
-                                        ],
-                                        body=True,
+                                    dmc.Space(h=10),
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Oficinas"),
+                                                        dcc.Dropdown(
+                                                            id="input-select-oficina-visao-geral",
+                                                            options=[{"label": os["LABEL"], "value": os["LABEL"]} for os in lista_todas_oficinas],
+                                                            multi=True,
+                                                            value=["TODAS"],
+                                                            placeholder="Selecione uma ou mais oficinas...",
+                                                        ),
+                                                    ],
+                                                    className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=6,
+                                    ),
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Seções (categorias) de manutenção"),
+                                                        dcc.Dropdown(
+                                                            id="input-select-secao-visao-geral",
+                                                            options=[
+                                                                # {"label": "TODAS", "value": "TODAS"},
+                                                                # {
+                                                                #     "label": "BORRACHARIA",
+                                                                #     "value": "MANUTENCAO BORRACHARIA",
+                                                                # },
+                                                                {
+                                                                    "label": "ELETRICA",
+                                                                    "value": "MANUTENCAO ELETRICA",
+                                                                },
+                                                                # {"label": "GARAGEM", "value": "MANUTENÇÃO GARAGEM"},
+                                                                # {
+                                                                #     "label": "LANTERNAGEM",
+                                                                #     "value": "MANUTENCAO LANTERNAGEM",
+                                                                # },
+                                                                # {"label": "LUBRIFICAÇÃO", "value": "LUBRIFICAÇÃO"},
+                                                                {
+                                                                    "label": "MECANICA",
+                                                                    "value": "MANUTENCAO MECANICA",
+                                                                },
+                                                                # {"label": "PINTURA", "value": "MANUTENCAO PINTURA"},
+                                                                # {
+                                                                #     "label": "SERVIÇOS DE TERCEIROS",
+                                                                #     "value": "SERVIÇOS DE TERCEIROS",
+                                                                # },
+                                                                # {
+                                                                #     "label": "SETOR DE ALINHAMENTO",
+                                                                #     "value": "SETOR DE ALINHAMENTO",
+                                                                # },
+                                                                # {
+                                                                #     "label": "SETOR DE POLIMENTO",
+                                                                #     "value": "SETOR DE POLIMENTO",
+                                                                # },
+                                                            ],
+                                                            multi=True,
+                                                            value=["MANUTENCAO ELETRICA", "MANUTENCAO MECANICA"],
+                                                            placeholder="Selecione uma ou mais seções...",
+                                                        ),
+                                                    ],
+                                                    # className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=6,
                                     ),
-                                    md=6,
+                                    dmc.Space(h=10),
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Peça específica"),
+                                                        dcc.Dropdown(
+                                                            id="input-select-pecas-visao-geral",
+                                                            options=[{"label": pecas["LABEL"], "value": pecas["LABEL"]} for pecas in lista_todas_pecas],
+                                                            multi=True,
+                                                            value=["TODAS"],
+                                                            placeholder="Selecione uma ou mais peças específicas...",
+                                                        ),
+                                                    ],
+                                                    className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=12,
+                                    ),
+                                ]
+                            ),
+                        ],
+                    ),
+                ]
+            ),
+            #### ALterar graficos para dados de peças
+            # Gráfico de Retrabalho por Modelo
+            dmc.Space(h=30),
+            dbc.Row(
+                [
+                    dbc.Col(DashIconify(icon="mdi:chart-line", width=45), width="auto"),
+                    dbc.Col(
+                        dbc.Row(
+                            [
+                                html.H4(
+                                    "Gráfico do custo gasto com peças por mês",
+                                    className="align-self-center",
                                 ),
-                                dmc.Space(h=10),
-                                dbc.Col(
-                                    dbc.Card(
-                                        [
+                                dmc.Space(h=5),
+                                gera_labels_inputs("visao-geral-quanti-frota"),
+                            ]
+                        ),
+                        width=True,
+                    ),
+                ],
+                align="center",
+            ),
+            dcc.Graph(id="graph-visao-geral-gasto-troca-pecas-mensal"),
+            dmc.Space(h=40),
+            # Tabela com as estatísticas gerais de Retrabalho
+            dbc.Row(
+                [
+                    dbc.Col(DashIconify(icon="mdi:trophy", width=45), width="auto"),
+                    dbc.Col(
+                        dbc.Row(
+                            [
+                                html.H4(
+                                    "PRINCIPAIS PEÇAS",
+                                    className="align-self-center",
+                                ),
+                                dmc.Space(h=5),
+                                dbc.Row(
+                                    [
+                                        dbc.Col(gera_labels_inputs("visao-geral-tabela-tipo-os"), width=True),
+                                        dbc.Col(
                                             html.Div(
                                                 [
-                                                    dbc.Label("Peça específica"),
-                                                    dcc.Dropdown(
-                                                        id="input-select-pecas-visao-geral",
-                                                        options=[{"label": pecas["LABEL"], "value": pecas["LABEL"]} for pecas in lista_todas_pecas],
-                                                        multi=True,
-                                                        value=["TODAS"],
-                                                        placeholder="Selecione uma ou mais peças específicas...",
+                                                    html.Button(
+                                                        "Exportar para Excel",
+                                                        id="btn-exportar-rank-pecas",
+                                                        n_clicks=0,
+                                                        style={
+                                                            "background-color": "#007bff",  # Azul
+                                                            "color": "white",
+                                                            "border": "none",
+                                                            "padding": "10px 20px",
+                                                            "border-radius": "8px",
+                                                            "cursor": "pointer",
+                                                            "font-size": "16px",
+                                                            "font-weight": "bold",
+                                                        },
                                                     ),
+                                                    dcc.Download(id="download-excel-tabela-rank-pecas"),
                                                 ],
-                                                className="dash-bootstrap",
+                                                style={"text-align": "right"},
                                             ),
-                                        ],
-                                        body=True,
-                                    ),
-                                    md=12,
+                                            width="auto",
+                                        ),
+                                    ],
+                                    align="center",
+                                    justify="between",  # Deixa os itens espaçados
                                 ),
                             ]
                         ),
-                    ],
-                ),
-            ]
-        ),
-        #### ALterar graficos para dados de peças
-        # Gráfico de Retrabalho por Modelo
-        dmc.Space(h=30),
-        dbc.Row(
-            [
-                dbc.Col(DashIconify(icon="mdi:chart-line", width=45), width="auto"),
-                dbc.Col(
-                    dbc.Row(
-                        [
-                            html.H4(
-                                "Gráfico do custo gasto com peças por mês",
-                                className="align-self-center",
-                            ),
-                            dmc.Space(h=5),
-                            gera_labels_inputs("visao-geral-quanti-frota"),
-                        ]
-                    ),
-                    width=True,
-                ),
-            ],
-            align="center",
-        ),
-        dcc.Graph(id="graph-visao-geral-gasto-troca-pecas-mensal"),
-        dmc.Space(h=40),
-        # Tabela com as estatísticas gerais de Retrabalho
-        dbc.Row(
-            [
-                dbc.Col(DashIconify(icon="mdi:trophy", width=45), width="auto"),
-                dbc.Col(
-                    dbc.Row(
-                        [
-                            html.H4(
-                                "PRINCIPAIS PEÇAS",
-                                className="align-self-center",
-                            ),
-                            dmc.Space(h=5),
-                            dbc.Row(
-                                [
-                                    dbc.Col(gera_labels_inputs("visao-geral-tabela-tipo-os"), width=True),
-                                    dbc.Col(
-                                        html.Div(
-                                            [
-                                                html.Button(
-                                                    "Exportar para Excel",
-                                                    id="btn-exportar-rank-pecas",
-                                                    n_clicks=0,
-                                                    style={
-                                                        "background-color": "#007bff",  # Azul
-                                                        "color": "white",
-                                                        "border": "none",
-                                                        "padding": "10px 20px",
-                                                        "border-radius": "8px",
-                                                        "cursor": "pointer",
-                                                        "font-size": "16px",
-                                                        "font-weight": "bold",
-                                                    },
-                                                ),
-                                                dcc.Download(id="download-excel-tabela-rank-pecas"),
-                                            ],
-                                            style={"text-align": "right"},
-                                        ),
-                                        width="auto",
-                                    ),
-                                ],
-                                align="center",
-                                justify="between",  # Deixa os itens espaçados
-                            ),
-                        ]
+                        width=True,
                     ),
-                    width=True,
-                ),
-            ],
-            align="center",
-        ),
-        dmc.Space(h=20),
-        # dag.AgGrid(
-        #     # enableEnterpriseModules=True,
-        #     id="tabela-ranking-de-pecas-mais-caras",
-        #     columnDefs=home_tabelas.tbl_ranking_de_pecas_mais_trocadas,
-        #     rowData=[],
-        #     defaultColDef={"filter": True, "floatingFilter": True},
-        #     columnSize="autoSize",
-        #     dashGridOptions={
-        #         "localeText": locale_utils.AG_GRID_LOCALE_BR,
-        #     },
-        #     # Permite resize --> https://community.plotly.com/t/anyone-have-better-ag-grid-resizing-scheme/78398/5
-        #     style={"height": 400, "resize": "vertical", "overflow": "hidden"},
-        # ),
-        dag.AgGrid(
-        id="tabela-ranking-de-pecas-mais-caras",
-        columnDefs=home_tabelas.tbl_ranking_de_pecas_mais_trocadas,
-        rowData=[],  # suas 2000 linhas
-        defaultColDef={"filter": True, "floatingFilter": True},
-        # Remova columnSize="autoSize" se estiver lento
-        dashGridOptions={
-            "localeText": locale_utils.AG_GRID_LOCALE_BR,
-            "pagination": True,            # habilita paginação
-            "paginationPageSize": 50       # mostra 50 linhas por página (ajuste conforme quiser)
-        },
-        style={"height": 400, "overflow": "hidden"},
-        ),
-        dmc.Space(h=40),
-        # Tabela com as estatísticas gerais por Colaborador
-        # dbc.Row(
-        #     [
-        #         dbc.Col(DashIconify(icon="mdi:bus-wrench", width=45), width="auto"),
-        #         dbc.Col(
-        #             dbc.Row(
-        #                 [
-        #                     html.H4(
-        #                         "PRINCIPAIS PEÇAS",
-        #                         className="align-self-center",
-        #                     ),
-        #                     dmc.Space(h=5),
-        #                     dbc.Row(
-        #                         [
-        #                             dbc.Col(gera_labels_inputs("visao-geral-tabela-principais-pecas"), width=True),
-        #                             dbc.Col(
-        #                                 html.Div(
-        #                                     [
-        #                                         html.Button(
-        #                                             "Exportar para Excel",
-        #                                             id="btn-exportar-tabela-principais-pecas",
-        #                                             n_clicks=0,
-        #                                             style={
-        #                                                 "background-color": "#007bff",  # Azul
-        #                                                 "color": "white",
-        #                                                 "border": "none",
-        #                                                 "padding": "10px 20px",
-        #                                                 "border-radius": "8px",
-        #                                                 "cursor": "pointer",
-        #                                                 "font-size": "16px",
-        #                                                 "font-weight": "bold",
-        #                                             },
-        #                                         ),
-        #                                         dcc.Download(id="download-excel-tabela-principais-pecas"),
-        #                                     ],
-        #                                     style={"text-align": "right"},
-        #                                 ),
-        #                                 width="auto",
-        #                             ),
-        #                         ],
-        #                         align="center",
-        #                         justify="between",  # Deixa os itens espaçados
-        #                     ),
-        #                 ]
-        #             ),
-        #             width=True,
-        #         ),
-        #     ],
-        #     align="center",
-        # ),
-
-        # dmc.Space(h=20),
-        # dag.AgGrid(
-        #     id="tabela-principais-pecas",
-        #     columnDefs=home_tabelas.tbl_pincipais_pecas,
-        #     rowData=[],
-        #     defaultColDef={
-        #     "filter": True,
-        #     "floatingFilter": True,
-        #     "resizable": True,
-        #     "autoSize": True,  # <- aqui já resolve para todas
-        #     },
-        #     columnSize="responsiveSizeToFit",  # Corrigido aqui
-        #     dashGridOptions={
-        #         "localeText": locale_utils.AG_GRID_LOCALE_BR,
-        #     },
-        #     style={"height": 400, "resize": "vertical", "overflow": "hidden"},
-        # ),
-        dmc.Space(h=40),
-                # dmc.Space(h=20),
-        # dag.AgGrid(
-        #     id="tabela-veiculos-que-mais-trocam-pecas",
-        #     columnDefs=home_tabelas.tbl_veiculos_que_mais_trocam_pecas,
-        #     rowData=[],
-        #     defaultColDef={"filter": True, "floatingFilter": True},
-        #     columnSize="autoSize",
-        #     dashGridOptions={
-        #         "localeText": locale_utils.AG_GRID_LOCALE_BR,
-        #     },
-        #     # Permite resize --> https://community.plotly.com/t/anyone-have-better-ag-grid-resizing-scheme/78398/5
-        #     style={"height": 400, "resize": "vertical", "overflow": "hidden"},
-        # ),
-        # dmc.Space(h=40),
-        # # Tabela com as estatísticas gerais por Veículo
-        # dbc.Row(
-        #     [
-        #         dbc.Col(DashIconify(icon="mdi:bus-wrench", width=45), width="auto"),
-        #         dbc.Col(
-        #             dbc.Row(
-        #                 [
-        #                     html.H4(
-        #                         "Tabela principais peças",
-        #                         className="align-self-center",
-        #                     ),
-        #                     dmc.Space(h=5),
-        #                     dbc.Row(
-        #                         [
-        #                             dbc.Col(gera_labels_inputs("visao-geral-tabela-principais-pecas"), width=True),
-        #                             dbc.Col(
-        #                                 html.Div(
-        #                                     [
-        #                                         html.Button(
-        #                                             "Exportar para Excel",
-        #                                             id="btn-exportar-tabela-veiculo",
-        #                                             n_clicks=0,
-        #                                             style={
-        #                                                 "background-color": "#007bff",  # Azul
-        #                                                 "color": "white",
-        #                                                 "border": "none",
-        #                                                 "padding": "10px 20px",
-        #                                                 "border-radius": "8px",
-        #                                                 "cursor": "pointer",
-        #                                                 "font-size": "16px",
-        #                                                 "font-weight": "bold",
-        #                                             },
-        #                                         ),
-        #                                         dcc.Download(id="download-excel-mais-trocam-pecas"),
-        #                                     ],
-        #                                     style={"text-align": "right"},
-        #                                 ),
-        #                                 width="auto",
-        #                             ),
-        #                         ],
-        #                         align="center",
-        #                         justify="between",  # Deixa os itens espaçados
-        #                     ),
-        #                 ]
-        #             ),
-        #             width=True,
-        #         ),
-        #     ],
-        #     align="center",
-        # ),
-    ]
-)
+                ],
+                align="center",
+            ),
+            dmc.Space(h=20),
+            # dag.AgGrid(
+            #     # enableEnterpriseModules=True,
+            #     id="tabela-ranking-de-pecas-mais-caras",
+            #     columnDefs=home_tabelas.tbl_ranking_de_pecas_mais_trocadas,
+            #     rowData=[],
+            #     defaultColDef={"filter": True, "floatingFilter": True},
+            #     columnSize="autoSize",
+            #     dashGridOptions={
+            #         "localeText": locale_utils.AG_GRID_LOCALE_BR,
+            #     },
+            #     # Permite resize --> https://community.plotly.com/t/anyone-have-better-ag-grid-resizing-scheme/78398/5
+            #     style={"height": 400, "resize": "vertical", "overflow": "hidden"},
+            # ),
+            dag.AgGrid(
+            id="tabela-ranking-de-pecas-mais-caras",
+            columnDefs=home_tabelas.tbl_ranking_de_pecas_mais_trocadas,
+            rowModelType="infinite",  # linhas paginadas, ordenadas e filtradas no servidor
+            defaultColDef={"filter": True, "floatingFilter": True},
+            # Remova columnSize="autoSize" se estiver lento
+            dashGridOptions={
+                "localeText": locale_utils.AG_GRID_LOCALE_BR,
+                "pagination": True,            # habilita paginação
+                "paginationPageSize": 50,      # mostra 50 linhas por página (ajuste conforme quiser)
+                **OPCOES_GRID_SERVIDOR,
+            },
+            style={"height": 400, "overflow": "hidden"},
+            ),
+            dmc.Space(h=40),
+            # Tabela com as estatísticas gerais por Colaborador
+            # dbc.Row(
+            #     [
+            #         dbc.Col(DashIconify(icon="mdi:bus-wrench", width=45), width="auto"),
+            #         dbc.Col(
+            #             dbc.Row(
+            #                 [
+            #                     html.H4(
+            #                         "PRINCIPAIS PEÇAS",
+            #                         className="align-self-center",
+            #                     ),
+            #                     dmc.Space(h=5),
+            #                     dbc.Row(
+            #                         [
+            #                             dbc.Col(gera_labels_inputs("visao-geral-tabela-principais-pecas"), width=True),
+            #                             dbc.Col(
+            #                                 html.Div(
+            #                                     [
+            #                                         html.Button(
+            #                                             "Exportar para Excel",
+            #                                             id="btn-exportar-tabela-principais-pecas",
+            #                                             n_clicks=0,
+            #                                             style={
+            #                                                 "background-color": "#007bff",  # Azul
+            #                                                 "color": "white",
+            #                                                 "border": "none",
+            #                                                 "padding": "10px 20px",
+            #                                                 "border-radius": "8px",
+            #                                                 "cursor": "pointer",
+            #                                                 "font-size": "16px",
+            #                                                 "font-weight": "bold",
+            #                                             },
+            #                                         ),
+            #                                         dcc.Download(id="download-excel-tabela-principais-pecas"),
+            #                                     ],
+            #                                     style={"text-align": "right"},
+            #                                 ),
+            #                                 width="auto",
+            #                             ),
+            #                         ],
+            #                         align="center",
+            #                         justify="between",  # Deixa os itens espaçados
+            #                     ),
+            #                 ]
+            #             ),
+            #             width=True,
+            #         ),
+            #     ],
+            #     align="center",
+            # ),
+
+            # dmc.Space(h=20),
+            # dag.AgGrid(
+            #     id="tabela-principais-pecas",
+            #     columnDefs=home_tabelas.tbl_pincipais_pecas,
+            #     rowData=[],
+            #     defaultColDef={
+            #     "filter": True,
+            #     "floatingFilter": True,
+            #     "resizable": True,
+            #     "autoSize": True,  # <- aqui já resolve para todas
+            #     },
+            #     columnSize="responsiveSizeToFit",  # Corrigido aqui
+            #     dashGridOptions={
+            #         "localeText": locale_utils.AG_GRID_LOCALE_BR,
+            #     },
+            #     style={"height": 400, "resize": "vertical", "overflow": "hidden"},
+            # ),
+            dmc.Space(h=40),
+                    # dmc.Space(h=20),
+            # dag.AgGrid(
+            #     id="tabela-veiculos-que-mais-trocam-pecas",
+            #     columnDefs=home_tabelas.tbl_veiculos_que_mais_trocam_pecas,
+            #     rowData=[],
+            #     defaultColDef={"filter": True, "floatingFilter": True},
+            #     columnSize="autoSize",
+            #     dashGridOptions={
+            #         "localeText": locale_utils.AG_GRID_LOCALE_BR,
+            #     },
+            #     # Permite resize --> https://community.plotly.com/t/anyone-have-better-ag-grid-resizing-scheme/78398/5
+            #     style={"height": 400, "resize": "vertical", "overflow": "hidden"},
+            # ),
+            # dmc.Space(h=40),
+            # # Tabela com as estatísticas gerais por Veículo
+            # dbc.Row(
+            #     [
+            #         dbc.Col(DashIconify(icon="mdi:bus-wrench", width=45), width="auto"),
+            #         dbc.Col(
+            #             dbc.Row(
+            #                 [
+            #                     html.H4(
+            #                         "Tabela principais peças",
+            #                         className="align-self-center",
+            #                     ),
+            #                     dmc.Space(h=5),
+            #                     dbc.Row(
+            #                         [
+            #                             dbc.Col(gera_labels_inputs("visao-geral-tabela-principais-pecas"), width=True),
+            #                             dbc.Col(
+            #                                 html.Div(
+            #                                     [
+            #                                         html.Button(
+            #                                             "Exportar para Excel",
+            #                                             id="btn-exportar-tabela-veiculo",
+            #                                             n_clicks=0,
+            #                                             style={
+            #                                                 "background-color": "#007bff",  # Azul
+            #                                                 "color": "white",
+            #                                                 "border": "none",
+            #                                                 "padding": "10px 20px",
+            #                                                 "border-radius": "8px",
+            #                                                 "cursor": "pointer",
+            #                                                 "font-size": "16px",
+            #                                                 "font-weight": "bold",
+            #                                             },
+            #                                         ),
+            #                                         dcc.Download(id="download-excel-mais-trocam-pecas"),
+            #                                     ],
+            #                                     style={"text-align": "right"},
+            #                                 ),
+            #                                 width="auto",
+            #                             ),
+            #                         ],
+            #                         align="center",
+            #                         justify="between",  # Deixa os itens espaçados
+            #                     ),
+            #                 ]
+            #             ),
+            #             width=True,
+            #         ),
+            #     ],
+            #     align="center",
+            # ),
+        ]
+    )
 
 
 ##############################################################################
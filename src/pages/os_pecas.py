@@ -36,6 +36,7 @@ from modules.entities_utils import *
 # Imports específicos
 from modules.os.graficos import *
 from modules.os.os_service import ServiceOS
+from modules.sql_utils import executa_em_paralelo
 
 ##############################################################################
 # LEITURA DE DADOS ###########################################################
@@ -47,35 +48,6 @@ pgEngine = pgDB.get_engine()
 # Cria o serviço
 os_service = ServiceOS(pgEngine)
 
-# Modelos de veículos
-df_modelos_veiculos = get_modelos(pgEngine)
-lista_todos_modelos_veiculos = df_modelos_veiculos.to_dict(orient="records")
-lista_todos_modelos_veiculos.insert(0, {"MODELO": "TODOS"})
-
-# Obtem a lista de Oficinas
-df_oficinas = get_oficinas(pgEngine)
-lista_todas_oficinas = df_oficinas.to_dict(orient="records")
-lista_todas_oficinas.insert(0, {"LABEL": "TODAS"})
-
-# Obtem a lista de Seções
-df_secoes = get_secoes(pgEngine)
-lista_todas_secoes = df_secoes.to_dict(orient="records")
-lista_todas_secoes.insert(0, {"LABEL": "TODAS"})
-
-# Colaboradores / Mecânicos
-df_mecanicos = get_mecanicos(pgEngine)
-
-# Obtem a lista de OS
-df_lista_pecas = get_pecas(pgEngine)
-lista_todas_pecas = df_lista_pecas.to_dict(orient="records")
-lista_todas_pecas.insert(0, {"LABEL": "TODAS"})
-
-# Obtem a lista de OS
-df_lista_os = get_lista_os(pgEngine)
-lista_todas_os = df_lista_os.to_dict(orient="records")
-lista_todas_os.insert(0, {"LABEL": "TODAS"})
-
-
 
 ##############################################################################
 # CALLBACKS ##################################################################
@@ -178,7 +150,7 @@ def corrige_input_pecas(datas, lista_modelos, lista_oficina, lista_secao, lista_
             - options (list[dict]): Lista de opções para o dropdown no formato {"label": ..., "value": ...}.
             - value (list): Lista de valores corrigida para manter a seleção válida com base nos filtros.
     """
-    df_lista_os_secao = df_lista_os
+    df_lista_os_secao = catalogo_entidades.get_lista_os()
 
     if "TODAS" not in lista_secao:
         df_lista_os_secao = os_service.get_os(datas, lista_modelos, lista_oficina, lista_secao)
@@ -288,229 +260,241 @@ def gera_labels_inputs(campo):
 ##############################################################################
 # Layout #####################################################################
 ##############################################################################
-layout = dbc.Container(
-    [
-        # Loading
-        # dmc.LoadingOverlay(
-        #     visible=True,
-        #     id="loading-overlay-guia-geral",
-        #     loaderProps={"size": "xl"},
-        #     overlayProps={
-        #         "radius": "lg",
-        #         "blur": 2,
-        #         "style": {
-        #             "top": 0,  # Start from the top of the viewport
-        #             "left": 0,  # Start from the left of the viewport
-        #             "width": "100vw",  # Cover the entire width of the viewport
-        #             "height": "100vh",  # Cover the entire height of the viewport
-        #         },
-        #     },
-        #     zIndex=10,
-        # ),
-        # Cabeçalho
-        dbc.Row(
-            [
-                dbc.Col(
-                    [
-                        # Cabeçalho e Inputs
-                        dbc.Row(
-                            [
-                                html.Hr(),
-                                dbc.Row(
-                                    [
-                                        dbc.Col(DashIconify(icon="mdi:tools", width=45), width="auto"),
-                                        dbc.Col(
-                                            html.H1(
-                                                [
-                                                    "Visão das\u00a0",
-                                                    html.Strong("peças por OS"),
-                                                ],
-                                                className="align-self-center",
-                                            ),
-                                            width=True,
-                                        ),
-                                    ],
-                                    align="center",
-                                ),
-                                dmc.Space(h=15),
-                                html.Hr(),
-                                dbc.Col(
-                                    dbc.Card(
+def layout(**kwargs):
+    # Listas dos filtros lidas do catálogo a cada carregamento da página (ver CatalogoEntidades)
+    # As listas são independentes: lidas ao mesmo tempo quando não estão no cache
+    df_modelos, df_oficinas, df_lista_os = executa_em_paralelo(
+        catalogo_entidades.get_modelos, catalogo_entidades.get_oficinas, catalogo_entidades.get_lista_os
+    )
+    lista_todos_modelos_veiculos = lista_com_todos(df_modelos, "MODELO", "TODOS")
+    lista_todas_oficinas = lista_com_todos(df_oficinas)
+    lista_todas_os = lista_com_todos(df_lista_os)
+
+    return dbc.Container(
+        [
+            # Loading
+            # dmc.LoadingOverlay(
+            #     visible=True,
+            #     id="loading-overlay-guia-geral",
+            #     loaderProps={"size": "xl"},
+            #     overlayProps={
+            #         "radius": "lg",
+            #         "blur": 2,
+            #         "style": {
+            #             "top": 0,  # Start from the top of the viewport
+            #             "left": 0,  # Start from the left of the viewport
+            #             "width": "100vw",  # Cover the entire width of the viewport
+            #             "height": "100vh",  # Cover the entire height of the viewport
+            #         },
+            #     },
+            #     zIndex=10,
+            # ),
+            # Cabeçalho
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            # Cabeçalho e Inputs
+                            dbc.Row(
+                                [
+                                    html.Hr(),
+                                    dbc.Row(
                                         [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("Data (intervalo) de análise"),
-                                                    dmc.DatePicker(
-                                                        id="input-intervalo-datas-pecas-os",
-                                                        allowSingleDateInRange=True,
-                                                        type="range",
-                                                        minDate=date(2024, 8, 1),
-                                                        maxDate=date.today(),
-                                                        value=[date(2024, 8, 1), date.today()],
-                                                    ),
-                                                ],
-                                                className="dash-bootstrap",
+                                            dbc.Col(DashIconify(icon="mdi:tools", width=45), width="auto"),
+                                            dbc.Col(
+                                                html.H1(
+                                                    [
+                                                        "Visão das\u00a0",
+                                                        html.Strong("peças por OS"),
+                                                    ],
+                                                    className="align-self-center",
+                                                ),
+                                                width=True,
                                             ),
                                         ],
-                                        body=True,
+                                        align="center",
                                     ),
-                                    md=6,
-                                ),
-                                dbc.Col(
-                                    dbc.Card(
-                                        [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("Modelos de Veículos"),
-                                                    dcc.Dropdown(
-                                                        id="input-select-modelo-veiculos-pecas-os",
-                                                        options=[
-                                                            {
-                                                                "label": os["MODELO"],
-                                                                "value": os["MODELO"],
-                                                            }
-                                                            for os in lista_todos_modelos_veiculos
-                                                        ],
-                                                        multi=True,
-                                                        value=["TODOS"],
-                                                        placeholder="Selecione um ou mais modelos...",
-                                                    ),
-                                                ],
-                                                className="dash-bootstrap",
-                                            ),
-                                        ],
-                                        body=True,
+                                    dmc.Space(h=15),
+                                    html.Hr(),
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Data (intervalo) de análise"),
+                                                        dmc.DatePicker(
+                                                            id="input-intervalo-datas-pecas-os",
+                                                            allowSingleDateInRange=True,
+                                                            type="range",
+                                                            minDate=date(2024, 8, 1),
+                                                            maxDate=date.today(),
+                                                            value=[date(2024, 8, 1), date.today()],
+                                                        ),
+                                                    ],
+                                                    className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=6,
                                     ),
-                                    md=6,
-                                ),
-                                dmc.Space(h=10),
-                                dbc.Col(
-                                    dbc.Card(
-                                        [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("Oficinas"),
-                                                    dcc.Dropdown(
-                                                        id="input-select-oficina-pecas-os",
-                                                        options=[{"label": os["LABEL"], "value": os["LABEL"]} for os in lista_todas_oficinas],
-                                                        multi=True,
-                                                        value=["TODAS"],
-                                                        placeholder="Selecione uma ou mais oficinas...",
-                                                    ),
-                                                ],
-                                                className="dash-bootstrap",
-                                            ),
-                                        ],
-                                        body=True,
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Modelos de Veículos"),
+                                                        dcc.Dropdown(
+                                                            id="input-select-modelo-veiculos-pecas-os",
+                                                            options=[
+                                                                {
+                                                                    "label": os["MODELO"],
+                                                                    "value": os["MODELO"],
+                                                                }
+                                                                for os in lista_todos_modelos_veiculos
+                                                            ],
+                                                            multi=True,
+                                                            value=["TODOS"],
+                                                            placeholder="Selecione um ou mais modelos...",
+                                                        ),
+                                                    ],
+                                                    className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=6,
                                     ),
-                                    md=6,
-                                ),
-                                dbc.Col(
-                                    dbc.Card(
-                                        [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("Seções (categorias) de manutenção"),
-                                                    dcc.Dropdown(
-                                                        id="input-select-secao-pecas-os",
-                                                        options=[
-                                                            # {"label": "TODAS", "value": "TODAS"},
-                                                            # {
-                                                            #     "label": "BORRACHARIA",
-                                                            #     "value": "MANUTENCAO BORRACHARIA",
-                                                            # },
-                                                            {
-                                                                "label": "ELETRICA",
-                                                                "value": "MANUTENCAO ELETRICA",
-                                                            },
-                                                            # {"label": "GARAGEM", "value": "MANUTENÇÃO GARAGEM"},
-                                                            # {
-                                                            #     "label": "LANTERNAGEM",
-                                                            #     "value": "MANUTENCAO LANTERNAGEM",
-                                                            # },
-                                                            # {"label": "LUBRIFICAÇÃO", "value": "LUBRIFICAÇÃO"},
-                                                            {
-                                                                "label": "MECANICA",
-                                                                "value": "MANUTENCAO MECANICA",
-                                                            },
-                                                            # {"label": "PINTURA", "value": "MANUTENCAO PINTURA"},
-                                                            # {
-                                                            #     "label": "SERVIÇOS DE TERCEIROS",
-                                                            #     "value": "SERVIÇOS DE TERCEIROS",
-                                                            # },
-                                                            # {
-                                                            #     "label": "SETOR DE ALINHAMENTO",
-                                                            #     "value": "SETOR DE ALINHAMENTO",
-                                                            # },
-                                                            # {
-                                                            #     "label": "SETOR DE POLIMENTO",
-                                                            #     "value": "SETOR DE POLIMENTO",
-                                                            # },
-                                                        ],
-                                                        multi=True,
-                                                        value=["MANUTENCAO ELETRICA", "MANUTENCAO MECANICA"],
-                                                        placeholder="Selecione uma ou mais seções...",
-                                                    ),
-                                                ],
-                                                # className="dash-bootstrap",
-                                            ),
-                                        ],
-                                        body=True,
+                                    dmc.Space(h=10),
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Oficinas"),
+                                                        dcc.Dropdown(
+                                                            id="input-select-oficina-pecas-os",
+                                                            options=[{"label": os["LABEL"], "value": os["LABEL"]} for os in lista_todas_oficinas],
+                                                            multi=True,
+                                                            value=["TODAS"],
+                                                            placeholder="Selecione uma ou mais oficinas...",
+                                                        ),
+                                                    ],
+                                                    className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=6,
+                                    ),
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Seções (categorias) de manutenção"),
+                                                        dcc.Dropdown(
+                                                            id="input-select-secao-pecas-os",
+                                                            options=[
+                                                                # {"label": "TODAS", "value": "TODAS"},
+                                                                # {
+                                                                #     "label": "BORRACHARIA",
+                                                                #     "value": "MANUTENCAO BORRACHARIA",
+                                                                # },
+                                                                {
+                                                                    "label": "ELETRICA",
+                                                                    "value": "MANUTENCAO ELETRICA",
+                                                                },
+                                                                # {"label": "GARAGEM", "value": "MANUTENÇÃO GARAGEM"},
+                                                                # {
+                                                                #     "label": "LANTERNAGEM",
+                                                                #     "value": "MANUTENCAO LANTERNAGEM",
+                                                                # },
+                                                                # {"label": "LUBRIFICAÇÃO", "value": "LUBRIFICAÇÃO"},
+                                                                {
+                                                                    "label": "MECANICA",
+                                                                    "value": "MANUTENCAO MECANICA",
+                                                                },
+                                                                # {"label": "PINTURA", "value": "MANUTENCAO PINTURA"},
+                                                                # {
+                                                                #     "label": "SERVIÇOS DE TERCEIROS",
+                                                                #     "value": "SERVIÇOS DE TERCEIROS",
+                                                                # },
+                                                                # {
+                                                                #     "label": "SETOR DE ALINHAMENTO",
+                                                                #     "value": "SETOR DE ALINHAMENTO",
+                                                                # },
+                                                                # {
+                                                                #     "label": "SETOR DE POLIMENTO",
+                                                                #     "value": "SETOR DE POLIMENTO",
+                                                                # },
+                                                            ],
+                                                            multi=True,
+                                                            value=["MANUTENCAO ELETRICA", "MANUTENCAO MECANICA"],
+                                                            placeholder="Selecione uma ou mais seções...",
+                                                        ),
+                                                    ],
+                                                    # className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=6,
+                                    ),
+                                    dmc.Space(h=10),
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("OS específica"),
+                                                        dcc.Dropdown(
+                                                            id="input-select-pecas-os",
+                                                            options=[{"label": os["LABEL"], "value": os["LABEL"]} for os in lista_todas_os],
+                                                            multi=True,
+                                                            value=["TODAS"],
+                                                            placeholder="Selecione uma ou mais OS específicas...",
+                                                        ),
+                                                    ],
+                                                    className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=12,
                                     ),
-                                    md=6,
-                                ),
-                                dmc.Space(h=10),
-                                dbc.Col(
-                                    dbc.Card(
+                                    dmc.Space(h=30),
+                                    dbc.Row(
                                         [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("OS específica"),
-                                                    dcc.Dropdown(
-                                                        id="input-select-pecas-os",
-                                                        options=[{"label": os["LABEL"], "value": os["LABEL"]} for os in lista_todas_os],
-                                                        multi=True,
-                                                        value=["TODAS"],
-                                                        placeholder="Selecione uma ou mais OS específicas...",
-                                                    ),
-                                                ],
-                                                className="dash-bootstrap",
+                                            dbc.Col(DashIconify(icon="mdi:chart-line", width=45), width="auto"),
+                                            dbc.Col(
+                                                dbc.Row(
+                                                    [
+                                                        html.H4(
+                                                            "Gráfico de pecas mais trocadas por OS",
+                                                            className="align-self-center",
+                                                        ),
+                                                        dmc.Space(h=5),
+                                                        gera_labels_inputs("pecas-mais-trocadas"),
+                                                    ]
+                                                ),
+                                                width=True,
                                             ),
                                         ],
-                                        body=True,
+                                        align="center",
                                     ),
-                                    md=12,
-                                ),
-                                dmc.Space(h=30),
-                                dbc.Row(
-                                    [
-                                        dbc.Col(DashIconify(icon="mdi:chart-line", width=45), width="auto"),
-                                        dbc.Col(
-                                            dbc.Row(
-                                                [
-                                                    html.H4(
-                                                        "Gráfico de pecas mais trocadas por OS",
-                                                        className="align-self-center",
-                                                    ),
-                                                    dmc.Space(h=5),
-                                                    gera_labels_inputs("pecas-mais-trocadas"),
-                                                ]
-                                            ),
-                                            width=True,
-                                        ),
-                                    ],
-                                    align="center",
-                                ),
-                                dcc.Graph(id="graph-pecas-mais-trocadas"),
+                                    dcc.Graph(id="graph-pecas-mais-trocadas"),
                                 
-                            ]
-                        ),
-                    ],
-                ),
-            ]
-        ),
-    ]
-)
+                                ]
+                            ),
+                        ],
+                    ),
+                ]
+            ),
+        ]
+    )
+
+
 ##############################################################################
 # Registro da página #########################################################
 ##############################################################################
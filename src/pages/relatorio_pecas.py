@@ -30,6 +30,10 @@ from db import PostgresSingleton
 from modules.entities_utils import *
 # Imports específicos
 from modules.relatoriopecas.relatorio_pecas_service import RelatorioPecasService
+from modules.cache_utils import guarda_dados_pagina, le_dados_pagina
+from modules.grid_utils import OPCOES_GRID_SERVIDOR, registra_grid_servidor
+from modules.exportacao import registra_exportacao, escreve_xlsx
+from modules.tarefas import registra_tarefa, enfileira_tarefa, get_tarefa, ROTA_TAREFAS, CONCLUIDA, ERRO
 import modules.relatoriopecas.tabelas as relatorio_pecas
 
 ##############################################################################
@@ -42,11 +46,6 @@ pgEngine = pgDB.get_engine()
 # Cria o serviço
 relatorio_pecas_util = RelatorioPecasService(pgEngine)
 
-# Modelos de veículos
-df_modelos_veiculos = get_modelos(pgEngine)
-lista_todos_modelos_veiculos = df_modelos_veiculos.to_dict(orient="records")
-lista_todos_modelos_veiculos.insert(0, {"MODELO": "TODOS"})
-
 
 ##############################################################################
 # CALLBACKS ##################################################################
@@ -62,21 +61,36 @@ def cb_input_datas_home_dinamico(_):
     hoje = date.today()
     return hoje, [date(2024, 8, 1), hoje]
 
+def le_df_relatorio_pecas(dados):
+    # Lê o DataFrame da tabela guardado para os filtros; recalcula se a entrada saiu do cache
+    if not dados:
+        return pd.DataFrame()
+
+    df = le_dados_pagina(dados["chave"])
+    if df is None:
+        df = relatorio_pecas_util.get_pecas(**dados["filtros"])
+
+    return df
+
+
 @callback(
-    [Output("tabela-relatorio-pecas-gerais", "rowData"),
+    [Output("store-dados-relatorio-pecas", "data"),
      Output("boxplot-vida-util-total-pecas", "figure")],
     [
         Input("input-intervalo-datas-pecas-os", "value"),
         Input("input-select-modelo-veiculos-relatorio-pecas", "value"),
         Input("input-select-peca-relatorio", "value")
     ],
+    background=True,  # Roda em segundo plano (ver background_callback_manager em app.py)
 )
 def tabela_relatio_peças(datas, lista_modelos, peça):
     if not datas or not lista_modelos or not peça:
-        return [], go.Figure()
-
-    df = relatorio_pecas_util.get_pecas(datas, lista_modelos, peça)
+        return None, go.Figure()
 
+    filtros = {"datas": datas, "lista_modelos": lista_modelos, "peça": peça}
+    df = relatorio_pecas_util.get_pecas(**filtros)
+    if df.empty:
+        return None, go.Figure()
 
     fig = px.box(df, x="nome_peça", y="total_km_peca")
 
@@ -87,7 +101,12 @@ def tabela_relatio_peças(datas, lista_modelos, peça):
         template="plotly_white"
     )
 
-    return df.to_dict('records'), fig
+    # A tabela não recebe as linhas: guarda o DataFrame no servidor e o grid pede os blocos visíveis
+    chave = guarda_dados_pagina("relatorio_pecas", df, **filtros)
+    return {"chave": chave, "filtros": filtros}, fig
+
+
+registra_grid_servidor("tabela-relatorio-pecas-gerais", "store-dados-relatorio-pecas", le_df_relatorio_pecas)
 
 @callback(
     [Output("grafico-barras-qtd-peças-mes", "figure"),
@@ -98,6 +117,7 @@ def tabela_relatio_peças(datas, lista_modelos, peça):
         Input("input-select-peca-relatorio", "value"),
 
     ],
+    background=True,
 )
 def grafico_barras_qtd_valor_peças_mes(datas, lista_modelos, peça):
     #if not datas or not lista_modelos or not peça:
@@ -323,338 +343,429 @@ def gera_labels_inputs(campo):
 ### Callbacks para os dowload ################################################
 ##############################################################################
 
+# Colunas da planilha exportada
+COLUNAS_EXPORTACAO_RELATORIO = {
+    "id_veiculo": "ID DO VEÍCULO",
+    "nome_pecas": "NOME DA PEÇA",
+    "modelo_veiculo": "MODELO",
+    "situacao_peca": "STATUS DA PEÇA",
+    "media_km_entre_trocas": "MÉDIA DURAÇÃO KM",
+    "data_primeira_troca": "DATA TROCA",
+    "odometro_troca": "HODÔMETRO DA TROCA",
+    "hodometro_atual_gps": "HODÔMETRO ATUAL",
+    "estimativa_odometro_proxima_troca": "HODÔMETRO DA PRÓXIMA TROCA",
+    "diferenca_entre_hodometro_estimativa_e_atual": "DIFERENÇA ESTIMATIVA E ATUAL",
+    "total_km_peca": "KM TOTAL(RODADO) DA PEÇA",
+    "ultrapassou_estimativa": "ULTRAPASSOU KM ESPERADO",
+    "media_km_diario_veiculo": "MEDIA DE KM DIÁRIO DO VEÍCULO",
+    "calculo_dias": "DIAS ATÉ A TROCA",
+    "data_estimada": "DATA ESTIMADA PARA TROCA"
+}
+
+# Exporta o DataFrame da tabela já guardado para os filtros (o botão é o único gatilho)
+registra_exportacao(
+    "btn-exportar-tabela-relatorio-pecas",
+    "download-excel-tabela-relatorio-pecas",
+    [State("store-dados-relatorio-pecas", "data")],
+    le_df_relatorio_pecas,
+    "tabela_relatorio_pecas",
+    colunas=COLUNAS_EXPORTACAO_RELATORIO,
+)
+
+##############################################################################
+### Relatório em segundo plano ###############################################
+##############################################################################
+
+# Relatório completo (ex: todas as peças e modelos) gerado fora do worker web, ver modules/tarefas.py
+@registra_tarefa("relatorio_pecas")
+def tarefa_relatorio_pecas(filtros, progresso):
+    progresso(0.1, "Calculando a previsão de troca das peças")
+    df = relatorio_pecas_util.get_pecas(**filtros)
+    if df.empty:
+        return None
+
+    progresso(0.6, f"Gerando a planilha ({len(df)} linhas)")
+    return escreve_xlsx(df.rename(columns=COLUNAS_EXPORTACAO_RELATORIO))
+
+
 @callback(
-    Output("download-excel-tabela-relatorio-pecas", "data"),
-    Input("btn-exportar-tabela-relatorio-pecas", "n_clicks"),
+    [
+        Output("store-tarefa-relatorio-pecas", "data"),
+        Output("intervalo-tarefa-relatorio-pecas", "disabled", allow_duplicate=True),
+    ],
+    Input("btn-tarefa-relatorio-pecas", "n_clicks"),
     State("input-intervalo-datas-pecas-os", "value"),
     State("input-select-modelo-veiculos-relatorio-pecas", "value"),
-    Input("input-select-peca-relatorio", "value"),
-    prevent_initial_call=True
+    State("input-select-peca-relatorio", "value"),
+    prevent_initial_call=True,
 )
-def download_excel_tabela_vida_util_pecas(n_clicks, datas, lista_modelos, peça):
-    if not n_clicks or n_clicks <= 0:
-        return dash.no_update
-    df = relatorio_pecas_util.get_pecas(datas, lista_modelos, peça)
+def enfileira_relatorio_pecas(n_clicks, datas, lista_modelos, peça):
+    if not n_clicks or not datas or not lista_modelos or not peça:
+        return dash.no_update, dash.no_update
 
-    if df.empty:
-        return go.Figure(), go.Figure()
-    
-    date_now = date.today().strftime('%d-%m-%Y')
+    id_tarefa = enfileira_tarefa("relatorio_pecas", {"datas": datas, "lista_modelos": lista_modelos, "peça": peça})
+    return id_tarefa, False
+
+
+@callback(
+    [
+        Output("progresso-tarefa-relatorio-pecas", "value"),
+        Output("texto-tarefa-relatorio-pecas", "children"),
+        Output("link-tarefa-relatorio-pecas", "href"),
+        Output("link-tarefa-relatorio-pecas", "style"),
+        Output("intervalo-tarefa-relatorio-pecas", "disabled"),
+    ],
+    Input("intervalo-tarefa-relatorio-pecas", "n_intervals"),
+    State("store-tarefa-relatorio-pecas", "data"),
+    prevent_initial_call=True,
+)
+def acompanha_relatorio_pecas(_, id_tarefa):
+    tarefa = get_tarefa(id_tarefa)
+    if tarefa is None:
+        return 0, "", None, {"display": "none"}, True
 
-    df.rename(columns={ 
-        "id_veiculo": "ID DO VEÍCULO",
-        "nome_pecas": "NOME DA PEÇA",
-        "modelo_veiculo": "MODELO",
-        "situacao_peca": "STATUS DA PEÇA",
-        "media_km_entre_trocas": "MÉDIA DURAÇÃO KM",
-        "data_primeira_troca": "DATA TROCA",
-        "odometro_troca": "HODÔMETRO DA TROCA",
-        "hodometro_atual_gps": "HODÔMETRO ATUAL",
-        "estimativa_odometro_proxima_troca": "HODÔMETRO DA PRÓXIMA TROCA",
-        "diferenca_entre_hodometro_estimativa_e_atual": "DIFERENÇA ESTIMATIVA E ATUAL",
-        "total_km_peca": "KM TOTAL(RODADO) DA PEÇA",
-        "ultrapassou_estimativa": "ULTRAPASSOU KM ESPERADO",
-        "media_km_diario_veiculo": "MEDIA DE KM DIÁRIO DO VEÍCULO",
-        "calculo_dias": "DIAS ATÉ A TROCA",
-        "data_estimada": "DATA ESTIMADA PARA TROCA"
-    }, inplace=True)
+    if tarefa["estado"] == CONCLUIDA:
+        return 100, "Relatório pronto.", f"{ROTA_TAREFAS}/{id_tarefa}/arquivo", {"display": "inline"}, True
 
-    excel_data = gerar_excel(df=df)
+    if tarefa["estado"] == ERRO:
+        return 0, tarefa["mensagem"], None, {"display": "none"}, True
 
-    return dcc.send_bytes(excel_data, f"tabela_relatorio_pecas_{date_now}.xlsx")
+    mensagem = tarefa["mensagem"] or "Relatório na fila..."
+    return round(tarefa["progresso"] * 100), mensagem, None, {"display": "none"}, False
 
 
 
 ##############################################################################
 # Layout #####################################################################
 ##############################################################################
-layout = dbc.Container(
-    [
-        # Loading
-        # dmc.LoadingOverlay(
-        #     visible=True,
-        #     id="loading-overlay-guia-geral",
-        #     loaderProps={"size": "xl"},
-        #     overlayProps={
-        #         "radius": "lg",
-        #         "blur": 2,
-        #         "style": {
-        #             "top": 0,  # Start from the top of the viewport
-        #             "left": 0,  # Start from the left of the viewport
-        #             "width": "100vw",  # Cover the entire width of the viewport
-        #             "height": "100vh",  # Cover the entire height of the viewport
-        #         },
-        #     },
-        #     zIndex=10,
-        # ),
-        # Cabeçalho
-        dbc.Row(
-            [
-                dbc.Col(
-                    [
-                        # Cabeçalho e Inputs
-                        dbc.Row(
-                            [
-                                html.Hr(),
-                                dbc.Row(
-                                    [
-                                        dbc.Col(DashIconify(icon="mdi:tools", width=45), width="auto"),
-                                        dbc.Col(
-                                            html.H1(
-                                                [
-                                                    html.Strong("Relatório das peças"),
-                                                ],
-                                                className="align-self-center",
+def layout(**kwargs):
+    # Listas dos filtros lidas do catálogo a cada carregamento da página (ver CatalogoEntidades)
+    lista_todos_modelos_veiculos = lista_com_todos(catalogo_entidades.get_modelos(), "MODELO", "TODOS")
+
+    return dbc.Container(
+        [
+            # Chave dos dados da tabela para os filtros atuais (os dados ficam no servidor)
+            dcc.Store(id="store-dados-relatorio-pecas"),
+            # Loading
+            # dmc.LoadingOverlay(
+            #     visible=True,
+            #     id="loading-overlay-guia-geral",
+            #     loaderProps={"size": "xl"},
+            #     overlayProps={
+            #         "radius": "lg",
+            #         "blur": 2,
+            #         "style": {
+            #             "top": 0,  # Start from the top of the viewport
+            #             "left": 0,  # Start from the left of the viewport
+            #             "width": "100vw",  # Cover the entire width of the viewport
+            #             "height": "100vh",  # Cover the entire height of the viewport
+            #         },
+            #     },
+            #     zIndex=10,
+            # ),
+            # Cabeçalho
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            # Cabeçalho e Inputs
+                            dbc.Row(
+                                [
+                                    html.Hr(),
+                                    dbc.Row(
+                                        [
+                                            dbc.Col(DashIconify(icon="mdi:tools", width=45), width="auto"),
+                                            dbc.Col(
+                                                html.H1(
+                                                    [
+                                                        html.Strong("Relatório das peças"),
+                                                    ],
+                                                    className="align-self-center",
+                                                ),
+                                                width=True,
                                             ),
-                                            width=True,
+                                        ],
+                                        align="center",
+                                    ),
+                                    dmc.Space(h=15),
+                                    html.Hr(),
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Data (intervalo) de análise"),
+                                                        dmc.DatePicker(
+                                                            id="input-intervalo-datas-pecas-os",
+                                                            allowSingleDateInRange=True,
+                                                            type="range",
+                                                            minDate=date(2024, 1, 1),
+                                                            maxDate=date.today(),
+                                                            value=[date(2024, 1, 1), date.today()],
+                                                        ),
+                                                    ],
+                                                    className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
                                         ),
-                                    ],
-                                    align="center",
-                                ),
-                                dmc.Space(h=15),
-                                html.Hr(),
-                                dbc.Col(
-                                    dbc.Card(
+                                        md=6,
+                                    ),
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Modelos de Veículos"),
+                                                        dcc.Dropdown(
+                                                            id="input-select-modelo-veiculos-relatorio-pecas",
+                                                            options=[
+                                                                {
+                                                                    "label": os["MODELO"],
+                                                                    "value": os["MODELO"],
+                                                                }
+                                                                for os in lista_todos_modelos_veiculos
+                                                            ],
+                                                            multi=True,
+                                                            value=["TODOS"],
+                                                            placeholder="Selecione um ou mais modelos...",
+                                                        ),
+                                                    ],
+                                                    className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=6,
+                                    ),
+                                    dmc.Space(h=10),
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Peça específica"),
+                                                        dcc.Dropdown(
+                                                            id="input-select-peca-relatorio",
+                                                            options=[],  # começa vazio, o callback vai preencher
+                                                            multi=True,
+                                                            value=[],    # começa vazio, o callback define o valor inicial
+                                                            placeholder="Selecione uma ou mais peças específicas...",
+                                                        ),
+                                                    ],
+                                                    className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=12,
+                                    ),
+                                    dmc.Space(h=40),
+                                    dbc.Row(
                                         [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("Data (intervalo) de análise"),
-                                                    dmc.DatePicker(
-                                                        id="input-intervalo-datas-pecas-os",
-                                                        allowSingleDateInRange=True,
-                                                        type="range",
-                                                        minDate=date(2024, 1, 1),
-                                                        maxDate=date.today(),
-                                                        value=[date(2024, 1, 1), date.today()],
-                                                    ),
-                                                ],
-                                                className="dash-bootstrap",
+                                            dbc.Col(DashIconify(icon="mdi:chart-line", width=45), width="auto"),
+                                            dbc.Col(
+                                                dbc.Row(
+                                                    [
+                                                        html.H4(
+                                                            "Trocas futuras esperadas por mês",
+                                                            className="align-self-center",
+                                                        ),
+                                                        dmc.Space(h=5),
+                                                        gera_labels_inputs("pecas-esperadas-mes"),
+                                                    ]
+                                                ),
+                                                width=True,
                                             ),
                                         ],
-                                        body=True,
+                                        align="center",
                                     ),
-                                    md=6,
-                                ),
-                                dbc.Col(
-                                    dbc.Card(
+                                    dcc.Graph(id="grafico-barras-qtd-peças-mes"),
+                                    dmc.Space(h=40),
+                                    dbc.Row(
                                         [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("Modelos de Veículos"),
-                                                    dcc.Dropdown(
-                                                        id="input-select-modelo-veiculos-relatorio-pecas",
-                                                        options=[
-                                                            {
-                                                                "label": os["MODELO"],
-                                                                "value": os["MODELO"],
-                                                            }
-                                                            for os in lista_todos_modelos_veiculos
-                                                        ],
-                                                        multi=True,
-                                                        value=["TODOS"],
-                                                        placeholder="Selecione um ou mais modelos...",
-                                                    ),
-                                                ],
-                                                className="dash-bootstrap",
+                                            dbc.Col(DashIconify(icon="mdi:chart-line", width=45), width="auto"),
+                                            dbc.Col(
+                                                dbc.Row(
+                                                    [
+                                                        html.H4(
+                                                            "Custo esperado por mês",
+                                                            className="align-self-center",
+                                                        ),
+                                                        dmc.Space(h=5),
+                                                        gera_labels_inputs("preco-pecas-por-mes"),
+                                                    ]
+                                                ),
+                                                width=True,
                                             ),
                                         ],
-                                        body=True,
+                                        align="center",
                                     ),
-                                    md=6,
-                                ),
-                                dmc.Space(h=10),
-                                dbc.Col(
-                                    dbc.Card(
+                                    dcc.Graph(id="grafico-barras-valor-peças-mes"),
+                                    dmc.Space(h=40),
+                                    dbc.Row(
                                         [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("Peça específica"),
-                                                    dcc.Dropdown(
-                                                        id="input-select-peca-relatorio",
-                                                        options=[],  # começa vazio, o callback vai preencher
-                                                        multi=True,
-                                                        value=[],    # começa vazio, o callback define o valor inicial
-                                                        placeholder="Selecione uma ou mais peças específicas...",
-                                                    ),
-                                                ],
-                                                className="dash-bootstrap",
+                                            dbc.Col(DashIconify(icon="mdi:chart-line", width=45), width="auto"),
+                                            dbc.Col(
+                                                dbc.Row(
+                                                    [
+                                                        html.H4(
+                                                            "Boxplot vida útil total das peças",
+                                                            className="align-self-center",
+                                                        ),
+                                                        dmc.Space(h=5),
+                                                        gera_labels_inputs("vida-util--total-das-pecas"),
+                                                    ]
+                                                ),
+                                                width=True,
                                             ),
                                         ],
-                                        body=True,
+                                        align="center",
                                     ),
-                                    md=12,
-                                ),
-                                dmc.Space(h=40),
-                                dbc.Row(
-                                    [
-                                        dbc.Col(DashIconify(icon="mdi:chart-line", width=45), width="auto"),
-                                        dbc.Col(
-                                            dbc.Row(
-                                                [
-                                                    html.H4(
-                                                        "Trocas futuras esperadas por mês",
-                                                        className="align-self-center",
-                                                    ),
-                                                    dmc.Space(h=5),
-                                                    gera_labels_inputs("pecas-esperadas-mes"),
-                                                ]
-                                            ),
-                                            width=True,
-                                        ),
-                                    ],
-                                    align="center",
-                                ),
-                                dcc.Graph(id="grafico-barras-qtd-peças-mes"),
-                                dmc.Space(h=40),
-                                dbc.Row(
-                                    [
-                                        dbc.Col(DashIconify(icon="mdi:chart-line", width=45), width="auto"),
-                                        dbc.Col(
-                                            dbc.Row(
-                                                [
-                                                    html.H4(
-                                                        "Custo esperado por mês",
-                                                        className="align-self-center",
-                                                    ),
-                                                    dmc.Space(h=5),
-                                                    gera_labels_inputs("preco-pecas-por-mes"),
-                                                ]
-                                            ),
-                                            width=True,
-                                        ),
-                                    ],
-                                    align="center",
-                                ),
-                                dcc.Graph(id="grafico-barras-valor-peças-mes"),
-                                dmc.Space(h=40),
-                                dbc.Row(
-                                    [
-                                        dbc.Col(DashIconify(icon="mdi:chart-line", width=45), width="auto"),
-                                        dbc.Col(
-                                            dbc.Row(
-                                                [
-                                                    html.H4(
-                                                        "Boxplot vida útil total das peças",
-                                                        className="align-self-center",
-                                                    ),
-                                                    dmc.Space(h=5),
-                                                    gera_labels_inputs("vida-util--total-das-pecas"),
-                                                ]
-                                            ),
-                                            width=True,
-                                        ),
-                                    ],
-                                    align="center",
-                                ),
-                                dcc.Graph(id="boxplot-vida-util-total-pecas"),
-                                dmc.Space(h=40),
-                                # Tabela com as estatísticas gerais de Retrabalho
-                                dbc.Row(
-                                    [
-                                        dbc.Col(DashIconify(icon="mdi:gear", width=45), width="auto"),
-                                        dbc.Col(
-                                            dbc.Row(
-                                                [
-                                                    html.H4(
-                                                        "Tabela relatório de peças",
-                                                        className="align-self-center",
-                                                    ),
-                                                    dmc.Space(h=5),
-                                                    dbc.Row(
-                                                        [
-                                                            dbc.Col(gera_labels_inputs("tabela-relatorio-pecas"), width=True),
-                                                            dbc.Col(
-                                                                html.Div(
-                                                                    [
-                                                                        html.Button(
-                                                                            "Exportar para Excel",
-                                                                            id="btn-exportar-tabela-relatorio-pecas",
-                                                                            n_clicks=0,
-                                                                            style={
-                                                                                "background-color": "#007bff",  # Azul
-                                                                                "color": "white",
-                                                                                "border": "none",
-                                                                                "padding": "10px 20px",
-                                                                                "border-radius": "8px",
-                                                                                "cursor": "pointer",
-                                                                                "font-size": "16px",
-                                                                                "font-weight": "bold",
-                                                                            },
-                                                                        ),
-                                                                        dcc.Download(id="download-excel-tabela-relatorio-pecas"),
-                                                                    ],
-                                                                    style={"text-align": "right"},
+                                    dcc.Graph(id="boxplot-vida-util-total-pecas"),
+                                    dmc.Space(h=40),
+                                    # Tabela com as estatísticas gerais de Retrabalho
+                                    dbc.Row(
+                                        [
+                                            dbc.Col(DashIconify(icon="mdi:gear", width=45), width="auto"),
+                                            dbc.Col(
+                                                dbc.Row(
+                                                    [
+                                                        html.H4(
+                                                            "Tabela relatório de peças",
+                                                            className="align-self-center",
+                                                        ),
+                                                        dmc.Space(h=5),
+                                                        dbc.Row(
+                                                            [
+                                                                dbc.Col(gera_labels_inputs("tabela-relatorio-pecas"), width=True),
+                                                                dbc.Col(
+                                                                    html.Div(
+                                                                        [
+                                                                            html.Button(
+                                                                                "Exportar para Excel",
+                                                                                id="btn-exportar-tabela-relatorio-pecas",
+                                                                                n_clicks=0,
+                                                                                style={
+                                                                                    "background-color": "#007bff",  # Azul
+                                                                                    "color": "white",
+                                                                                    "border": "none",
+                                                                                    "padding": "10px 20px",
+                                                                                    "border-radius": "8px",
+                                                                                    "cursor": "pointer",
+                                                                                    "font-size": "16px",
+                                                                                    "font-weight": "bold",
+                                                                                },
+                                                                            ),
+                                                                            dcc.Download(id="download-excel-tabela-relatorio-pecas"),
+                                                                            html.Button(
+                                                                                "Gerar relatório completo",
+                                                                                id="btn-tarefa-relatorio-pecas",
+                                                                                n_clicks=0,
+                                                                                title="Gera a planilha em segundo plano; acompanhe o progresso abaixo",
+                                                                                style={
+                                                                                    "background-color": "#6c757d",  # Cinza
+                                                                                    "color": "white",
+                                                                                    "border": "none",
+                                                                                    "padding": "10px 20px",
+                                                                                    "border-radius": "8px",
+                                                                                    "cursor": "pointer",
+                                                                                    "font-size": "16px",
+                                                                                    "font-weight": "bold",
+                                                                                    "margin-left": "10px",
+                                                                                },
+                                                                            ),
+                                                                        ],
+                                                                        style={"text-align": "right"},
+                                                                    ),
+                                                                    width="auto",
                                                                 ),
-                                                                width="auto",
-                                                            ),
-                                                        ],
-                                                        align="center",
-                                                        justify="between",  # Deixa os itens espaçados
-                                                    ),
-                                                ]
+                                                            ],
+                                                            align="center",
+                                                            justify="between",  # Deixa os itens espaçados
+                                                        ),
+                                                        # Progresso do relatório em segundo plano
+                                                        dcc.Store(id="store-tarefa-relatorio-pecas"),
+                                                        dcc.Interval(id="intervalo-tarefa-relatorio-pecas", interval=2000, disabled=True),
+                                                        dmc.Group(
+                                                            [
+                                                                dmc.Progress(id="progresso-tarefa-relatorio-pecas", value=0, size="lg", w=300),
+                                                                dmc.Text(id="texto-tarefa-relatorio-pecas", size="sm"),
+                                                                html.A(
+                                                                    "Baixar relatório",
+                                                                    id="link-tarefa-relatorio-pecas",
+                                                                    style={"display": "none"},
+                                                                ),
+                                                            ],
+                                                            justify="flex-end",
+                                                        ),
+                                                    ]
+                                                ),
+                                                width=True,
                                             ),
-                                            width=True,
+                                        ],
+                                        align="center",
+                                    ),
+                                    dmc.Space(h=20),
+                                        dag.AgGrid(
+                                            columnDefs=relatorio_pecas.tbl_relatorio_pecas,
+                                            id="tabela-relatorio-pecas-gerais",
+                                            rowModelType="infinite",
+                                            defaultColDef={"filter": True, "floatingFilter": True},
+                                            columnSize="autoSize",
+                                            dashGridOptions={
+                                                "localeText": locale_utils.AG_GRID_LOCALE_BR,
+                                                **OPCOES_GRID_SERVIDOR,
+                                                },
+                                            # Permite resize --> https://community.plotly.com/t/anyone-have-better-ag-grid-resizing-scheme/78398/5
+                                            style={"height": 400, "resize": "vertical", "overflow": "hidden"},
+                                            dangerously_allow_code=True,
                                         ),
-                                    ],
-                                    align="center",
-                                ),
-                                dmc.Space(h=20),
-                                    dag.AgGrid(
-                                        columnDefs=relatorio_pecas.tbl_relatorio_pecas,
-                                        id="tabela-relatorio-pecas-gerais",
-                                        rowData=[],
-                                        defaultColDef={"filter": True, "floatingFilter": True},
-                                        columnSize="autoSize",
-                                        dashGridOptions={
-                                            "localeText": locale_utils.AG_GRID_LOCALE_BR,
-                                            },
-                                        # Permite resize --> https://community.plotly.com/t/anyone-have-better-ag-grid-resizing-scheme/78398/5
-                                        style={"height": 400, "resize": "vertical", "overflow": "hidden"},
-                                        dangerously_allow_code=True,
+                                    dmc.Space(h=20),
+                                    html.H6("Legenda: Classificação (Vida útil consumida)", style={"marginBottom": "5px"}),
+                                    html.Div(
+                                        [
+                                            html.Div([
+                                                html.Span("●", style={"color": "#2ecc71", "fontSize": "24px", "marginRight": "12px"}),
+                                                html.Span("A — Dentro da estimativa - Menor que 65%", style={"fontSize": "18px"})
+                                            ], style={"marginRight": "40px"}),
+
+                                            html.Div([
+                                                html.Span("●", style={"color": "#f1c40f", "fontSize": "24px", "marginRight": "12px"}),
+                                                html.Span("B — Maior que 65%", style={"fontSize": "18px"})
+                                            ], style={"marginRight": "40px"}),
+
+                                            html.Div([
+                                                html.Span("●", style={"color": "#e67e22", "fontSize": "24px", "marginRight": "12px"}),
+                                                html.Span("C — Maior que 90%", style={"fontSize": "18px"})
+                                            ], style={"marginRight": "40px"}),
+
+                                            html.Div([
+                                                html.Span("●", style={"color": "#e74c3c", "fontSize": "24px", "marginRight": "12px"}),
+                                                html.Span("D — Ultrapassou o limite", style={"fontSize": "18px"})
+                                            ])
+                                        ],
+                                        style={
+                                            "display": "flex",
+                                            "flexWrap": "wrap",
+                                            "justifyContent": "center",
+                                            "alignItems": "center",
+                                            "marginTop": "5px",
+                                            "gap": "20px"
+                                        }
                                     ),
-                                dmc.Space(h=20),
-                                html.H6("Legenda: Classificação (Vida útil consumida)", style={"marginBottom": "5px"}),
-                                html.Div(
-                                    [
-                                        html.Div([
-                                            html.Span("●", style={"color": "#2ecc71", "fontSize": "24px", "marginRight": "12px"}),
-                                            html.Span("A — Dentro da estimativa - Menor que 65%", style={"fontSize": "18px"})
-                                        ], style={"marginRight": "40px"}),
-
-                                        html.Div([
-                                            html.Span("●", style={"color": "#f1c40f", "fontSize": "24px", "marginRight": "12px"}),
-                                            html.Span("B — Maior que 65%", style={"fontSize": "18px"})
-                                        ], style={"marginRight": "40px"}),
-
-                                        html.Div([
-                                            html.Span("●", style={"color": "#e67e22", "fontSize": "24px", "marginRight": "12px"}),
-                                            html.Span("C — Maior que 90%", style={"fontSize": "18px"})
-                                        ], style={"marginRight": "40px"}),
-
-                                        html.Div([
-                                            html.Span("●", style={"color": "#e74c3c", "fontSize": "24px", "marginRight": "12px"}),
-                                            html.Span("D — Ultrapassou o limite", style={"fontSize": "18px"})
-                                        ])
-                                    ],
-                                    style={
-                                        "display": "flex",
-                                        "flexWrap": "wrap",
-                                        "justifyContent": "center",
-                                        "alignItems": "center",
-                                        "marginTop": "5px",
-                                        "gap": "20px"
-                                    }
-                                ),
-                                dmc.Space(h=50),
-                            ]
-                        ),
-                    ],
-                    md=12,
-                ),
-            ]
-        ),
-    ]
-)
+                                    dmc.Space(h=50),
+                                ]
+                            ),
+                        ],
+                        md=12,
+                    ),
+                ]
+            ),
+        ]
+    )
+
+
 ##############################################################################
 # Registro da página #########################################################
 ##############################################################################
@@ -36,6 +36,9 @@ from modules.entities_utils import *
 # Imports específicos
 from modules.os.graficos import *
 from modules.vidautil.vida_util_service import VidaUtilService
+from modules.cache_utils import guarda_dados_pagina, le_dados_pagina
+from modules.grid_utils import OPCOES_GRID_SERVIDOR, registra_grid_servidor
+from modules.exportacao import registra_exportacao
 import modules.vidautil.tabelas as vida_util
 
 ##############################################################################
@@ -48,11 +51,6 @@ pgEngine = pgDB.get_engine()
 # Cria o serviço
 vida_util_service = VidaUtilService(pgEngine)
 
-# Modelos de veículos
-df_modelos_veiculos = get_modelos_pecas_odometro(pgEngine)
-lista_todos_modelos_veiculos = df_modelos_veiculos.to_dict(orient="records")
-lista_todos_modelos_veiculos.insert(0, {"MODELO": "TODOS"})
-
 
 ##############################################################################
 # CALLBACKS ##################################################################
@@ -215,66 +213,62 @@ def corrige_input_pecas(datas, lista_modelos, lista_pecas):
 ##############################################################################
 
 
-@callback(
-    Output("boxplot-vida-util-pecas", "figure"),
-    Output("tabela-vida-util-pecas", "rowData"),
-    [
-        Input("input-intervalo-datas-pecas-os", "value"),
-        Input("input-select-modelo-veiculos-pecas-vida-util", "value"),
-        Input("input-select-peca-vida-util", "value"),
-    ],
-)
-def grafico_e_df_boxplot_pecas(datas, lista_modelos, lista_pecas):
-    if not datas or not lista_modelos or not lista_pecas:
-        return go.Figure(), []
+# Os gráficos, a tabela e a exportação usam o mesmo DataFrame de trocas. Ele é calculado uma única vez
+# por combinação de filtros em materializa_dados_vida_util e guardado no cache do servidor; o navegador
+# recebe apenas a chave (store-dados-vida-util-pecas) e os demais callbacks leem os dados por ela.
+# O cálculo roda em segundo plano: se os filtros mudam antes de terminar, o processo anterior é
+# encerrado e apenas a última combinação chega ao banco.
+
 
+def le_df_vida_util(dados):
+    # Lê o DataFrame materializado para os filtros; recalcula se a entrada saiu do cache
+    if not dados:
+        return pd.DataFrame()
+
+    df = le_dados_pagina(dados["chave"])
+    if df is None:
+        df = calcula_df_vida_util(**dados["filtros"])
+
+    return df
+
+
+def calcula_df_vida_util(datas, lista_modelos, lista_pecas):
     df = vida_util_service.get_pecas(datas, lista_modelos, lista_pecas)
 
     if df is None or df.empty or "km_efetivo_da_peca" not in df.columns:
-        return go.Figure(), []
+        return pd.DataFrame()
 
     # Remove outliers
     #df = remover_outliers_iqr(df, "km_efetivo_da_peca")
     df["km_efetivo_da_peca"] = df["km_efetivo_da_peca"].round(1)
 
-    if "TODAS" in lista_pecas:
-        fig = px.box(df, y="km_efetivo_da_peca", title="Boxplot Geral da Duração (km)")
-    else:
-        fig = px.box(df, x="nome_pecas", y="km_efetivo_da_peca")
-
-    fig.update_layout(
-        xaxis_title="Peça" if "TODAS" not in lista_pecas else "",
-        yaxis_title="Duração (km)",
-        boxmode="group",
-        template="plotly_white"
-    )
-
-    return fig, df.to_dict('records')
+    return df
 
 
 @callback(
-    Output("boxplot-vida-util-pecas-5000km", "figure"),
-    #Output("tabela-vida-util-pecas", "rowData"),
+    Output("store-dados-vida-util-pecas", "data"),
     [
         Input("input-intervalo-datas-pecas-os", "value"),
         Input("input-select-modelo-veiculos-pecas-vida-util", "value"),
         Input("input-select-peca-vida-util", "value"),
     ],
+    background=True,  # Roda em segundo plano (ver background_callback_manager em app.py)
 )
-def grafico_e_df_boxplot_pecas_5000km(datas, lista_modelos, lista_pecas):
+def materializa_dados_vida_util(datas, lista_modelos, lista_pecas):
     if not datas or not lista_modelos or not lista_pecas:
-        return go.Figure()#, []
+        return None
 
-    df = vida_util_service.get_pecas(datas, lista_modelos, lista_pecas)
+    filtros = {"datas": datas, "lista_modelos": lista_modelos, "lista_pecas": lista_pecas}
+    df = calcula_df_vida_util(**filtros)
 
-    if df is None or df.empty or "km_efetivo_da_peca" not in df.columns:
-        return go.Figure()#, []
+    if df.empty:
+        return None
+
+    chave = guarda_dados_pagina("vida_util_pecas", df, **filtros)
+    return {"chave": chave, "filtros": filtros}
 
-    # Remove outliers
-    #df = remover_outliers_iqr(df, "km_efetivo_da_peca")
-    df["km_efetivo_da_peca"] = df["km_efetivo_da_peca"].round(1)
-    df = df[df["km_efetivo_da_peca"] > 5000]
 
+def gera_boxplot_vida_util(df, lista_pecas):
     if "TODAS" in lista_pecas:
         fig = px.box(df, y="km_efetivo_da_peca", title="Boxplot Geral da Duração (km)")
     else:
@@ -287,7 +281,39 @@ def grafico_e_df_boxplot_pecas_5000km(datas, lista_modelos, lista_pecas):
         template="plotly_white"
     )
 
-    return fig#, df.to_dict('records')
+    return fig
+
+
+@callback(
+    Output("boxplot-vida-util-pecas", "figure"),
+    Input("store-dados-vida-util-pecas", "data"),
+)
+def grafico_e_df_boxplot_pecas(dados):
+    df = le_df_vida_util(dados)
+
+    if df.empty:
+        return go.Figure()
+
+    return gera_boxplot_vida_util(df, dados["filtros"]["lista_pecas"])
+
+
+# Tabela: o grid pede ao servidor apenas o bloco visível (paginado, ordenado e filtrado no servidor)
+registra_grid_servidor("tabela-vida-util-pecas", "store-dados-vida-util-pecas", le_df_vida_util)
+
+
+@callback(
+    Output("boxplot-vida-util-pecas-5000km", "figure"),
+    Input("store-dados-vida-util-pecas", "data"),
+)
+def grafico_e_df_boxplot_pecas_5000km(dados):
+    df = le_df_vida_util(dados)
+
+    if df.empty:
+        return go.Figure()
+
+    df = df[df["km_efetivo_da_peca"] > 5000]
+
+    return gera_boxplot_vida_util(df, dados["filtros"]["lista_pecas"])
 
 # boxplot-vida-util-pecas-5000km
 ##############################################################################
@@ -353,25 +379,14 @@ def gera_labels_inputs(campo):
 ### Callbacks para os dowload #################################################
 ##############################################################################
 
-@callback(
-    Output("download-excel-tabela-vida-util-pecas", "data"),
-    Input("btn-exportar-tabela-vida-util-pecas", "n_clicks"),
-    State("input-intervalo-datas-pecas-os", "value"),
-    State("input-select-modelo-veiculos-pecas-vida-util", "value"),
-    State("input-select-peca-vida-util", "value"),
-    prevent_initial_call=True
-)
-def download_excel_tabela_vida_util_pecas(n_clicks, datas, lista_modelos, lista_pecas):
-    if not n_clicks or n_clicks <= 0:
-        return dash.no_update
-
-    date_now = date.today().strftime('%d-%m-%Y')
-
-    df = vida_util_service.get_pecas(datas, lista_modelos, lista_pecas)
-    #df = remover_outliers_iqr(df, "km_efetivo_da_peca")
-    df["km_efetivo_da_peca"] = df["km_efetivo_da_peca"].round(1)
-
-    df.rename(columns={
+# Exporta o DataFrame já materializado para os filtros (o botão é o único gatilho)
+registra_exportacao(
+    "btn-exportar-tabela-vida-util-pecas",
+    "download-excel-tabela-vida-util-pecas",
+    [State("store-dados-vida-util-pecas", "data")],
+    le_df_vida_util,
+    "tabela_vida_util_pecas",
+    colunas={
         "nome_pecas": "NOME DA PEÇA",
         "id_veiculo": "VEICULO",
         "numero_troca": "N° TROCA",
@@ -384,251 +399,258 @@ def download_excel_tabela_vida_util_pecas(n_clicks, datas, lista_modelos, lista_
         "km_efetivo_da_peca": "DURAÇÃO KM EFETIVO",
         "quantidade_troca_1": "QTD TROCA 1",
         "quantidade_troca_2": "QTD TROCA 2"
-    }, inplace=True)
-    
-    excel_data = gerar_excel(df=df)
-    return dcc.send_bytes(excel_data, f"tabela_vida_util_pecas_{date_now}.xlsx")
+    },
+)
 
 
 
 ##############################################################################
 # Layout #####################################################################
 ##############################################################################
-layout = dbc.Container(
-    [
-        # Loading
-        # dmc.LoadingOverlay(
-        #     visible=True,
-        #     id="loading-overlay-guia-geral",
-        #     loaderProps={"size": "xl"},
-        #     overlayProps={
-        #         "radius": "lg",
-        #         "blur": 2,
-        #         "style": {
-        #             "top": 0,  # Start from the top of the viewport
-        #             "left": 0,  # Start from the left of the viewport
-        #             "width": "100vw",  # Cover the entire width of the viewport
-        #             "height": "100vh",  # Cover the entire height of the viewport
-        #         },
-        #     },
-        #     zIndex=10,
-        # ),
-        # Cabeçalho
-        dbc.Row(
-            [
-                dbc.Col(
-                    [
-                        # Cabeçalho e Inputs
-                        dbc.Row(
-                            [
-                                html.Hr(),
-                                dbc.Row(
-                                    [
-                                        dbc.Col(DashIconify(icon="mdi:tools", width=45), width="auto"),
-                                        dbc.Col(
-                                            html.H1(
-                                                [
-                                                    "Visão da\u00a0",
-                                                    html.Strong("vida útil das peças"),
-                                                ],
-                                                className="align-self-center",
-                                            ),
-                                            width=True,
-                                        ),
-                                    ],
-                                    align="center",
-                                ),
-                                dmc.Space(h=15),
-                                html.Hr(),
-                                dbc.Col(
-                                    dbc.Card(
+def layout(**kwargs):
+    # Listas dos filtros lidas do catálogo a cada carregamento da página (ver CatalogoEntidades)
+    lista_todos_modelos_veiculos = lista_com_todos(catalogo_entidades.get_modelos_pecas_odometro(), "MODELO", "TODOS")
+
+    return dbc.Container(
+        [
+            # Chave dos dados materializados para os filtros atuais (os dados ficam no servidor)
+            dcc.Store(id="store-dados-vida-util-pecas"),
+            # Loading
+            # dmc.LoadingOverlay(
+            #     visible=True,
+            #     id="loading-overlay-guia-geral",
+            #     loaderProps={"size": "xl"},
+            #     overlayProps={
+            #         "radius": "lg",
+            #         "blur": 2,
+            #         "style": {
+            #             "top": 0,  # Start from the top of the viewport
+            #             "left": 0,  # Start from the left of the viewport
+            #             "width": "100vw",  # Cover the entire width of the viewport
+            #             "height": "100vh",  # Cover the entire height of the viewport
+            #         },
+            #     },
+            #     zIndex=10,
+            # ),
+            # Cabeçalho
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            # Cabeçalho e Inputs
+                            dbc.Row(
+                                [
+                                    html.Hr(),
+                                    dbc.Row(
                                         [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("Data (intervalo) de análise"),
-                                                    dmc.DatePicker(
-                                                        id="input-intervalo-datas-pecas-os",
-                                                        allowSingleDateInRange=True,
-                                                        type="range",
-                                                        minDate=date(2024, 1, 1),
-                                                        maxDate=date.today(),
-                                                        value=[date(2025, 1, 1), date.today()],
-                                                    ),
-                                                ],
-                                                className="dash-bootstrap",
+                                            dbc.Col(DashIconify(icon="mdi:tools", width=45), width="auto"),
+                                            dbc.Col(
+                                                html.H1(
+                                                    [
+                                                        "Visão da\u00a0",
+                                                        html.Strong("vida útil das peças"),
+                                                    ],
+                                                    className="align-self-center",
+                                                ),
+                                                width=True,
                                             ),
                                         ],
-                                        body=True,
+                                        align="center",
+                                    ),
+                                    dmc.Space(h=15),
+                                    html.Hr(),
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Data (intervalo) de análise"),
+                                                        dmc.DatePicker(
+                                                            id="input-intervalo-datas-pecas-os",
+                                                            allowSingleDateInRange=True,
+                                                            type="range",
+                                                            minDate=date(2024, 1, 1),
+                                                            maxDate=date.today(),
+                                                            value=[date(2025, 1, 1), date.today()],
+                                                        ),
+                                                    ],
+                                                    className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=6,
                                     ),
-                                    md=6,
-                                ),
-                                dbc.Col(
-                                    dbc.Card(
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Modelos de Veículos"),
+                                                        dcc.Dropdown(
+                                                            id="input-select-modelo-veiculos-pecas-vida-util",
+                                                            options=[
+                                                                {
+                                                                    "label": os["MODELO"],
+                                                                    "value": os["MODELO"],
+                                                                }
+                                                                for os in lista_todos_modelos_veiculos
+                                                            ],
+                                                            multi=True,
+                                                            value=["TODOS"],
+                                                            placeholder="Selecione um ou mais modelos...",
+                                                        ),
+                                                    ],
+                                                    className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=6,
+                                    ),
+                                    dmc.Space(h=10),
+                                    dbc.Col(
+                                        dbc.Card(
+                                            [
+                                                html.Div(
+                                                    [
+                                                        dbc.Label("Peça específica"),
+                                                        dcc.Dropdown(
+                                                            id="input-select-peca-vida-util",
+                                                            options=[],  # começa vazio, o callback vai preencher
+                                                            multi=True,
+                                                            value=[],    # começa vazio, o callback define o valor inicial
+                                                            placeholder="Selecione uma ou mais peças específicas...",
+                                                        ),
+                                                    ],
+                                                    className="dash-bootstrap",
+                                                ),
+                                            ],
+                                            body=True,
+                                        ),
+                                        md=12,
+                                    ),
+                                    dmc.Space(h=30),
+                                    dbc.Row(
                                         [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("Modelos de Veículos"),
-                                                    dcc.Dropdown(
-                                                        id="input-select-modelo-veiculos-pecas-vida-util",
-                                                        options=[
-                                                            {
-                                                                "label": os["MODELO"],
-                                                                "value": os["MODELO"],
-                                                            }
-                                                            for os in lista_todos_modelos_veiculos
-                                                        ],
-                                                        multi=True,
-                                                        value=["TODOS"],
-                                                        placeholder="Selecione um ou mais modelos...",
-                                                    ),
-                                                ],
-                                                className="dash-bootstrap",
+                                            dbc.Col(DashIconify(icon="mdi:chart-line", width=45), width="auto"),
+                                            dbc.Col(
+                                                dbc.Row(
+                                                    [
+                                                        html.H4(
+                                                            "Boxplot vida útil das peças",
+                                                            className="align-self-center",
+                                                        ),
+                                                        dmc.Space(h=5),
+                                                        gera_labels_inputs("vida-util-das-pecas"),
+                                                    ]
+                                                ),
+                                                width=True,
                                             ),
                                         ],
-                                        body=True,
+                                        align="center",
                                     ),
-                                    md=6,
-                                ),
-                                dmc.Space(h=10),
-                                dbc.Col(
-                                    dbc.Card(
+                                    dcc.Graph(id="boxplot-vida-util-pecas"),
+                                    dmc.Space(h=40),
+                                    dbc.Row(
                                         [
-                                            html.Div(
-                                                [
-                                                    dbc.Label("Peça específica"),
-                                                    dcc.Dropdown(
-                                                        id="input-select-peca-vida-util",
-                                                        options=[],  # começa vazio, o callback vai preencher
-                                                        multi=True,
-                                                        value=[],    # começa vazio, o callback define o valor inicial
-                                                        placeholder="Selecione uma ou mais peças específicas...",
-                                                    ),
-                                                ],
-                                                className="dash-bootstrap",
+                                            dbc.Col(DashIconify(icon="mdi:chart-line", width=45), width="auto"),
+                                            dbc.Col(
+                                                dbc.Row(
+                                                    [
+                                                        html.H4(
+                                                            "Boxplot vida útil das peças acima de 5000 km",
+                                                            className="align-self-center",
+                                                        ),
+                                                        dmc.Space(h=5),
+                                                        gera_labels_inputs("vida-util-das-pecas-5000km"),
+                                                    ]
+                                                ),
+                                                width=True,
                                             ),
                                         ],
-                                        body=True,
+                                        align="center",
                                     ),
-                                    md=12,
-                                ),
-                                dmc.Space(h=30),
-                                dbc.Row(
-                                    [
-                                        dbc.Col(DashIconify(icon="mdi:chart-line", width=45), width="auto"),
-                                        dbc.Col(
-                                            dbc.Row(
-                                                [
-                                                    html.H4(
-                                                        "Boxplot vida útil das peças",
-                                                        className="align-self-center",
-                                                    ),
-                                                    dmc.Space(h=5),
-                                                    gera_labels_inputs("vida-util-das-pecas"),
-                                                ]
-                                            ),
-                                            width=True,
-                                        ),
-                                    ],
-                                    align="center",
-                                ),
-                                dcc.Graph(id="boxplot-vida-util-pecas"),
-                                dmc.Space(h=40),
-                                dbc.Row(
-                                    [
-                                        dbc.Col(DashIconify(icon="mdi:chart-line", width=45), width="auto"),
-                                        dbc.Col(
-                                            dbc.Row(
-                                                [
-                                                    html.H4(
-                                                        "Boxplot vida útil das peças acima de 5000 km",
-                                                        className="align-self-center",
-                                                    ),
-                                                    dmc.Space(h=5),
-                                                    gera_labels_inputs("vida-util-das-pecas-5000km"),
-                                                ]
-                                            ),
-                                            width=True,
-                                        ),
-                                    ],
-                                    align="center",
-                                ),
-                                dcc.Graph(id="boxplot-vida-util-pecas-5000km"),
-                                dmc.Space(h=40),
-                                # Tabela com as estatísticas gerais de Retrabalho
-                                dbc.Row(
-                                    [
-                                        dbc.Col(DashIconify(icon="mdi:gear", width=45), width="auto"),
-                                        dbc.Col(
-                                            dbc.Row(
-                                                [
-                                                    html.H4(
-                                                        "Tabela de vida útil das peças",
-                                                        className="align-self-center",
-                                                    ),
-                                                    dmc.Space(h=5),
-                                                    dbc.Row(
-                                                        [
-                                                            dbc.Col(gera_labels_inputs("tabela-vida-util-pecas"), width=True),
-                                                            dbc.Col(
-                                                                html.Div(
-                                                                    [
-                                                                        html.Button(
-                                                                            "Exportar para Excel",
-                                                                            id="btn-exportar-tabela-vida-util-pecas",
-                                                                            n_clicks=0,
-                                                                            style={
-                                                                                "background-color": "#007bff",  # Azul
-                                                                                "color": "white",
-                                                                                "border": "none",
-                                                                                "padding": "10px 20px",
-                                                                                "border-radius": "8px",
-                                                                                "cursor": "pointer",
-                                                                                "font-size": "16px",
-                                                                                "font-weight": "bold",
-                                                                            },
-                                                                        ),
-                                                                        dcc.Download(id="download-excel-tabela-vida-util-pecas"),
-                                                                    ],
-                                                                    style={"text-align": "right"},
+                                    dcc.Graph(id="boxplot-vida-util-pecas-5000km"),
+                                    dmc.Space(h=40),
+                                    # Tabela com as estatísticas gerais de Retrabalho
+                                    dbc.Row(
+                                        [
+                                            dbc.Col(DashIconify(icon="mdi:gear", width=45), width="auto"),
+                                            dbc.Col(
+                                                dbc.Row(
+                                                    [
+                                                        html.H4(
+                                                            "Tabela de vida útil das peças",
+                                                            className="align-self-center",
+                                                        ),
+                                                        dmc.Space(h=5),
+                                                        dbc.Row(
+                                                            [
+                                                                dbc.Col(gera_labels_inputs("tabela-vida-util-pecas"), width=True),
+                                                                dbc.Col(
+                                                                    html.Div(
+                                                                        [
+                                                                            html.Button(
+                                                                                "Exportar para Excel",
+                                                                                id="btn-exportar-tabela-vida-util-pecas",
+                                                                                n_clicks=0,
+                                                                                style={
+                                                                                    "background-color": "#007bff",  # Azul
+                                                                                    "color": "white",
+                                                                                    "border": "none",
+                                                                                    "padding": "10px 20px",
+                                                                                    "border-radius": "8px",
+                                                                                    "cursor": "pointer",
+                                                                                    "font-size": "16px",
+                                                                                    "font-weight": "bold",
+                                                                                },
+                                                                            ),
+                                                                            dcc.Download(id="download-excel-tabela-vida-util-pecas"),
+                                                                        ],
+                                                                        style={"text-align": "right"},
+                                                                    ),
+                                                                    width="auto",
                                                                 ),
-                                                                width="auto",
-                                                            ),
-                                                        ],
-                                                        align="center",
-                                                        justify="between",  # Deixa os itens espaçados
-                                                    ),
-                                                ]
+                                                            ],
+                                                            align="center",
+                                                            justify="between",  # Deixa os itens espaçados
+                                                        ),
+                                                    ]
+                                                ),
+                                                width=True,
                                             ),
-                                            width=True,
-                                        ),
-                                    ],
-                                    align="center",
-                                ),
-                                dmc.Space(h=20),
-                                    dag.AgGrid(
-                                    # enableEnterpriseModules=True,
-                                        id="tabela-vida-util-pecas",
-                                        columnDefs=vida_util.tbl_vida_util_pecas,
-                                        rowData=[],
-                                        defaultColDef={"filter": True, "floatingFilter": True},
-                                        columnSize="autoSize",
-                                        dashGridOptions={
-                                            "localeText": locale_utils.AG_GRID_LOCALE_BR,
-                                            },
-                                        # Permite resize --> https://community.plotly.com/t/anyone-have-better-ag-grid-resizing-scheme/78398/5
-                                        style={"height": 400, "resize": "vertical", "overflow": "hidden"},
-                                        dangerously_allow_code=True, 
+                                        ],
+                                        align="center",
                                     ),
-                                dmc.Space(h=40),
-                            ]
-                        ),
-                    ],
-                    md=12,
-                ),
-            ]
-        ),
-    ]
-)
+                                    dmc.Space(h=20),
+                                        dag.AgGrid(
+                                        # enableEnterpriseModules=True,
+                                            id="tabela-vida-util-pecas",
+                                            columnDefs=vida_util.tbl_vida_util_pecas,
+                                            rowModelType="infinite",
+                                            defaultColDef={"filter": True, "floatingFilter": True},
+                                            columnSize="autoSize",
+                                            dashGridOptions={
+                                                "localeText": locale_utils.AG_GRID_LOCALE_BR,
+                                                **OPCOES_GRID_SERVIDOR,
+                                                },
+                                            # Permite resize --> https://community.plotly.com/t/anyone-have-better-ag-grid-resizing-scheme/78398/5
+                                            style={"height": 400, "resize": "vertical", "overflow": "hidden"},
+                                            dangerously_allow_code=True, 
+                                        ),
+                                    dmc.Space(h=40),
+                                ]
+                            ),
+                        ],
+                        md=12,
+                    ),
+                ]
+            ),
+        ]
+    )
+
+
 ##############################################################################
 # Registro da página #########################################################
 ##############################################################################
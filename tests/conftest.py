@@ -0,0 +1,8 @@
+# Os módulos do painel são importados a partir de src/ (ex: modules.relatoriopecas.previsao),
+# como quando o app é executado de dentro desse diretório
+import os
+import sys
+
+DIRETORIO_SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if DIRETORIO_SRC not in sys.path:
+    sys.path.insert(0, DIRETORIO_SRC)
@@ -0,0 +1,105 @@
+# Locks single-flight dos backends de cache (modules.cache_utils)
+#
+# BackendMemoria: threads pedindo a mesma chave executam uma de cada vez, e o lock da chave é
+# descartado apenas quando ninguém mais o usa. BackendDisco: a espera pelo lock de outro processo
+# aumenta o intervalo entre as tentativas até CACHE_LOCK_ESPERA_MAX.
+
+import time
+import threading
+
+import pytest
+
+from modules import cache_utils
+from modules.cache_utils import BackendMemoria
+
+
+def executa_concorrente(backend, chave, threads=16, repeticoes=20):
+    # Maior quantidade de threads simultâneas dentro do lock da chave
+    dentro = []
+    maximo = [0]
+    contador = threading.Lock()
+    inicio = threading.Barrier(threads)
+
+    def trabalho():
+        inicio.wait()
+        for _ in range(repeticoes):
+            with backend.lock(chave):
+                with contador:
+                    dentro.append(1)
+                    maximo[0] = max(maximo[0], len(dentro))
+                time.sleep(0.0005)
+                with contador:
+                    dentro.pop()
+
+    execucoes = [threading.Thread(target=trabalho) for _ in range(threads)]
+    for execucao in execucoes:
+        execucao.start()
+    for execucao in execucoes:
+        execucao.join()
+
+    return maximo[0]
+
+
+def test_memoria_lock_exclusivo_por_chave():
+    backend = BackendMemoria()
+
+    assert executa_concorrente(backend, "chave") == 1
+    # Sem ninguém aguardando, o lock da chave é descartado
+    assert backend._locks_chaves == {}
+
+
+def test_memoria_lock_mantido_enquanto_ha_espera():
+    backend = BackendMemoria()
+    segurando = threading.Event()
+    libera = threading.Event()
+    ordem = []
+
+    def dono():
+        with backend.lock("chave"):
+            segurando.set()
+            libera.wait()
+            ordem.append("dono")
+
+    def aguardando():
+        segurando.wait()
+        with backend.lock("chave"):
+            ordem.append("aguardando")
+
+    execucoes = [threading.Thread(target=dono), threading.Thread(target=aguardando)]
+    for execucao in execucoes:
+        execucao.start()
+
+    segurando.wait()
+    time.sleep(0.05)
+    libera.set()
+    for execucao in execucoes:
+        execucao.join()
+
+    assert ordem == ["dono", "aguardando"]
+    assert backend._locks_chaves == {}
+
+
+def test_disco_espera_com_intervalo_crescente(tmp_path, monkeypatch):
+    pytest.importorskip("diskcache")
+    pytest.importorskip("psutil")
+
+    backend = cache_utils.BackendDisco(str(tmp_path))
+    # Lock de outra requisição deste mesmo processo (dono existe: precisa esperar)
+    backend.cache.add("lock:chave", cache_utils.os.getpid())
+
+    esperas = []
+
+    def sleep(segundos):
+        esperas.append(segundos)
+        if len(esperas) == 8:
+            backend.cache.delete("lock:chave")
+
+    monkeypatch.setattr(cache_utils.time, "sleep", sleep)
+
+    with backend.lock("chave"):
+        assert backend.cache.get("lock:chave") == cache_utils.os.getpid()
+
+    assert len(esperas) == 8
+    assert esperas == sorted(esperas) and esperas[0] < esperas[-1]
+    assert max(esperas) == cache_utils.CACHE_LOCK_ESPERA_MAX
+    assert backend.cache.get("lock:chave") is None
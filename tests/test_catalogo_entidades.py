@@ -0,0 +1,63 @@
+# Listas do catálogo das entidades (modules.entities_utils.CatalogoEntidades) guardadas no processo
+#
+# Após o preaquece (master do gunicorn), as listas são lidas do dicionário do processo, sem passar
+# pelo cache compartilhado nem pelo banco, até a versão da tabela de origem mudar.
+
+import pandas as pd
+import pytest
+
+from modules import cache_utils, entities_utils
+from modules.entities_utils import CatalogoEntidades
+
+
+@pytest.fixture
+def catalogo(monkeypatch):
+    versoes = {"pecas_gerais": 1, "mat_view_retrabalho_10_dias": 1, "mat_view_os_pecas_hodometro_v3": 1}
+    monkeypatch.setattr(
+        entities_utils.versao_dados, "get_versoes", lambda dependencias: {d: versoes.get(d) for d in dependencias}
+    )
+    monkeypatch.setattr(cache_utils, "cache_servicos", cache_utils.BackendMemoria())
+
+    leituras = []
+
+    def le(self, leitura, nome):
+        leituras.append(nome)
+        return pd.DataFrame({"LABEL": [f"{nome} 1", f"{nome} 2"]})
+
+    monkeypatch.setattr(CatalogoEntidades, "_le", le)
+
+    catalogo = CatalogoEntidades()
+    catalogo.leituras = leituras
+    catalogo.versoes = versoes
+    return catalogo
+
+
+def test_preaquece_guarda_as_listas_no_processo(catalogo, monkeypatch):
+    catalogo.preaquece()
+    assert len(catalogo._listas) == 6
+    lidas = len(catalogo.leituras)
+
+    # Nem o cache compartilhado nem o banco são consultados
+    monkeypatch.setattr(cache_utils, "cache_servicos", None)
+    df = catalogo.get_modelos()
+
+    assert df["LABEL"].tolist() == ["modelos 1", "modelos 2"]
+    assert len(catalogo.leituras) == lidas
+
+
+def test_lista_relida_quando_a_versao_muda(catalogo):
+    catalogo.get_modelos()
+    catalogo.get_modelos()
+    assert catalogo.leituras == ["modelos"]
+
+    catalogo.versoes["pecas_gerais"] = 2
+    catalogo.get_modelos()
+    catalogo.get_modelos()
+    assert catalogo.leituras == ["modelos", "modelos"]
+
+
+def test_lista_guardada_nao_e_alterada_por_quem_chama(catalogo):
+    df = catalogo.get_oficinas()
+    df.loc[0, "LABEL"] = "ALTERADA"
+
+    assert catalogo.get_oficinas()["LABEL"].tolist() == ["oficinas 1", "oficinas 2"]
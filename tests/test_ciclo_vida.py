@@ -0,0 +1,237 @@
+# Pareamento das trocas na tabela pecas_trocas_ciclo_vida num banco Postgres descartável
+#
+# Cria um schema temporário com poucas trocas de um veículo (a mat_view_os_pecas_hodometro_v3 é uma
+# tabela comum, para receber novas trocas), aplica sql/001, 002, 003, 005 e 007 e verifica:
+#   - quantidade_troca_2 pareada pelo nome da peça (como nas consultas antigas), também na atualização incremental;
+#   - numero_troca da vida útil contado apenas entre as trocas com a troca seguinte;
+#   - marca d'água da atualização incremental apenas com a data (sql/003);
+#   - remoção, na atualização incremental, dos pares que deixaram de existir na mat view.
+#
+# Requer TESTE_DATABASE_URL (ver tests/test_explain_indices.py); sem ela os testes são ignorados.
+
+import os
+import re
+import uuid
+import inspect
+
+import pytest
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+from sqlalchemy import text
+
+URL_BANCO = os.getenv("TESTE_DATABASE_URL")
+DIRETORIO_SQL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql")
+
+pytestmark = pytest.mark.skipif(not URL_BANCO, reason="TESTE_DATABASE_URL não configurada")
+
+# Veículo 00001: códigos A e B com o mesmo nome; A2 tem o mesmo hodômetro de A1 (A1 fica sem par)
+SEED = """
+    CREATE TABLE mat_view_os_pecas_hodometro_v3 (
+        id_veiculo TEXT,
+        codigo_peca TEXT,
+        nome_pecas TEXT,
+        grupo_peca TEXT,
+        sub_grupo_peca TEXT,
+        status_veiculo TEXT,
+        numero_os TEXT,
+        valor_peca NUMERIC,
+        quantidade_peca NUMERIC,
+        data_peca TEXT,
+        data_ultimo_hodometro TEXT,
+        ultimo_hodometro NUMERIC
+    );
+
+    INSERT INTO mat_view_os_pecas_hodometro_v3
+    SELECT '00001', codigo, 'FILTRO DE AR', 'MOTOR', 'FILTROS', 'ATIVO', os, 100, quantidade, data, data, hodometro
+    FROM (VALUES
+        ('A', '1', 1, '2024-01-01', 1000),
+        ('B', '5', 10, '2024-01-15', 2000),
+        ('A', '2', 2, '2024-02-01', 1000),
+        ('A', '3', 3, '2024-03-01', 5000),
+        ('A', '4', 4, '2024-04-01', 9000)
+    ) AS v (codigo, os, quantidade, data, hodometro);
+
+    CREATE TABLE dim_veiculos AS
+    SELECT '00001' AS codigo_veiculo, 1 AS "AssetId", '00001 - ONIBUS' AS "Description", 'M1' AS "Model";
+
+    CREATE TABLE mat_view_odometro_diario AS
+    SELECT 1 AS "AssetId", '2024-06-01' AS year_month_day, 20000 AS maior_km_dia;
+"""
+
+MIGRACOES = [
+    "002_pecas_trocas_ciclo_vida.sql",
+    "003_pecas_trocas_ciclo_vida_incremental.sql",
+    "005_pecas_trocas_ciclo_vida_datas.sql",
+    "007_pecas_trocas_ciclo_vida_quantidade.sql",
+]
+
+
+def comandos_sql(arquivo: str) -> list:
+    # Comandos do arquivo, um a um (CREATE INDEX CONCURRENTLY não roda junto com outros comandos)
+    with open(os.path.join(DIRETORIO_SQL, arquivo), encoding="utf-8") as f:
+        conteudo = re.sub(r"--[^\n]*", "", f.read())
+    return [comando.strip() for comando in conteudo.split(";") if comando.strip()]
+
+
+@pytest.fixture
+def engine():
+    schema = f"teste_ciclo_vida_{uuid.uuid4().hex[:8]}"
+    opcoes = {"connect_args": {"options": f"-csearch_path={schema}"}}
+
+    engine_admin = sqlalchemy.create_engine(URL_BANCO, isolation_level="AUTOCOMMIT")
+    try:
+        with engine_admin.connect() as conn:
+            conn.execute(text(f"CREATE SCHEMA {schema}"))
+    except Exception as e:
+        pytest.skip(f"banco de teste indisponível: {e}")
+
+    engine_schema = sqlalchemy.create_engine(URL_BANCO, isolation_level="AUTOCOMMIT", **opcoes)
+    try:
+        with engine_schema.connect() as conn:
+            for comando in [c for c in SEED.split(";") if c.strip()]:
+                conn.execute(text(comando))
+
+            # Funções plpgsql ($$ ... ;): o arquivo vai inteiro, direto no cursor do psycopg2
+            with open(os.path.join(DIRETORIO_SQL, "001_log_atualizacao_dados.sql"), encoding="utf-8") as f:
+                conn.connection.cursor().execute(f.read())
+
+            for arquivo in MIGRACOES:
+                for comando in comandos_sql(arquivo):
+                    conn.execute(text(comando))
+
+        yield sqlalchemy.create_engine(URL_BANCO, **opcoes)
+
+    finally:
+        engine_schema.dispose()
+        with engine_admin.connect() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        engine_admin.dispose()
+
+
+def quantidades_troca_2(engine) -> dict:
+    with engine.connect() as conn:
+        linhas = conn.execute(
+            text("SELECT numero_os, quantidade_troca_2 FROM pecas_trocas_ciclo_vida ORDER BY numero_os")
+        ).all()
+    return {numero_os: quantidade for numero_os, quantidade in linhas}
+
+
+def test_quantidade_troca_2_pareada_pelo_nome(engine):
+    from modules.vidautil.ciclo_vida import atualiza_ciclo_vida
+
+    atualiza_ciclo_vida(engine, completo=True)
+
+    # A quantidade seguinte é a da próxima troca com o mesmo nome (A1 -> B, B -> A2), de qualquer código
+    assert quantidades_troca_2(engine) == {"1": 10, "2": 3, "3": 4, "4": None, "5": 2}
+
+
+def test_incremental_recalcula_os_codigos_com_o_mesmo_nome(engine):
+    from modules.vidautil.ciclo_vida import atualiza_ciclo_vida
+
+    atualiza_ciclo_vida(engine, completo=True)
+
+    # Nova troca só do código B: a quantidade seguinte de A4 (código A) também muda
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+                INSERT INTO mat_view_os_pecas_hodometro_v3
+                VALUES ('00001', 'B', 'FILTRO DE AR', 'MOTOR', 'FILTROS', 'ATIVO', '6', 100, 20,
+                        '2024-05-01', '2024-05-01', 8000)
+                """
+            )
+        )
+    atualiza_ciclo_vida(engine)
+
+    with engine.connect() as conn:
+        esperado = conn.execute(
+            text("SELECT * FROM view_pecas_trocas_ciclo_vida ORDER BY numero_os")
+        ).all()
+        tabela = conn.execute(text("SELECT * FROM pecas_trocas_ciclo_vida ORDER BY numero_os")).all()
+
+    assert tabela == esperado
+    assert quantidades_troca_2(engine)["4"] == 20
+
+
+def test_numero_troca_da_vida_util_conta_apenas_trocas_com_par(engine):
+    from modules.vidautil.ciclo_vida import atualiza_ciclo_vida
+    from modules.vidautil.vida_util_service import VidaUtilService
+
+    atualiza_ciclo_vida(engine, completo=True)
+
+    # Sem o cache e sem o roteamento para as réplicas (que dependem do banco do painel)
+    servico = VidaUtilService.__new__(VidaUtilService)
+    servico.db_engine = engine
+    get_pecas = inspect.unwrap(VidaUtilService.get_pecas)
+
+    # A1 fica sem par (hodômetro igual ao de A2) e A4 e B são as últimas trocas: A2 = 1, A3 = 2, mesmo fora do período
+    df = get_pecas(servico, ["2024-01-01", "2024-12-31"], ["TODOS"], [])
+    trocas = sorted(zip(df["codigo_peca"], df["data_primeira_troca"].astype(str), df["numero_troca"]))
+    assert trocas == [("A", "2024-02-01", 1), ("A", "2024-03-01", 2)]
+
+    df = get_pecas(servico, ["2024-03-01", "2024-12-31"], ["TODOS"], [])
+    trocas = list(zip(df["codigo_peca"], df["data_primeira_troca"].astype(str), df["numero_troca"]))
+    assert trocas == [("A", "2024-03-01", 2)]
+
+
+def test_marca_dagua_guarda_apenas_a_data(engine):
+    from modules.vidautil.ciclo_vida import atualiza_ciclo_vida
+
+    atualiza_ciclo_vida(engine, completo=True)
+
+    with engine.connect() as conn:
+        marca_dagua = conn.execute(text("SELECT * FROM pecas_trocas_ciclo_vida_controle")).mappings().all()
+
+    assert len(marca_dagua) == 1
+    assert set(marca_dagua[0]) == {"data_peca", "atualizado_em"}
+    assert marca_dagua[0]["data_peca"] == "2024-04-01"
+
+
+def tabela_igual_a_view(engine) -> bool:
+    with engine.connect() as conn:
+        esperado = conn.execute(text("SELECT * FROM view_pecas_trocas_ciclo_vida ORDER BY numero_os")).all()
+        tabela = conn.execute(text("SELECT * FROM pecas_trocas_ciclo_vida ORDER BY numero_os")).all()
+    return tabela == esperado
+
+
+def test_incremental_remove_par_recodificado(engine):
+    from modules.vidautil.ciclo_vida import atualiza_ciclo_vida
+
+    atualiza_ciclo_vida(engine, completo=True)
+
+    # O código B (troca de 2024-01-15, fora da janela) foi recodificado: o par antigo sai da tabela
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE mat_view_os_pecas_hodometro_v3 SET codigo_peca = 'B2' WHERE codigo_peca = 'B'"))
+    atualiza_ciclo_vida(engine)
+
+    assert tabela_igual_a_view(engine)
+
+
+def test_incremental_so_com_remocoes_registra_versao(engine):
+    from modules.vidautil.ciclo_vida import atualiza_ciclo_vida
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM mat_view_os_pecas_hodometro_v3"))
+        conn.execute(
+            text(
+                """
+                INSERT INTO mat_view_os_pecas_hodometro_v3
+                VALUES ('00002', 'C', 'CORREIA', 'MOTOR', 'CORREIAS', 'ATIVO', '7', 100, 1,
+                        '2024-06-01', '2024-06-01', 100)
+                """
+            )
+        )
+    atualiza_ciclo_vida(engine, completo=True)
+
+    versao = "SELECT versao FROM log_atualizacao_dados WHERE nome = 'pecas_trocas_ciclo_vida'"
+    with engine.connect() as conn:
+        versao_inicial = conn.execute(text(versao)).scalar()
+
+    # A única OS do par foi apagada: nada é gravado, mas a troca é removida e a versão muda
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM mat_view_os_pecas_hodometro_v3 WHERE numero_os = '7'"))
+    assert atualiza_ciclo_vida(engine) == 0
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM pecas_trocas_ciclo_vida")).scalar() == 0
+        assert conn.execute(text(versao)).scalar() == versao_inicial + 1
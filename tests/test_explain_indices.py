@@ -0,0 +1,130 @@
+# Planos (EXPLAIN) dos filtros de data num banco Postgres descartável
+#
+# Cria um schema temporário com pecas_gerais, os_dados e mat_view_os_pecas_hodometro_v3 populadas
+# (generate_series), aplica sql/002, sql/004 e sql/005 e verifica, com modules.explain_consultas,
+# que os predicados de FiltroSQL.intervalo leem as tabelas pelo índice (Index / Bitmap Heap Scan),
+# enquanto os predicados antigos (cast na coluna) leem a tabela inteira.
+#
+# Requer TESTE_DATABASE_URL (URL SQLAlchemy de um banco descartável, ex:
+# postgresql+psycopg2://postgres@localhost:5432/teste); sem ela os testes são ignorados.
+
+import os
+import re
+import uuid
+
+import pytest
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+from sqlalchemy import text
+
+URL_BANCO = os.getenv("TESTE_DATABASE_URL")
+DIRETORIO_SQL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql")
+
+pytestmark = pytest.mark.skipif(not URL_BANCO, reason="TESTE_DATABASE_URL não configurada")
+
+# Período consultado: 1 mês de ~4 anos de dados
+DATAS = ["2023-03-01", "2023-03-31"]
+
+SEED = """
+    CREATE TABLE pecas_gerais AS
+    SELECT
+        TO_CHAR(DATE '2020-01-01' + (g % 1500), 'YYYY-MM-DD') AS "DATA",
+        (g / 3)::TEXT AS "OS",
+        'PECA ' || (g % 500) AS "PRODUTO",
+        (g % 1000)::NUMERIC AS "VALOR"
+    FROM generate_series(1, 150000) AS g;
+
+    CREATE TABLE os_dados AS
+    SELECT
+        g::TEXT AS "NUMERO DA OS",
+        'SERVICO ' || (g % 200) AS "DESCRICAO DO SERVICO"
+    FROM generate_series(1, 50000) AS g;
+
+    CREATE MATERIALIZED VIEW mat_view_os_pecas_hodometro_v3 AS
+    SELECT
+        LPAD((g % 800)::TEXT, 5, '0') AS id_veiculo,
+        'P' || (g % 40) AS codigo_peca,
+        'PECA ' || (g % 40) AS nome_pecas,
+        'MOTOR' AS grupo_peca,
+        'FILTROS' AS sub_grupo_peca,
+        'ATIVO' AS status_veiculo,
+        g::TEXT AS numero_os,
+        (g % 500 + 1)::NUMERIC AS valor_peca,
+        1::NUMERIC AS quantidade_peca,
+        TO_CHAR(DATE '2020-01-01' + (g % 1500), 'YYYY-MM-DD') AS data_peca,
+        TO_CHAR(DATE '2020-01-01' + (g % 1500), 'YYYY-MM-DD') AS data_ultimo_hodometro,
+        (g * 7 % 1000000)::NUMERIC AS ultimo_hodometro
+    FROM generate_series(1, 150000) AS g;
+"""
+
+
+def comandos_sql(arquivo: str) -> list:
+    # Comandos do arquivo, um a um (CREATE INDEX CONCURRENTLY não roda junto com outros comandos)
+    with open(os.path.join(DIRETORIO_SQL, arquivo), encoding="utf-8") as f:
+        conteudo = re.sub(r"--[^\n]*", "", f.read())
+    return [comando.strip() for comando in conteudo.split(";") if comando.strip()]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    schema = f"teste_indices_{uuid.uuid4().hex[:8]}"
+    opcoes = {"connect_args": {"options": f"-csearch_path={schema}"}}
+
+    engine_admin = sqlalchemy.create_engine(URL_BANCO, isolation_level="AUTOCOMMIT")
+    try:
+        with engine_admin.connect() as conn:
+            conn.execute(text(f"CREATE SCHEMA {schema}"))
+    except Exception as e:
+        pytest.skip(f"banco de teste indisponível: {e}")
+
+    engine_schema = sqlalchemy.create_engine(URL_BANCO, isolation_level="AUTOCOMMIT", **opcoes)
+    try:
+        with engine_schema.connect() as conn:
+            for comando in [c for c in SEED.split(";") if c.strip()]:
+                conn.execute(text(comando))
+
+            for comando in comandos_sql("002_pecas_trocas_ciclo_vida.sql"):
+                conn.execute(text(comando))
+            conn.execute(text("INSERT INTO pecas_trocas_ciclo_vida SELECT * FROM view_pecas_trocas_ciclo_vida"))
+
+            for arquivo in ["004_indices_datas.sql", "005_pecas_trocas_ciclo_vida_datas.sql"]:
+                for comando in comandos_sql(arquivo):
+                    conn.execute(text(comando))
+
+            conn.execute(text("ANALYZE"))
+
+        yield sqlalchemy.create_engine(URL_BANCO, **opcoes)
+
+    finally:
+        engine_schema.dispose()
+        with engine_admin.connect() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        engine_admin.dispose()
+
+
+@pytest.fixture(scope="module")
+def planos(engine):
+    from modules.explain_consultas import verifica_predicados
+
+    return verifica_predicados(engine, DATAS).set_index("coluna")
+
+
+@pytest.mark.parametrize(
+    "coluna",
+    [
+        "pecas_gerais.DATA",
+        "pecas_trocas_ciclo_vida.data_primeira_troca",
+        "mat_view_os_pecas_hodometro_v3.data_peca",
+    ],
+)
+def test_predicado_intervalo_usa_indice(planos, coluna):
+    plano = planos.loc[coluna]
+
+    assert plano["usa_indice"], f"{coluna}: {plano['atual']}"
+    assert plano["atual"] in ("Index Scan", "Index Only Scan", "Bitmap Heap Scan")
+
+
+def test_predicado_antigo_le_a_tabela_inteira(planos):
+    # Com cast na coluna o índice não pode ser usado
+    assert planos.loc["pecas_gerais.DATA", "antigo"] == "Seq Scan"
+
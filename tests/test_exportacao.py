@@ -0,0 +1,59 @@
+# Rota de exportação das tabelas (modules.exportacao)
+#
+# O callback clientside mostra um aviso a partir do status da resposta: 204 quando não há dados,
+# 500 quando a leitura falha; com dados, a resposta é o arquivo (Content-Disposition com o nome).
+
+import json
+
+import pandas as pd
+import pytest
+
+flask = pytest.importorskip("flask")
+
+from modules import exportacao
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    monkeypatch.setattr(exportacao, "EXPORTACOES", {})
+    server = flask.Flask(__name__)
+    exportacao.registra_rota_exportacao(server)
+    return server.test_client()
+
+
+def registra(nome, le_dados, formato="csv"):
+    exportacao.EXPORTACOES[nome] = {"le_dados": le_dados, "colunas": {"PECA": "Peça"}, "formato": formato}
+
+
+def posta(cliente, nome, estados):
+    return cliente.post(f"{exportacao.ROTA_EXPORTACAO}/{nome}", data={"estados": json.dumps(estados)})
+
+
+def test_exporta_csv(cliente):
+    registra("pecas", lambda dados: pd.DataFrame({"PECA": ["FILTRO", "CORREIA"], "VALOR": [1.5, 2.0]}))
+
+    resposta = posta(cliente, "pecas", [{"chave": "x"}])
+
+    assert resposta.status_code == 200
+    assert 'filename="pecas_' in resposta.headers["Content-Disposition"]
+    linhas = resposta.data.decode("utf-8-sig").splitlines()
+    assert linhas == ["Peça;VALOR", "FILTRO;1,5", "CORREIA;2,0"]
+
+
+def test_sem_dados_responde_204(cliente):
+    registra("pecas", lambda dados: pd.DataFrame())
+
+    assert posta(cliente, "pecas", [None]).status_code == 204
+
+
+def test_erro_na_leitura_responde_500(cliente):
+    def le_dados(dados):
+        raise RuntimeError("banco indisponível")
+
+    registra("pecas", le_dados)
+
+    assert posta(cliente, "pecas", [None]).status_code == 500
+
+
+def test_exportacao_desconhecida_responde_404(cliente):
+    assert posta(cliente, "outra", []).status_code == 404
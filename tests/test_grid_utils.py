@@ -0,0 +1,69 @@
+# Blocos das tabelas AG Grid com modelo de linhas no servidor (modules.grid_utils)
+#
+# O DataFrame da página é lido, filtrado e ordenado uma vez por visão (dados, filtros, ordenação);
+# os blocos seguintes apenas fatiam a visão guardada no processo.
+
+import pandas as pd
+import pytest
+
+from modules import grid_utils
+from modules.grid_utils import VisoesGrid, responde_bloco
+
+DADOS = {"chave": "pagina:teste:1", "filtros": {}}
+
+
+@pytest.fixture
+def leituras(monkeypatch):
+    monkeypatch.setattr(grid_utils, "visoes_grid", VisoesGrid())
+
+    lidas = []
+    df = pd.DataFrame({"PECA": [f"P{i % 7}" for i in range(1000)], "VALOR": list(range(1000))})
+
+    def le_dados(dados):
+        lidas.append(dados["chave"])
+        return df
+
+    return lidas, le_dados
+
+
+def pedido(inicio, filtro=None, ordem=None):
+    return {"startRow": inicio, "endRow": inicio + 100, "filterModel": filtro or {}, "sortModel": ordem or []}
+
+
+def test_blocos_da_mesma_visao_leem_os_dados_uma_vez(leituras):
+    lidas, le_dados = leituras
+    ordem = [{"colId": "VALOR", "sort": "desc"}]
+
+    primeiro = responde_bloco("grid", pedido(0, ordem=ordem), DADOS, le_dados)
+    segundo = responde_bloco("grid", pedido(100, ordem=ordem), DADOS, le_dados)
+
+    assert len(lidas) == 1
+    assert primeiro["rowCount"] == segundo["rowCount"] == 1000
+    assert primeiro["rowData"][0]["VALOR"] == 999
+    assert segundo["rowData"][0]["VALOR"] == 899
+
+
+def test_filtro_ou_ordenacao_nova_recalcula_a_visao(leituras):
+    lidas, le_dados = leituras
+    filtro = {"PECA": {"filterType": "text", "type": "equals", "filter": "P3"}}
+
+    responde_bloco("grid", pedido(0), DADOS, le_dados)
+    resposta = responde_bloco("grid", pedido(0, filtro=filtro), DADOS, le_dados)
+    responde_bloco("grid", pedido(100, filtro=filtro), DADOS, le_dados)
+
+    assert len(lidas) == 2
+    assert resposta["rowCount"] == len([i for i in range(1000) if i % 7 == 3])
+    assert {linha["PECA"] for linha in resposta["rowData"]} == {"P3"}
+
+
+def test_visoes_limitadas_pela_memoria():
+    visoes = VisoesGrid(memoria_mb=0.01)
+    df = pd.DataFrame({"VALOR": range(500)})  # ~4 KB
+
+    visoes.set("a", df)
+    visoes.set("b", df)
+    visoes.set("c", df)
+
+    assert visoes.get("a") is None
+    assert visoes.get("c") is df
+    assert visoes.memoria_usada <= visoes.memoria_max
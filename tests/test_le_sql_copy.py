@@ -0,0 +1,139 @@
+# Leitura por COPY (modules.sql_utils.le_sql_copy) num banco Postgres descartável
+#
+# Compara o resultado com o pd.read_sql e verifica o cache da descrição das queries (LIMIT 0) e a
+# leitura pelo pd.read_sql dos resultados com colunas repetidas.
+# Requer TESTE_DATABASE_URL (ver tests/test_explain_indices.py); sem ela os testes são ignorados.
+
+import os
+
+import pandas as pd
+import pytest
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+pytest.importorskip("pyarrow")
+from sqlalchemy import text
+
+URL_BANCO = os.getenv("TESTE_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not URL_BANCO, reason="TESTE_DATABASE_URL não configurada")
+
+QUERY = text(
+    """
+    SELECT
+        g AS id,
+        'PECA ' || (g % 5) AS "PRODUTO",
+        LPAD(g::TEXT, 6, '0') AS "CODIGO DO VEICULO",
+        (g * 1.25)::NUMERIC(10, 2) AS "VALOR",
+        DATE '2024-01-01' + g AS "DATA",
+        CASE WHEN g % 3 = 0 THEN NULL ELSE 'x' END AS observacao,
+        (g % 2 = 0) AS retrabalho
+    FROM generate_series(1, :linhas) AS g
+    WHERE 'PECA ' || (g % 5) = ANY(:pecas)
+    """
+)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = sqlalchemy.create_engine(URL_BANCO)
+    try:
+        with engine.connect():
+            pass
+    except Exception as e:
+        pytest.skip(f"banco de teste indisponível: {e}")
+
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sql_utils(monkeypatch):
+    from modules import sql_utils
+
+    monkeypatch.setattr(sql_utils, "_descricoes", {})
+    monkeypatch.setattr(sql_utils, "_consultas_colunas_repetidas", set())
+    monkeypatch.setattr(sql_utils, "SQL_COPY", True)
+    return sql_utils
+
+
+def contador_descricoes(monkeypatch, sql_utils) -> list:
+    # Queries LIMIT 0 executadas (descrições fora do cache ou renovadas)
+    chamadas = []
+    original = sql_utils._descreve
+
+    def descreve(cursor, chave, sql, renova=False):
+        if renova or chave not in sql_utils._descricoes:
+            chamadas.append(chave)
+        return original(cursor, chave, sql, renova)
+
+    monkeypatch.setattr(sql_utils, "_descreve", descreve)
+    return chamadas
+
+
+def test_mesmo_resultado_do_read_sql(engine, sql_utils):
+    params = {"linhas": 1000, "pecas": ["PECA 1", "PECA 2", "PECA O'BRIEN"]}
+    with engine.begin() as conn:
+        df_read_sql = pd.read_sql(QUERY, conn, params=params)
+        df_copy = sql_utils.le_sql_copy(QUERY, conn, params)
+
+    # Códigos numéricos em colunas texto continuam texto
+    assert df_copy["CODIGO DO VEICULO"].iloc[0] == "000001"
+    pd.testing.assert_frame_equal(df_read_sql, df_copy, check_dtype=False)
+
+
+def test_descricao_em_cache_por_texto_da_query(engine, sql_utils, monkeypatch):
+    chamadas = contador_descricoes(monkeypatch, sql_utils)
+
+    with engine.begin() as conn:
+        primeiro = sql_utils.le_sql_copy(QUERY, conn, {"linhas": 100, "pecas": ["PECA 1"]})
+        segundo = sql_utils.le_sql_copy(QUERY, conn, {"linhas": 200, "pecas": ["PECA 2", "PECA 3"]})
+        vazio = sql_utils.le_sql_copy(QUERY, conn, {"linhas": 10, "pecas": ["NENHUMA"]})
+
+    # Valores diferentes, mesmo texto: a query é descrita (LIMIT 0) uma única vez
+    assert len(chamadas) == 1
+    assert len(primeiro) == 20 and len(segundo) == 80
+    assert vazio.empty and list(vazio.columns) == list(primeiro.columns)
+
+
+def test_descricao_desatualizada_e_renovada(engine, sql_utils, monkeypatch):
+    chamadas = contador_descricoes(monkeypatch, sql_utils)
+    params = {"linhas": 50, "pecas": ["PECA 1"]}
+
+    with engine.begin() as conn:
+        esperado = sql_utils.le_sql_copy(QUERY, conn, params)
+
+        # Ex: uma migração removeu uma coluna depois que a descrição foi guardada
+        chave = next(iter(sql_utils._descricoes))
+        colunas, tipos = sql_utils._descricoes[chave]
+        sql_utils._descricoes[chave] = (colunas[:-1], tipos[:-1])
+
+        df = sql_utils.le_sql_copy(QUERY, conn, params)
+
+    assert len(chamadas) == 2
+    pd.testing.assert_frame_equal(esperado, df)
+    assert sql_utils._descricoes[chave] == (colunas, tipos)
+
+
+def test_colunas_repetidas_lidas_pelo_read_sql(engine, sql_utils, monkeypatch):
+    query = text("SELECT g AS id, g * 2 AS id, 'x' AS nome FROM generate_series(1, :linhas) AS g")
+    params = {"linhas": 10}
+
+    copias = []
+    original = sql_utils.le_sql_copy
+
+    def le_sql_copy(query, conn, params=None):
+        copias.append(query)
+        return original(query, conn, params)
+
+    monkeypatch.setattr(sql_utils, "le_sql_copy", le_sql_copy)
+
+    with engine.begin() as conn:
+        esperado = pd.read_sql(query, conn, params=params)
+        primeiro = sql_utils._le_resultado(query, conn, params)
+        segundo = sql_utils._le_resultado(query, conn, params)
+
+    # Como no pd.read_sql, as duas colunas "id" são mantidas; o COPY é tentado só na primeira leitura
+    assert list(primeiro.columns) == ["id", "id", "nome"]
+    pd.testing.assert_frame_equal(esperado, primeiro)
+    pd.testing.assert_frame_equal(esperado, segundo)
+    assert len(copias) == 1
@@ -0,0 +1,122 @@
+# Carregamento preguiçoso das páginas (modules.paginas, PAGINAS_LAZY)
+#
+# Usa um pacote de páginas temporário (sem os serviços do painel) e verifica que:
+#   - a página só é importada na primeira requisição ao seu caminho, e os callbacks dela passam a
+#     constar em /_dash-dependencies;
+#   - o not_found_404.py (sem dash.register_page) é registrado também no modo preguiçoso;
+#   - sem as partes internas do dash, as páginas são importadas ao criar o app, com aviso no log.
+
+import sys
+import uuid
+import logging
+import textwrap
+from types import SimpleNamespace
+
+import pytest
+
+dash = pytest.importorskip("dash")
+from dash import html, _callback
+
+from modules import paginas
+
+PAGINA = """
+    import dash
+    from dash import html, dcc, callback, Input, Output
+
+    dash.register_page(__name__, name="{nome}", path="{caminho}")
+
+
+    def layout(**kwargs):
+        return html.Div([dcc.Input(id="{nome}-entrada"), html.Div(id="{nome}-saida")])
+
+
+    @callback(Output("{nome}-saida", "children"), Input("{nome}-entrada", "value"))
+    def atualiza(valor):
+        return valor
+"""
+
+PAGINA_404 = """
+    from dash import html
+
+    layout = html.H1("Custom 404")
+"""
+
+
+@pytest.fixture
+def pacote_paginas(tmp_path, monkeypatch):
+    pacote = f"paginas_teste_{uuid.uuid4().hex[:8]}"
+    diretorio = tmp_path / pacote
+    diretorio.mkdir()
+    (diretorio / "__init__.py").write_text("")
+    (diretorio / "inicio.py").write_text(textwrap.dedent(PAGINA.format(nome="inicio", caminho="/")))
+    (diretorio / "outra.py").write_text(textwrap.dedent(PAGINA.format(nome="outra", caminho="/outra")))
+    (diretorio / "not_found_404.py").write_text(textwrap.dedent(PAGINA_404))
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(paginas, "DIR_PAGINAS", str(diretorio))
+    monkeypatch.setattr(paginas, "PACOTE_PAGINAS", pacote)
+    monkeypatch.setattr(paginas, "_paginas_carregadas", set())
+
+    registro = dict(dash.page_registry)
+    callbacks = (dict(_callback.GLOBAL_CALLBACK_MAP), list(_callback.GLOBAL_CALLBACK_LIST))
+    yield pacote
+
+    dash.page_registry.clear()
+    dash.page_registry.update(registro)
+    # Callbacks das páginas importadas e não lidos por nenhum app
+    _callback.GLOBAL_CALLBACK_MAP.clear()
+    _callback.GLOBAL_CALLBACK_MAP.update(callbacks[0])
+    _callback.GLOBAL_CALLBACK_LIST[:] = callbacks[1]
+    for modulo in [m for m in sys.modules if m.startswith(pacote)]:
+        del sys.modules[modulo]
+
+
+def cria_app():
+    app = dash.Dash(__name__, use_pages=True, pages_folder="", suppress_callback_exceptions=True)
+    app.layout = html.Div([dash.page_container])
+    paginas.registra_paginas_lazy(app)
+    return app
+
+
+def callbacks_da_pagina(cliente, nome: str) -> list:
+    dependencias = cliente.get("/_dash-dependencies").get_json()
+    return [d for d in dependencias if d["output"] == f"{nome}-saida.children"]
+
+
+def test_pagina_carregada_na_primeira_requisicao(pacote_paginas):
+    app = cria_app()
+    cliente = app.server.test_client()
+
+    assert cliente.get("/").status_code == 200
+    assert f"{pacote_paginas}.inicio" in sys.modules
+    assert f"{pacote_paginas}.outra" not in sys.modules
+
+    total = len(cliente.get("/_dash-dependencies").get_json())
+    assert len(callbacks_da_pagina(cliente, "inicio")) == 1
+    assert callbacks_da_pagina(cliente, "outra") == []
+
+    # Primeira requisição da outra página: o callback dela é registrado no app já iniciado
+    assert cliente.get("/outra").status_code == 200
+    assert f"{pacote_paginas}.outra" in sys.modules
+    assert len(callbacks_da_pagina(cliente, "outra")) == 1
+    assert len(cliente.get("/_dash-dependencies").get_json()) == total + 1
+
+
+def test_pagina_404_registrada_no_modo_lazy(pacote_paginas):
+    cria_app()
+
+    pagina = dash.page_registry[f"{pacote_paginas}.not_found_404"]
+    assert pagina["path"] == "/404"
+    assert pagina["layout"]().children == "Custom 404"
+
+
+def test_sem_internos_do_dash_importa_as_paginas(pacote_paginas, monkeypatch, caplog):
+    monkeypatch.setattr(paginas, "_callback", SimpleNamespace())
+
+    with caplog.at_level(logging.WARNING):
+        cria_app()
+
+    assert "PAGINAS_LAZY ignorado" in caplog.text
+    assert {f"{pacote_paginas}.inicio", f"{pacote_paginas}.outra"} <= set(sys.modules)
+    assert dash.page_registry[f"{pacote_paginas}.outra"]["layout"] is sys.modules[f"{pacote_paginas}.outra"].layout
+    assert dash.page_registry[f"{pacote_paginas}.not_found_404"]["path"] == "/404"
@@ -0,0 +1,282 @@
+# Paridade da previsão vetorizada (modules/relatoriopecas/previsao.py) com as CTEs media_pecas,
+# estimativa e calculo_previsao_dia que ela substituiu no RelatorioPecasService.
+#
+# Os valores esperados são os que a consulta SQL produzia para as mesmas trocas (ROUND numeric:
+# metade para longe do zero; NULL nas comparações caindo no ELSE dos CASE).
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.relatoriopecas import previsao
+
+DATA_ATUAL = date(2024, 6, 1)
+
+
+def troca(**valores) -> dict:
+    # Troca de peça com as colunas lidas por RelatorioPecasService.get_trocas_previsao
+    padrao = {
+        "AssetId": 1,
+        "id_veiculo": "50001",
+        "modelo_veiculo": "M1",
+        "nome_pecas": "FILTRO",
+        "codigo_peca": "F1",
+        "grupo_peca": "MOTOR",
+        "sub_grupo_peca": "FILTROS",
+        "valor_peca": 100.0,
+        "numero_troca": 1,
+        "data_primeira_troca": date(2024, 1, 10),
+        "odometro_primeira_troca": 100000.0,
+        "odometro_segunda_troca": np.nan,
+        "duracao_km_entre_trocas": np.nan,
+        "duracao_dias_entre_trocas": np.nan,
+        "hodometro_atual_gps": 101600.0,
+        "media_km_diario": 40.0,
+    }
+    padrao.update(valores)
+    return padrao
+
+
+@pytest.fixture
+def df_trocas() -> pd.DataFrame:
+    # Média da peça FILTRO/F1 (trocas a e c): km (1001 + 1002) / 2, dias (10 + 11) / 2, valor (100 + 101) / 2
+    return pd.DataFrame(
+        [
+            # a: veículo 50001, primeira troca (com a troca seguinte)
+            troca(
+                numero_troca=1,
+                odometro_segunda_troca=101001.0,
+                duracao_km_entre_trocas=1001.0,
+                duracao_dias_entre_trocas=10.0,
+            ),
+            # b: veículo 50001, troca atual (sem a troca seguinte)
+            troca(numero_troca=2, data_primeira_troca=date(2024, 3, 1), odometro_primeira_troca=101001.0, valor_peca=101.0),
+            # c: veículo 50002, sem média de km diário (usa o padrão de 150 km/dia)
+            troca(
+                AssetId=2,
+                id_veiculo="50002",
+                valor_peca=101.0,
+                odometro_primeira_troca=200000.0,
+                odometro_segunda_troca=201002.0,
+                duracao_km_entre_trocas=1002.0,
+                duracao_dias_entre_trocas=11.0,
+                hodometro_atual_gps=201500.0,
+                media_km_diario=np.nan,
+            ),
+        ]
+    )
+
+
+def linha(df: pd.DataFrame, id_veiculo: str, numero: int) -> pd.Series:
+    return df[(df["id_veiculo"] == id_veiculo) & (df["flag_ultima_troca"] == numero)].iloc[0]
+
+
+def test_arredonda_metade_para_longe_do_zero():
+    # ROUND(numeric) do Postgres; np.round daria 0, 2, 2, -2 e 12.2
+    assert previsao.arredonda([0.5, 1.5, 2.5, -2.5]).tolist() == [1, 2, 3, -3]
+    assert previsao.arredonda([12.25, 0.15, -0.15], 1).tolist() == [12.3, 0.2, -0.2]
+    assert np.isnan(previsao.arredonda([np.nan])[0])
+
+
+def test_media_pecas(df_trocas):
+    # media_pecas: trocas com valor_peca > 0 e duracao_km_entre_trocas > 0, ROUND(AVG(...)), COUNT(*)
+    df_trocas = pd.concat(
+        [
+            df_trocas,
+            pd.DataFrame(
+                [
+                    troca(valor_peca=0.0, duracao_km_entre_trocas=5000.0, duracao_dias_entre_trocas=50.0),
+                    troca(duracao_km_entre_trocas=-998000.0, duracao_dias_entre_trocas=30.0),
+                ]
+            ),
+        ],
+        ignore_index=True,
+    )
+
+    media = previsao.calcula_media_pecas(df_trocas).iloc[0]
+
+    assert media["media_km_entre_trocas"] == 1002  # 1001.5
+    assert media["media_dias_troca"] == 11  # 10.5
+    assert media["media_valor_peca_troca"] == 101  # 100.5
+    assert media["qtd_amostras_media"] == 2
+
+
+def test_estimativa_e_previsao_dia(df_trocas):
+    df = previsao.calcula_previsao(df_trocas, DATA_ATUAL)
+
+    assert list(df.columns) == previsao.COLUNAS_PREVISAO
+    assert len(df) == 3
+
+    # a: estimativa 100000 + 1002 = 101002, já ultrapassada pelo hodômetro (101600)
+    a = linha(df, "50001", 1)
+    assert a["odometro_troca"] == 100000
+    assert a["estimativa_odometro_proxima_troca"] == 101002
+    assert a["diferenca_entre_hodometro_estimativa_e_atual"] == -598
+    assert a["total_km_peca"] == 1600
+    assert bool(a["ultrapassou_estimativa"]) is True
+    assert a["class_peca"] == "D"
+    assert a["porcentagem_vida_util"] == 159.7  # 1600 * 100 / 1002 = 159.68
+    assert a["situacao_peca_porcentagem"] == a["porcentagem_vida_util"]
+    assert a["calculo_dias"] == -15  # -598 / 40 = -14.95
+    assert a["data_estimada"] == DATA_ATUAL
+    assert a["km_efetivo_da_peca"] == 1001
+    assert a["media_km_entre_trocas"] == 1002
+    assert a["media_valor_peca_troca"] == 101
+    assert a["qtd_amostras_media"] == 2
+
+    # b: 599 km de 1002 (59.8%), classe A, troca em 403 / 40 = 10.075 dias
+    b = linha(df, "50001", 2)
+    assert b["estimativa_odometro_proxima_troca"] == 102003
+    assert b["diferenca_entre_hodometro_estimativa_e_atual"] == 403
+    assert b["total_km_peca"] == 599
+    assert bool(b["ultrapassou_estimativa"]) is False
+    assert b["class_peca"] == "A"
+    assert b["porcentagem_vida_util"] == 59.8
+    assert b["calculo_dias"] == 10
+    assert b["data_estimada"] == DATA_ATUAL + timedelta(days=10)
+    assert b["km_efetivo_da_peca"] == 599  # sem troca seguinte: hodômetro atual - odômetro da troca
+
+
+def test_media_km_diario_padrao(df_trocas):
+    # COALESCE(mkd.media_km_diario, 150)
+    c = linha(previsao.calcula_previsao(df_trocas, DATA_ATUAL), "50002", 1)
+
+    assert c["media_km_diario_veiculo"] == previsao.MEDIA_KM_DIARIO_PADRAO == 150
+    assert c["diferenca_entre_hodometro_estimativa_e_atual"] == -498
+    assert c["calculo_dias"] == -3  # -498 / 150 = -3.32
+    assert c["porcentagem_vida_util"] == 149.7
+
+
+def test_empates_na_metade(df_trocas):
+    # Valores .5 arredondados para longe do zero, como o ROUND da consulta
+    df_trocas.loc[1, ["odometro_primeira_troca", "hodometro_atual_gps", "media_km_diario"]] = [100000.5, 101601.0, 20.0]
+    df_trocas.loc[2, ["odometro_primeira_troca", "hodometro_atual_gps", "media_km_diario"]] = [200000.0, 200592.0, 20.0]
+    df = previsao.calcula_previsao(df_trocas, DATA_ATUAL)
+
+    b = linha(df, "50001", 2)
+    assert b["odometro_troca"] == 100001  # 100000.5
+    assert b["estimativa_odometro_proxima_troca"] == 101003  # 101002.5
+    assert b["diferenca_entre_hodometro_estimativa_e_atual"] == -599  # -598.5
+    assert b["total_km_peca"] == 1601  # 1600.5
+
+    # diferença 410 / 20 km por dia = 20.5 dias
+    c = linha(df, "50002", 1)
+    assert c["diferenca_entre_hodometro_estimativa_e_atual"] == 410
+    assert c["calculo_dias"] == 21
+    assert c["data_estimada"] == DATA_ATUAL + timedelta(days=21)
+
+
+def test_virada_do_hodometro():
+    # Hodômetro atual abaixo do odômetro da troca: voltou a zero ao passar de 1.000.000 km
+    km_efetivo = previsao.calcula_km_efetivo(
+        duracao_km=[np.nan, 1500.0, np.nan],
+        hodometro_atual=[5000.0, 3000.0, 999500.0],
+        odometro_primeira_troca=[998000.0, 999000.0, 999000.0],
+        odometro_segunda_troca=[np.nan, 500.0, np.nan],
+    )
+
+    assert km_efetivo.tolist() == [7000.0, 1500.0, 500.0]
+
+
+def test_hodometro_nulo(df_trocas):
+    # Sem hodômetro (LEFT JOIN sem odômetro do GPS): NULL nas contas e ELSE nos CASE
+    df_trocas["hodometro_atual_gps"] = np.nan
+    b = linha(previsao.calcula_previsao(df_trocas, DATA_ATUAL), "50001", 2)
+
+    for coluna in [
+        "hodometro_atual_gps",
+        "diferenca_entre_hodometro_estimativa_e_atual",
+        "total_km_peca",
+        "porcentagem_vida_util",
+        "calculo_dias",
+        "km_efetivo_da_peca",
+    ]:
+        assert np.isnan(b[coluna]), coluna
+
+    assert b["estimativa_odometro_proxima_troca"] == 102003
+    assert bool(b["ultrapassou_estimativa"]) is False  # CASE ... ELSE FALSE
+    assert b["class_peca"] == "D"
+    assert b["data_estimada"] == DATA_ATUAL
+
+
+def test_media_km_zero():
+    # ROUND(AVG(0.4)) = 0: a consulta falhava por divisão por zero; aqui a porcentagem fica NaN
+    df_trocas = pd.DataFrame(
+        [
+            troca(duracao_km_entre_trocas=0.4, duracao_dias_entre_trocas=1.0, odometro_segunda_troca=100000.4),
+            troca(numero_troca=2, hodometro_atual_gps=100100.0),
+        ]
+    )
+    b = linha(previsao.calcula_previsao(df_trocas, DATA_ATUAL), "50001", 2)
+
+    assert b["media_km_entre_trocas"] == 0
+    assert np.isnan(b["porcentagem_vida_util"])
+    assert b["class_peca"] == "D"
+    assert b["diferenca_entre_hodometro_estimativa_e_atual"] == -100
+    assert b["calculo_dias"] == -3  # -100 / 40 = -2.5
+
+
+def test_flag_ultima_troca_segue_numero_troca(df_trocas):
+    # ROW_NUMBER() OVER (PARTITION BY id_veiculo, nome_pecas ORDER BY numero_troca), independente da ordem das linhas
+    df_trocas = pd.concat([df_trocas, pd.DataFrame([troca(numero_troca=3, odometro_primeira_troca=101500.0)])])
+    df_trocas = df_trocas.iloc[[3, 1, 2, 0]].reset_index(drop=True)
+
+    df = previsao.calcula_previsao(df_trocas, DATA_ATUAL)
+    flags = df.sort_values(["id_veiculo", "odometro_troca"])[["id_veiculo", "odometro_troca", "flag_ultima_troca"]]
+
+    assert flags.values.tolist() == [
+        ["50001", 100000, 1],
+        ["50001", 101001, 2],
+        ["50001", 101500, 3],
+        ["50002", 200000, 1],
+    ]
+
+
+def test_grupos_desconsiderados(df_trocas):
+    # NOT IN (...) descarta também grupo ou subgrupo nulos; as médias continuam usando todas as trocas
+    df_trocas = pd.concat(
+        [
+            df_trocas,
+            pd.DataFrame(
+                [
+                    troca(id_veiculo="60001", grupo_peca="Pneumáticos"),
+                    troca(id_veiculo="60002", sub_grupo_peca="Tintas"),
+                    troca(id_veiculo="60003", grupo_peca=None),
+                    troca(id_veiculo="60004", sub_grupo_peca=None),
+                    troca(id_veiculo="60005", valor_peca=0.0),
+                ]
+            ),
+        ],
+        ignore_index=True,
+    )
+
+    df = previsao.calcula_previsao(df_trocas, DATA_ATUAL)
+
+    assert sorted(df["id_veiculo"].unique()) == ["50001", "50002"]
+    assert (df["media_km_entre_trocas"] == 1002).all()
+
+
+def test_filtra_ultimas_trocas(df_trocas):
+    # flag_ultima_troca = '1' AND data_primeira_troca BETWEEN :data_inicio AND :data_fim (limites inclusivos)
+    df = previsao.calcula_previsao(df_trocas, DATA_ATUAL)
+
+    ultimas = previsao.filtra_ultimas_trocas(df, ["2024-01-10", "2024-01-10"])
+    assert sorted(ultimas["id_veiculo"]) == ["50001", "50002"]
+
+    assert previsao.filtra_ultimas_trocas(df, ["2024-01-11", "2024-12-31"]).empty
+
+
+def test_agrega_previsao_mensal(df_trocas):
+    # Agrupado por peça e DATE_TRUNC('month', data_estimada), sem as trocas sem valor médio
+    df_trocas.loc[2, ["hodometro_atual_gps", "media_km_diario"]] = [200000.0, 20.0]  # 1002 / 20 = 50.1 dias
+    df = previsao.filtra_ultimas_trocas(previsao.calcula_previsao(df_trocas, DATA_ATUAL), ["2024-01-01", "2024-12-31"])
+    df = pd.concat([df, df.iloc[[0]].assign(media_valor_peca_troca=np.nan)])
+
+    mensal = previsao.agrega_previsao_mensal(df).sort_values("mes_ano").reset_index(drop=True)
+
+    assert mensal["mes_ano"].tolist() == [pd.Timestamp("2024-06-01"), pd.Timestamp("2024-07-01")]
+    assert mensal["qtd_pecas_para_trocar"].tolist() == [1, 1]
+    assert mensal["media_valor_money"].tolist() == [101, 101]
+    assert mensal["valor_esperado"].tolist() == [101, 101]
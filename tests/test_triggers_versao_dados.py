@@ -0,0 +1,102 @@
+# Triggers de versão das cargas (sql/008_triggers_versao_dados.sql) num banco Postgres descartável
+#
+# Cria um schema temporário com os_dados, pecas_gerais e veiculos_api vazias, aplica sql/001 e sql/008
+# e verifica que cada comando de carga (INSERT, UPDATE, DELETE, TRUNCATE) incrementa a versão da
+# tabela em log_atualizacao_dados, e que o rollback da carga desfaz o registro.
+#
+# Requer TESTE_DATABASE_URL (ver tests/test_explain_indices.py); sem ela os testes são ignorados.
+
+import os
+import uuid
+
+import pytest
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+from sqlalchemy import text
+
+URL_BANCO = os.getenv("TESTE_DATABASE_URL")
+DIRETORIO_SQL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql")
+
+pytestmark = pytest.mark.skipif(not URL_BANCO, reason="TESTE_DATABASE_URL não configurada")
+
+SEED = """
+    CREATE TABLE os_dados ("NUMERO DA OS" TEXT);
+    CREATE TABLE pecas_gerais ("OS" TEXT, "DATA" TEXT);
+    CREATE TABLE veiculos_api ("AssetId" BIGINT, "Description" TEXT, "Model" TEXT);
+"""
+
+TABELAS = ["os_dados", "pecas_gerais", "veiculos_api"]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    schema = f"teste_versao_{uuid.uuid4().hex[:8]}"
+    opcoes = {"connect_args": {"options": f"-csearch_path={schema}"}}
+
+    engine_admin = sqlalchemy.create_engine(URL_BANCO, isolation_level="AUTOCOMMIT")
+    try:
+        with engine_admin.connect() as conn:
+            conn.execute(text(f"CREATE SCHEMA {schema}"))
+    except Exception as e:
+        pytest.skip(f"banco de teste indisponível: {e}")
+
+    engine_schema = sqlalchemy.create_engine(URL_BANCO, isolation_level="AUTOCOMMIT", **opcoes)
+    try:
+        with engine_schema.connect() as conn:
+            conn.execute(text(SEED))
+
+            # Funções plpgsql ($$ ... ;): os arquivos vão inteiros, direto no cursor do psycopg2
+            for arquivo in ["001_log_atualizacao_dados.sql", "008_triggers_versao_dados.sql"]:
+                with open(os.path.join(DIRETORIO_SQL, arquivo), encoding="utf-8") as f:
+                    conn.connection.cursor().execute(f.read())
+
+        yield sqlalchemy.create_engine(URL_BANCO, **opcoes)
+
+    finally:
+        engine_schema.dispose()
+        with engine_admin.connect() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        engine_admin.dispose()
+
+
+def versao(engine, tabela: str) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT versao FROM log_atualizacao_dados WHERE nome = :nome"), {"nome": tabela}).scalar()
+
+
+@pytest.mark.parametrize("tabela", TABELAS)
+def test_cada_comando_da_carga_registra_nova_versao(engine, tabela):
+    coluna = {"os_dados": '"NUMERO DA OS"', "pecas_gerais": '"OS"', "veiculos_api": '"Model"'}[tabela]
+    inicial = versao(engine, tabela)
+
+    comandos = [
+        f"INSERT INTO {tabela} ({coluna}) VALUES ('1'), ('2')",
+        f"UPDATE {tabela} SET {coluna} = '3' WHERE {coluna} = '2'",
+        f"DELETE FROM {tabela} WHERE {coluna} = '3'",
+        f"TRUNCATE {tabela}",
+    ]
+    for comando in comandos:
+        with engine.begin() as conn:
+            conn.execute(text(comando))
+
+    # Um incremento por comando, independente da quantidade de linhas
+    assert versao(engine, tabela) == inicial + len(comandos)
+
+
+def test_rollback_da_carga_nao_registra_versao(engine):
+    inicial = versao(engine, "os_dados")
+
+    with engine.connect() as conn:
+        conn.execute(text("""INSERT INTO os_dados ("NUMERO DA OS") VALUES ('1')"""))
+        conn.rollback()
+
+    assert versao(engine, "os_dados") == inicial
+
+
+def test_outras_versoes_nao_mudam(engine):
+    inicial = versao(engine, "mat_view_os_pecas_hodometro_v3")
+
+    with engine.begin() as conn:
+        conn.execute(text("""INSERT INTO pecas_gerais ("OS") VALUES ('1')"""))
+
+    assert versao(engine, "mat_view_os_pecas_hodometro_v3") == inicial